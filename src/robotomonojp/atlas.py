@@ -0,0 +1,444 @@
+"""cmapの全glyphを確認する atlas ページ (preview --atlas) の生成.
+
+2万字を超えるCJKフォントの全glyphを1枚のHTMLに並べるとブラウザが固まる.
+cmapをUnicode blockごとの codepoint 区間 (index) にまとめてHTMLに埋め込み、
+表示中の行だけをDOMに作る仮想スクロールのgridで描く. フォントは block を
+CHUNK_CODEPOINTS 以下ずつのWOFF2 subset にまとめ (小さいblockは同じ subset に詰める)、
+unicode-range 付きの @font-face で読み込むため、ブラウザは表示した文字を含む subset だけを取得する.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+from dataclasses import dataclass
+from html import escape
+from pathlib import Path
+from urllib.parse import quote
+
+from fontTools.ttLib import TTFont
+
+from .webfont import subset_woff2, unicode_range
+
+FONT_FACE_NAME = "RobotoMonoJPAtlas"
+# 1つのWOFF2 subset に入れる codepoint の数.
+CHUNK_CODEPOINTS = 1024
+# gridの列数 (Unicodeのcode chartと同じ16列).
+COLUMNS = 16
+
+# (開始, 終了, 名前). ここに無い codepoint は256字ごとの "U+XX00" にまとめる.
+BLOCKS: list[tuple[int, int, str]] = [
+    (0x0000, 0x007F, "Basic Latin"),
+    (0x0080, 0x00FF, "Latin-1 Supplement"),
+    (0x0100, 0x017F, "Latin Extended-A"),
+    (0x0180, 0x024F, "Latin Extended-B"),
+    (0x0250, 0x02AF, "IPA Extensions"),
+    (0x02B0, 0x02FF, "Spacing Modifier Letters"),
+    (0x0300, 0x036F, "Combining Diacritical Marks"),
+    (0x0370, 0x03FF, "Greek and Coptic"),
+    (0x0400, 0x04FF, "Cyrillic"),
+    (0x1E00, 0x1EFF, "Latin Extended Additional"),
+    (0x2000, 0x206F, "General Punctuation"),
+    (0x2070, 0x209F, "Superscripts and Subscripts"),
+    (0x20A0, 0x20CF, "Currency Symbols"),
+    (0x2100, 0x214F, "Letterlike Symbols"),
+    (0x2150, 0x218F, "Number Forms"),
+    (0x2190, 0x21FF, "Arrows"),
+    (0x2200, 0x22FF, "Mathematical Operators"),
+    (0x2300, 0x23FF, "Miscellaneous Technical"),
+    (0x2400, 0x243F, "Control Pictures"),
+    (0x2460, 0x24FF, "Enclosed Alphanumerics"),
+    (0x2500, 0x257F, "Box Drawing"),
+    (0x2580, 0x259F, "Block Elements"),
+    (0x25A0, 0x25FF, "Geometric Shapes"),
+    (0x2600, 0x26FF, "Miscellaneous Symbols"),
+    (0x2700, 0x27BF, "Dingbats"),
+    (0x2800, 0x28FF, "Braille Patterns"),
+    (0x2B00, 0x2BFF, "Miscellaneous Symbols and Arrows"),
+    (0x2E80, 0x2EFF, "CJK Radicals Supplement"),
+    (0x2F00, 0x2FDF, "Kangxi Radicals"),
+    (0x3000, 0x303F, "CJK Symbols and Punctuation"),
+    (0x3040, 0x309F, "Hiragana"),
+    (0x30A0, 0x30FF, "Katakana"),
+    (0x31F0, 0x31FF, "Katakana Phonetic Extensions"),
+    (0x3200, 0x32FF, "Enclosed CJK Letters and Months"),
+    (0x3300, 0x33FF, "CJK Compatibility"),
+    (0x3400, 0x4DBF, "CJK Unified Ideographs Extension A"),
+    (0x4E00, 0x9FFF, "CJK Unified Ideographs"),
+    (0xE000, 0xF8FF, "Private Use Area"),
+    (0xF900, 0xFAFF, "CJK Compatibility Ideographs"),
+    (0xFE10, 0xFE1F, "Vertical Forms"),
+    (0xFE30, 0xFE4F, "CJK Compatibility Forms"),
+    (0xFF00, 0xFFEF, "Halfwidth and Fullwidth Forms"),
+    (0x1F100, 0x1F1FF, "Enclosed Alphanumeric Supplement"),
+    (0xF0000, 0xFFFFF, "Supplementary Private Use Area-A"),
+    (0x20000, 0x2A6DF, "CJK Unified Ideographs Extension B"),
+    (0x2F800, 0x2FA1F, "CJK Compatibility Ideographs Supplement"),
+]
+
+
+@dataclass(frozen=True)
+class Block:
+    """cmapのうち1つのUnicode blockに入る codepoint."""
+
+    name: str
+    codepoints: tuple[int, ...]
+
+
+def block_of(code: int) -> tuple[int, str]:
+    """code が入るblockの (開始codepoint, 名前)."""
+    for start, end, name in BLOCKS:
+        if start <= code <= end:
+            return start, name
+    page = code & ~0xFF
+    return page, f"U+{page:04X}"
+
+
+def group_by_block(codepoints: list[int]) -> list[Block]:
+    """codepoints をblockごとにまとめ、codepoint順に並べる."""
+    groups: dict[tuple[int, str], list[int]] = {}
+    for code in sorted(set(codepoints)):
+        groups.setdefault(block_of(code), []).append(code)
+    return [Block(name, tuple(codes)) for (_, name), codes in sorted(groups.items())]
+
+
+def _runs(codepoints: tuple[int, ...]) -> list[list[int]]:
+    """連続する codepoint を [開始, 個数] の列にする (indexを小さくするため)."""
+    runs: list[list[int]] = []
+    for code in codepoints:
+        if runs and runs[-1][0] + runs[-1][1] == code:
+            runs[-1][1] += 1
+        else:
+            runs.append([code, 1])
+    return runs
+
+
+def atlas_index(family: str, blocks: list[Block]) -> dict[str, object]:
+    """HTMLに埋め込むindex. codepointは [開始, 個数] の区間で持つ."""
+    return {
+        "family": family,
+        "count": sum(len(block.codepoints) for block in blocks),
+        "blocks": [
+            {"name": block.name, "count": len(block.codepoints), "runs": _runs(block.codepoints)}
+            for block in blocks
+        ],
+    }
+
+
+def _chunks(blocks: list[Block]) -> list[tuple[int, ...]]:
+    """WOFF2 subset ごとの codepoint. blockを順に CHUNK_CODEPOINTS 以下ずつ詰める.
+
+    CHUNK_CODEPOINTS を超えるblockだけを分け、小さいblockは途中で分けずに次の subset へ回す.
+    """
+    chunks: list[tuple[int, ...]] = []
+    current: list[int] = []
+    for block in blocks:
+        for start in range(0, len(block.codepoints), CHUNK_CODEPOINTS):
+            piece = block.codepoints[start : start + CHUNK_CODEPOINTS]
+            if len(current) + len(piece) > CHUNK_CODEPOINTS:
+                chunks.append(tuple(current))
+                current = []
+            current.extend(piece)
+    if current:
+        chunks.append(tuple(current))
+    return chunks
+
+
+def generate_atlas(font_path: Path, output: Path, title: str | None = None) -> Path:
+    """font_path のcmapの全glyphを並べる atlas HTMLを output に書き出す.
+
+    WOFF2 subset は output と同じ場所の <output名>_files/ に書き出す.
+    """
+    font_path = font_path.resolve()
+    output = output.resolve()
+    # フォントは1回だけ読み、各 subset はメモリ上のbyte列から作る.
+    data = font_path.read_bytes()
+    font = TTFont(io.BytesIO(data), lazy=True)
+    try:
+        family = str(font["name"].getBestFamilyName() or font_path.stem)
+        blocks = group_by_block(list(font.getBestCmap()))
+    finally:
+        font.close()
+
+    files_dir = output.parent / f"{output.stem}_files"
+    files_dir.mkdir(parents=True, exist_ok=True)
+    faces: list[str] = []
+    for index, codepoints in enumerate(_chunks(blocks)):
+        path = files_dir / f"{index:03d}.woff2"
+        path.write_bytes(subset_woff2(data, codepoints))
+        url = quote(Path(os.path.relpath(path, output.parent)).as_posix(), safe="/")
+        faces.append(
+            f'      @font-face {{ font-family: "{FONT_FACE_NAME}"; '
+            f'src: url("{url}") format("woff2"); font-display: block; '
+            f"unicode-range: {unicode_range(codepoints)}; }}"
+        )
+
+    page_title = title or family
+    # </script> を含まないよう "<" をescapeしてHTMLに埋め込む.
+    index_json = json.dumps(atlas_index(family, blocks), separators=(",", ":")).replace(
+        "<", "\\u003c"
+    )
+    html = _TEMPLATE.format(
+        title=escape(page_title),
+        faces="\n".join(faces),
+        face_name=FONT_FACE_NAME,
+        columns=COLUMNS,
+        index=index_json,
+        meta=escape(str(font_path)),
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(html, encoding="utf-8")
+    return output
+
+
+_TEMPLATE = """<!doctype html>
+<html lang="ja">
+  <head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <title>{title} atlas</title>
+    <style>
+{faces}
+
+      :root {{
+        color-scheme: light dark;
+        --row: 56px;
+      }}
+
+      body {{
+        margin: 0;
+        display: grid;
+        grid-template-rows: auto minmax(0, 1fr);
+        height: 100vh;
+        font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
+      }}
+
+      header {{
+        display: flex;
+        flex-wrap: wrap;
+        gap: 12px;
+        align-items: center;
+        padding: 12px 16px;
+        border-bottom: 1px solid #d5d9e0;
+      }}
+
+      h1 {{
+        margin: 0;
+        font-size: 18px;
+      }}
+
+      .meta {{
+        color: #667085;
+        font-size: 12px;
+        overflow-wrap: anywhere;
+      }}
+
+      main {{
+        display: grid;
+        grid-template-columns: 260px minmax(0, 1fr);
+        min-height: 0;
+      }}
+
+      nav {{
+        overflow-y: auto;
+        border-right: 1px solid #d5d9e0;
+        font-size: 12px;
+      }}
+
+      nav a {{
+        display: flex;
+        justify-content: space-between;
+        padding: 4px 12px;
+        color: inherit;
+        text-decoration: none;
+      }}
+
+      nav a:hover {{
+        background: rgba(127, 127, 127, 0.15);
+      }}
+
+      #viewport {{
+        position: relative;
+        overflow-y: auto;
+      }}
+
+      .row {{
+        position: absolute;
+        left: 0;
+        right: 0;
+        height: var(--row);
+        display: grid;
+        grid-template-columns: 72px repeat({columns}, minmax(0, 1fr));
+      }}
+
+      .row.block-title {{
+        align-items: end;
+        padding: 0 12px 6px;
+        display: block;
+        font-weight: 600;
+        line-height: calc(var(--row) - 6px);
+      }}
+
+      .row .label {{
+        align-self: center;
+        padding-left: 12px;
+        color: #667085;
+        font: 11px ui-monospace, monospace;
+      }}
+
+      .cell {{
+        display: grid;
+        grid-template-rows: 1fr auto;
+        justify-items: center;
+        border: 1px solid rgba(127, 127, 127, 0.2);
+        margin: -1px 0 0 -1px;
+      }}
+
+      .cell .glyph {{
+        font-family: "{face_name}", sans-serif;
+        font-size: 26px;
+        line-height: 36px;
+        white-space: pre;
+      }}
+
+      .cell .code {{
+        color: #667085;
+        font: 9px ui-monospace, monospace;
+      }}
+
+      .cell.target {{
+        outline: 2px solid #e5484d;
+        outline-offset: -2px;
+      }}
+    </style>
+  </head>
+  <body>
+    <header>
+      <h1>{title}</h1>
+      <form id="jump">
+        <input id="jump-input" placeholder="U+3042 / あ" size="12">
+        <button>jump</button>
+      </form>
+      <span class="meta" id="count"></span>
+      <span class="meta">{meta}</span>
+    </header>
+    <main>
+      <nav id="blocks"></nav>
+      <div id="viewport"><div id="spacer"></div></div>
+    </main>
+    <script type="application/json" id="atlas-index">{index}</script>
+    <script>
+      const index = JSON.parse(document.getElementById("atlas-index").textContent);
+      const columns = {columns};
+      const viewport = document.getElementById("viewport");
+      const spacer = document.getElementById("spacer");
+      const rowHeight = parseFloat(getComputedStyle(document.documentElement).getPropertyValue("--row"));
+      const hex = (code) => code.toString(16).toUpperCase().padStart(4, "0");
+
+      // blockごとに見出し1行 + codepoint行. codepointは表示するときにrunsから展開する.
+      const rows = [];
+      const blockRow = [];
+      const codepoints = index.blocks.map((block) =>
+        block.runs.flatMap(([start, count]) => Array.from({{ length: count }}, (_, i) => start + i))
+      );
+      index.blocks.forEach((block, b) => {{
+        blockRow.push(rows.length);
+        rows.push({{ block: b }});
+        for (let offset = 0; offset < block.count; offset += columns) rows.push({{ block: b, offset }});
+      }});
+      spacer.style.height = `${{rows.length * rowHeight}}px`;
+      document.getElementById("count").textContent = `${{index.count}} glyphs`;
+
+      const nav = document.getElementById("blocks");
+      index.blocks.forEach((block, b) => {{
+        const link = document.createElement("a");
+        link.href = "#";
+        link.innerHTML = `<span></span><span>${{block.count}}</span>`;
+        link.firstChild.textContent = block.name;
+        link.onclick = (event) => {{
+          event.preventDefault();
+          viewport.scrollTop = blockRow[b] * rowHeight;
+        }};
+        nav.appendChild(link);
+      }});
+
+      let target = null;
+      const rendered = new Map();
+      function renderRow(r) {{
+        const row = rows[r];
+        const element = document.createElement("div");
+        element.className = "row";
+        element.style.top = `${{r * rowHeight}}px`;
+        if (row.offset === undefined) {{
+          element.classList.add("block-title");
+          element.textContent = index.blocks[row.block].name;
+          return element;
+        }}
+        const codes = codepoints[row.block].slice(row.offset, row.offset + columns);
+        const label = document.createElement("span");
+        label.className = "label";
+        label.textContent = `U+${{hex(codes[0])}}`;
+        element.appendChild(label);
+        for (const code of codes) {{
+          const cell = document.createElement("div");
+          cell.className = code === target ? "cell target" : "cell";
+          cell.title = `U+${{hex(code)}}`;
+          cell.innerHTML = '<span class="glyph"></span><span class="code"></span>';
+          cell.firstChild.textContent = String.fromCodePoint(code);
+          cell.lastChild.textContent = hex(code);
+          element.appendChild(cell);
+        }}
+        return element;
+      }}
+
+      // 表示範囲 (前後に数行の余裕) の行だけをDOMに置く.
+      function render() {{
+        const first = Math.max(0, Math.floor(viewport.scrollTop / rowHeight) - 4);
+        const last = Math.min(rows.length, Math.ceil((viewport.scrollTop + viewport.clientHeight) / rowHeight) + 4);
+        for (const [r, element] of rendered) {{
+          if (r < first || r >= last) {{
+            element.remove();
+            rendered.delete(r);
+          }}
+        }}
+        for (let r = first; r < last; r++) {{
+          if (!rendered.has(r)) {{
+            const element = renderRow(r);
+            rendered.set(r, element);
+            spacer.appendChild(element);
+          }}
+        }}
+      }}
+
+      function jump(text) {{
+        const value = text.trim();
+        // U+3042 / 0x3042 / 3042 はcodepoint、それ以外は先頭の文字.
+        const code = /^((U\\+|0x)[0-9a-f]+|[0-9a-f]{{4,6}})$/i.test(value)
+          ? parseInt(value.replace(/^(U\\+|0x)/i, ""), 16)
+          : value.codePointAt(0);
+        for (let b = 0; b < codepoints.length; b++) {{
+          const position = codepoints[b].indexOf(code);
+          if (position >= 0) {{
+            target = code;
+            for (const element of rendered.values()) element.remove();
+            rendered.clear();
+            viewport.scrollTop = (blockRow[b] + 1 + Math.floor(position / columns)) * rowHeight;
+            render();
+            return;
+          }}
+        }}
+        alert(`U+${{hex(code || 0)}} is not in the cmap`);
+      }}
+
+      document.getElementById("jump").onsubmit = (event) => {{
+        event.preventDefault();
+        jump(document.getElementById("jump-input").value);
+      }};
+      viewport.addEventListener("scroll", () => requestAnimationFrame(render));
+      window.addEventListener("resize", render);
+      render();
+    </script>
+  </body>
+</html>
+"""
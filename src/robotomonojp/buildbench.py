@@ -0,0 +1,289 @@
+"""実フォントでの build 全体の benchmark と、過去の計測結果との比較.
+
+fonts/ の実フォントで build() を (config, style, variant) ごとに1回ずつ実行し、
+所要時間・CPU時間・ピークRSS・出力サイズを results_dir に run ごとのJSONとして保存する.
+保存済みの run を baseline にして、閾値を超えて悪化した項目を regression として報告する.
+build はcacheを使わず、計測ごとに新しいprocessで実行する (前のbuildのメモリが残らないように).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from . import __version__
+from .cache import code_fingerprint
+from .generator import BuildRequest, build, output_paths
+from .memory import peak_rss
+
+# fonts/ にcommitされている IBMPlexSansJP / LINESeedJP / ZenKakuGothicNew + RobotoMono の config.
+DEFAULT_CONFIGS = (
+    Path("config/plex.yaml"),
+    Path("config/lineseed.yaml"),
+    Path("config/zenkaku.yaml"),
+)
+# 悪化とみなす増加率 (%).
+DEFAULT_THRESHOLDS: dict[str, float] = {"wall": 10.0, "cpu": 10.0, "rss": 10.0, "size": 1.0}
+METRICS: dict[str, str] = {
+    "wall": "wall_seconds",
+    "cpu": "cpu_seconds",
+    "rss": "peak_rss",
+    "size": "output_bytes",
+}
+# これより小さい秒数の増加は、増加率が閾値を超えても計測の揺れとして扱う.
+MIN_SECONDS_DELTA = 1.0
+
+Echo = Callable[[str], None]
+
+
+@dataclass(frozen=True)
+class Measurement:
+    """build 1件分の計測値."""
+
+    family: str
+    style: str
+    variant: str  # "Default" | "Mono"
+    wall_seconds: float
+    # build process と font-patcher などの子processの user + system.
+    cpu_seconds: float
+    # byte. build process と子processのうち大きい方.
+    peak_rss: int
+    # ttf + otf の合計byte数.
+    output_bytes: int
+
+    @property
+    def key(self) -> str:
+        """run 間で同じbuildを対応付ける key."""
+        return f"{self.family}/{self.style}/{self.variant}"
+
+
+@dataclass(frozen=True)
+class BenchRun:
+    """bench run 1回分の計測結果と環境."""
+
+    id: str
+    created: str
+    label: str
+    version: str
+    commit: str | None
+    fingerprint: str
+    host: dict[str, Any]
+    measurements: tuple[Measurement, ...]
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """baseline と candidate の1項目の比較."""
+
+    key: str
+    metric: str
+    baseline: float
+    candidate: float
+    regressed: bool
+
+    @property
+    def change(self) -> float:
+        """baseline からの増加率 (%)."""
+        if self.baseline == 0:
+            return 0.0 if self.candidate == 0 else float("inf")
+        return (self.candidate - self.baseline) / self.baseline * 100
+
+
+def _cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _children_peak_rss() -> int:
+    maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # macOSはbyte、Linuxはkilobyte.
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def measure_build(request: BuildRequest) -> Measurement:
+    """現在のprocessで request を build し、計測値を返す. 出力は計測後も残す."""
+    cpu_start = _cpu_seconds()
+    start = time.perf_counter()
+    build(request)
+    wall = time.perf_counter() - start
+    cpu = _cpu_seconds() - cpu_start
+    output_bytes = sum(path.stat().st_size for path in output_paths(request) if path.exists())
+    return Measurement(
+        family=request.config.familyname_for(request.mono),
+        style=request.style,
+        variant="Mono" if request.mono else "Default",
+        wall_seconds=wall,
+        cpu_seconds=cpu,
+        peak_rss=max(peak_rss() or 0, _children_peak_rss()),
+        output_bytes=output_bytes,
+    )
+
+
+def measure_in_subprocess(request: BuildRequest) -> Measurement:
+    """新しいprocessで measure_build を実行する. ピークRSSに前のbuildが混ざらない."""
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        return executor.submit(measure_build, request).result()
+
+
+def run(
+    requests: Sequence[BuildRequest],
+    *,
+    echo: Echo = print,
+    measure: Callable[[BuildRequest], Measurement] = measure_in_subprocess,
+) -> list[Measurement]:
+    """requests を1件ずつ順に build して計測する. 出力は一時ディレクトリに書いて捨てる.
+
+    並列に走らせると互いのCPU・メモリ帯域の影響を受けるため、直列に実行する.
+    """
+    results: list[Measurement] = []
+    with tempfile.TemporaryDirectory(prefix="robotomonojp-bench-") as tmpdir:
+        for request in requests:
+            request = replace(request, output_dir=Path(tmpdir), cache_dir=None, resume=False)
+            result = measure(request)
+            echo(format_measurement(result))
+            results.append(result)
+    return results
+
+
+def format_measurement(result: Measurement) -> str:
+    """計測値を1行にする."""
+    return (
+        f"[bench] {result.key}: wall {result.wall_seconds:.1f}s"
+        f" cpu {result.cpu_seconds:.1f}s rss {result.peak_rss / 1024**2:.0f}MiB"
+        f" size {result.output_bytes / 1024**2:.2f}MiB"
+    )
+
+
+def _git_commit() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def new_run(measurements: Sequence[Measurement], label: str = "") -> BenchRun:
+    """計測値に、比較のときに確かめたい環境 (version・commit・host) を付ける."""
+    now = datetime.now(UTC)
+    return BenchRun(
+        id=now.strftime("%Y%m%dT%H%M%SZ"),
+        created=now.isoformat(timespec="seconds"),
+        label=label,
+        version=__version__,
+        commit=_git_commit(),
+        fingerprint=code_fingerprint(),
+        host={
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        measurements=tuple(measurements),
+    )
+
+
+def save_run(results_dir: Path, bench_run: BenchRun) -> Path:
+    """bench_run を results_dir/<id>.json に書き出す."""
+    results_dir.mkdir(parents=True, exist_ok=True)
+    path = results_dir / f"{bench_run.id}.json"
+    data = asdict(bench_run)
+    data["measurements"] = [asdict(m) for m in bench_run.measurements]
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n")
+    return path
+
+
+def load_run(path: Path) -> BenchRun:
+    """save_run で書き出した run を読み込む."""
+    data = json.loads(path.read_text())
+    data["measurements"] = tuple(Measurement(**m) for m in data["measurements"])
+    return BenchRun(**data)
+
+
+def list_runs(results_dir: Path) -> list[BenchRun]:
+    """results_dir の run を古い順に返す. 読めないファイルは飛ばす."""
+    runs: list[BenchRun] = []
+    for path in sorted(results_dir.glob("*.json")):
+        try:
+            runs.append(load_run(path))
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+    return runs
+
+
+def find_run(results_dir: Path, ref: str) -> BenchRun:
+    """ref に当たる run を返す.
+
+    ref は run の id、label (同じlabelが複数あれば最新)、"latest" (最新)、"previous" (最新の1つ前).
+    """
+    runs = list_runs(results_dir)
+    if ref == "latest" and runs:
+        return runs[-1]
+    if ref == "previous" and len(runs) >= 2:
+        return runs[-2]
+    for bench_run in reversed(runs):
+        if ref in (bench_run.id, bench_run.label):
+            return bench_run
+    raise LookupError(f"no bench run {ref!r} in {results_dir}")
+
+
+def compare(
+    baseline: BenchRun, candidate: BenchRun, thresholds: dict[str, float]
+) -> list[Comparison]:
+    """両方の run にあるbuildごとに、thresholds の指標を比べる.
+
+    増加率が閾値 (%) を超えたものを regressed にする. 秒数は MIN_SECONDS_DELTA 未満の増加を除く.
+    """
+    base = {m.key: m for m in baseline.measurements}
+    comparisons: list[Comparison] = []
+    for measurement in candidate.measurements:
+        before = base.get(measurement.key)
+        if before is None:
+            continue
+        for metric, threshold in thresholds.items():
+            field_name = METRICS[metric]
+            old = float(getattr(before, field_name))
+            new = float(getattr(measurement, field_name))
+            comparison = Comparison(measurement.key, metric, old, new, regressed=False)
+            regressed = comparison.change > threshold
+            if field_name.endswith("_seconds") and new - old < MIN_SECONDS_DELTA:
+                regressed = False
+            comparisons.append(replace(comparison, regressed=regressed))
+    return comparisons
+
+
+def unmatched(baseline: BenchRun, candidate: BenchRun) -> tuple[list[str], list[str]]:
+    """baseline にだけある key と candidate にだけある key."""
+    before = {m.key for m in baseline.measurements}
+    after = {m.key for m in candidate.measurements}
+    return sorted(before - after), sorted(after - before)
+
+
+def _format_value(metric: str, value: float) -> str:
+    if metric in ("wall", "cpu"):
+        return f"{value:.1f}s"
+    return f"{value / 1024**2:.2f}MiB" if metric == "size" else f"{value / 1024**2:.0f}MiB"
+
+
+def format_comparison(comparison: Comparison) -> str:
+    """比較1項目を1行にする."""
+    mark = "  REGRESSION" if comparison.regressed else ""
+    return (
+        f"[compare] {comparison.key} {comparison.metric}:"
+        f" {_format_value(comparison.metric, comparison.baseline)}"
+        f" -> {_format_value(comparison.metric, comparison.candidate)}"
+        f" ({comparison.change:+.1f}%){mark}"
+    )
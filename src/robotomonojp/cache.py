@@ -0,0 +1,253 @@
+"""生成途中・生成結果のフォントをcontent-addressedに保存するcache."""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+# リポジトリ直下. Docker実行時も /app にマウントされるため run をまたいで残る.
+DEFAULT_CACHE_DIR = Path(".cache/robotomonojp")
+# 全config・全style分の出力 (ttf + otf) と前処理済みフォントが収まる程度の上限.
+DEFAULT_CACHE_MAX_SIZE = "8G"
+# glyphごとのヒンティング結果のcache (hintcache) のファイル名.
+HINTS_FILENAME = "hints.sqlite"
+# フォントのname・収録文字などのindex (fontindex) のファイル名. 小さく作り直せるためgcの対象外.
+FONTINDEX_FILENAME = "fontindex.sqlite"
+
+SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", re.IGNORECASE)
+
+_PACKAGE_ROOT = Path(__file__).resolve().parent
+
+_file_digests: dict[tuple[str, int, int], str] = {}
+
+
+def file_sha256(path: Path) -> str:
+    """ファイル内容のsha256を返す. 同一プロセス内では (path, size, mtime) でmemoする."""
+    stat = path.stat()
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    digest = _file_digests.get(memo_key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with path.open("rb") as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        _file_digests[memo_key] = digest
+    return digest
+
+
+def code_fingerprint() -> str:
+    """パッケージ内の全 .py のsha256. 生成ロジックが変わればcacheを無効化するために使う."""
+    hasher = hashlib.sha256()
+    for path in sorted(_PACKAGE_ROOT.rglob("*.py")):
+        hasher.update(path.relative_to(_PACKAGE_ROOT).as_posix().encode())
+        hasher.update(file_sha256(path).encode())
+    return hasher.hexdigest()
+
+
+def parse_size(value: str) -> int:
+    """'512M' や '8G' 形式のサイズ指定をbyte数に変換する."""
+    matched = SIZE_PATTERN.match(value)
+    if matched is None:
+        raise ValueError(f"invalid size: {value!r} (expected e.g. '512M' or '8G')")
+    number, unit = matched.groups()
+    exponent = " KMGT".index(unit.upper() or " ")
+    return int(float(number) * 1024**exponent)
+
+
+def format_size(num_bytes: int) -> str:
+    """byte数を '1.5 GiB' のような表示用文字列にする."""
+    size = float(num_bytes)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def hash_key(*parts: object) -> str:
+    """JSON化できる値の並びから安定したcache keyを作る."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PreparedFontCache:
+    """EN/JPの前処理済み中間TTFを key ごとに1ファイルとして保存する."""
+
+    def __init__(self, root: Path) -> None:
+        """root/prepared 以下を保存先にする."""
+        self.root = root / "prepared"
+
+    def path_for(self, kind: str, key: str) -> Path:
+        """kind ("en" / "jp") と key に対応するTTFのpathを返す."""
+        return self.root / f"{kind}-{key}.ttf"
+
+    def get_or_create(self, kind: str, key: str, create: Callable[[Path], None]) -> Path:
+        """cache済みならそのpathを、無ければ create(path) で生成してから返す.
+
+        並列workerが同じkeyを同時に生成しても壊れないよう、
+        一時ファイルへ書き出してから os.replace で置き換える.
+        """
+        path = self.path_for(kind, key)
+        if path.exists():
+            _touch(path)
+            return path
+        self.root.mkdir(parents=True, exist_ok=True)
+        # FontForgeは拡張子で出力形式を決めるため、一時ファイルも .ttf で終える.
+        tmp = path.with_name(f".{path.stem}.{os.getpid()}.tmp.ttf")
+        try:
+            create(tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return path
+
+
+class OutputCache:
+    """generate の出力 (ttf / otf) を key ごとのディレクトリに保存する."""
+
+    ENTRY_FILE = "entry.json"
+
+    def __init__(self, root: Path) -> None:
+        """root/outputs 以下を保存先にする."""
+        self.root = root / "outputs"
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key
+
+    def lookup(self, key: str) -> list[Path] | None:
+        """key のentryが揃っていれば保存済みファイルのpathを返す. 無ければNone."""
+        entry_file = self._entry_dir(key) / self.ENTRY_FILE
+        try:
+            entry = json.loads(entry_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        files = [entry_file.parent / name for name in entry["files"]]
+        if not all(path.exists() for path in files):
+            return None
+        _touch(entry_file)
+        return files
+
+    def restore(self, key: str, output_dir: Path) -> list[Path] | None:
+        """key のentryを output_dir へコピーし、コピー先のpathを返す. 無ければNone."""
+        files = self.lookup(key)
+        if files is None:
+            return None
+        output_dir.mkdir(parents=True, exist_ok=True)
+        return [Path(shutil.copy(path, output_dir / path.name)) for path in files]
+
+    def store(self, key: str, files: list[Path], label: str) -> None:
+        """files を key のentryとして保存する. 既にあれば何もしない."""
+        entry_dir = self._entry_dir(key)
+        if entry_dir.exists():
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".{key}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        try:
+            for path in files:
+                shutil.copy(path, tmp / path.name)
+            entry = {"label": label, "files": [path.name for path in files], "created": time.time()}
+            (tmp / self.ENTRY_FILE).write_text(json.dumps(entry, indent=2), encoding="utf-8")
+            try:
+                os.replace(tmp, entry_dir)
+            except OSError:
+                # 並列workerが先に同じkeyを保存した.
+                if not entry_dir.exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """LRU evictionの単位. 出力entryのディレクトリ、前処理済みTTF1つ、hints.sqlite、旧charclass表."""
+
+    path: Path
+    kind: str  # "output" | "prepared" | "hints" | "charclass"
+    last_used: float
+    size: int
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """cache使用量の集計."""
+
+    outputs: int
+    prepared: int
+    total_bytes: int
+
+
+def _touch(path: Path) -> None:
+    """LRU判定用に最終利用時刻 (mtime) を更新する."""
+    with contextlib.suppress(OSError):
+        os.utime(path)
+
+
+def cache_entries(root: Path) -> list[CacheEntry]:
+    """cache配下の全entryを最終利用時刻の古い順に返す."""
+    entries: list[CacheEntry] = []
+    outputs = OutputCache(root).root
+    if outputs.is_dir():
+        for entry_dir in outputs.iterdir():
+            entry_file = entry_dir / OutputCache.ENTRY_FILE
+            if entry_dir.name.startswith(".") or not entry_file.exists():
+                continue
+            size = sum(path.stat().st_size for path in entry_dir.iterdir())
+            entries.append(CacheEntry(entry_dir, "output", entry_file.stat().st_mtime, size))
+    prepared = PreparedFontCache(root).root
+    if prepared.is_dir():
+        for path in prepared.glob("*.ttf"):
+            if path.name.startswith("."):
+                continue
+            stat = path.stat()
+            entries.append(CacheEntry(path, "prepared", stat.st_mtime, stat.st_size))
+    # ヒンティング結果のcache (hintcache). glyph単位では消さず、1つのentryとして扱う.
+    hints = root / HINTS_FILENAME
+    if hints.is_file():
+        stat = hints.stat()
+        entries.append(CacheEntry(hints, "hints", stat.st_mtime, stat.st_size))
+    # 以前のversionが保存していたcodepoint分類表. 今はprocess内で作るため、残っていれば消す対象.
+    charclass = root / "charclass"
+    if charclass.is_dir():
+        for path in charclass.glob("*.bin"):
+            stat = path.stat()
+            entries.append(CacheEntry(path, "charclass", stat.st_mtime, stat.st_size))
+    entries.sort(key=lambda entry: entry.last_used)
+    return entries
+
+
+def cache_stats(root: Path) -> CacheStats:
+    """cache配下のentry数と合計サイズを返す."""
+    entries = cache_entries(root)
+    return CacheStats(
+        outputs=sum(1 for entry in entries if entry.kind == "output"),
+        prepared=sum(1 for entry in entries if entry.kind == "prepared"),
+        total_bytes=sum(entry.size for entry in entries),
+    )
+
+
+def gc(root: Path, max_bytes: int) -> list[CacheEntry]:
+    """合計サイズが max_bytes 以下になるまで、最終利用が古いentryから削除する."""
+    entries = cache_entries(root)
+    total = sum(entry.size for entry in entries)
+    removed: list[CacheEntry] = []
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        if entry.path.is_dir():
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            entry.path.unlink(missing_ok=True)
+        total -= entry.size
+        removed.append(entry)
+    return removed
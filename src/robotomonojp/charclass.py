@@ -0,0 +1,69 @@
+"""codepointごとの分類表. JP前処理の幅判定・Mono版の差分・Nerd Fontsのレンジ判定に使う.
+
+全codepoint (U+0000-U+10FFFF) について、分類のbit (CONTROL_OR_SPACE など) を1 byteずつ持つ.
+glyphごとに params のlistを線形探索したり unicodedata を引いたりせず、1回の添字参照で済む.
+表は params と unicodedata のversionから決まり、作り直しても0.2秒程度なので、processごとに1回だけ作って持つ.
+"""
+
+from __future__ import annotations
+
+import unicodedata
+
+from . import params
+
+CODEPOINTS = 0x110000
+
+# RobotoMono (Latin-1範囲) に存在しうる制御・空白文字. ENフォント側の字形を使わせる.
+CONTROL_OR_SPACE = 0x01
+# params.HANKAKU_KANA_LIST. 幅を en_width にする.
+HANKAKU_KANA = 0x02
+# params.FULLWIDTH_CODES_LIST. 幅を jp_width にする.
+FULLWIDTH = 0x04
+# East Asian Width が A (曖昧幅). Mono版で半角セルへ縮小する.
+AMBIGUOUS = 0x08
+# params.NERD_FONT_RANGES. font-patcher が書き込むglyph.
+NERD = 0x10
+
+_CONTROL_OR_SPACE_CATEGORIES = frozenset({"Cc", "Zs", "Zl", "Zp"})
+
+_table: bytes | None = None
+
+
+def build_table() -> bytes:
+    """分類表を作る."""
+    table = bytearray(CODEPOINTS)
+    for code in range(0x100):
+        if unicodedata.category(chr(code)) in _CONTROL_OR_SPACE_CATEGORIES:
+            table[code] |= CONTROL_OR_SPACE
+    for code in params.HANKAKU_KANA_LIST:
+        table[code] |= HANKAKU_KANA
+    for code in params.FULLWIDTH_CODES_LIST:
+        table[code] |= FULLWIDTH
+    east_asian_width = unicodedata.east_asian_width
+    for code in range(CODEPOINTS):
+        if east_asian_width(chr(code)) == "A":
+            table[code] |= AMBIGUOUS
+    for start, end in params.NERD_FONT_RANGES:
+        for code in range(start, end + 1):
+            table[code] |= NERD
+    return bytes(table)
+
+
+def table() -> bytes:
+    """分類表を返す. processごとに1回だけ作る."""
+    global _table
+    if _table is None:
+        _table = build_table()
+    return _table
+
+
+def classify(code: int) -> int:
+    """code の分類bit. codepointの範囲外 (FontForgeの未割り当てslotなど) は0."""
+    if not 0 <= code < CODEPOINTS:
+        return 0
+    return table()[code]
+
+
+def is_nerd(code: int) -> bool:
+    """code が Nerd Fonts のレンジに入るか."""
+    return bool(classify(code) & NERD)
@@ -0,0 +1,101 @@
+"""build のstageごとの中間成果物 (checkpoint) を保存・検証する."""
+
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+
+from .cache import file_sha256, hash_key
+
+# build のstage. 前のstageのcheckpointから次のstageを再開できる.
+#   merged:    新規フォントへ EN → JP を mergeFonts した直後 (sfd)
+#   hinted:    removeOverlap / round / autoHint / autoInstr 後 (sfd)
+#   finalized: Italic化・リガチャ削除後に書き出した Nerd Font patch前のttfとotf
+#   patched:   Nerd Font patch と nerd glyph の拡大縮小後のttf
+STAGES: tuple[str, ...] = ("merged", "hinted", "finalized", "patched")
+
+
+class Checkpoints:
+    """build 1件分のcheckpointを work_dir に置き、manifestで有効性を管理する.
+
+    各stageのkeyは build 全体の入力hash (base_key) から stage順に連鎖させて作る.
+    入力が変わればすべてのstageのkeyが変わり、古いcheckpointは使われない.
+    """
+
+    MANIFEST = "checkpoints.json"
+
+    def __init__(self, work_dir: Path, base_key: str) -> None:
+        """work_dir と build 全体の入力hashを設定する."""
+        self.work_dir = work_dir
+        self.base_key = base_key
+
+    def path(self, name: str) -> Path:
+        """checkpointファイルのpathを返す."""
+        return self.work_dir / name
+
+    def stage_key(self, stage: str) -> str:
+        """stage の入力hash. base_key と それ以前のstage名から作る."""
+        index = STAGES.index(stage)
+        return hash_key(self.base_key, *STAGES[: index + 1])
+
+    def _read_manifest(self) -> dict[str, dict[str, object]]:
+        try:
+            return json.loads(self.path(self.MANIFEST).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest: dict[str, dict[str, object]]) -> None:
+        self.path(self.MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    def is_valid(self, stage: str) -> bool:
+        """stage のcheckpointが現在の入力に対応し、ファイルが壊れていないか判定する."""
+        record = self._read_manifest().get(stage)
+        if record is None or record.get("key") != self.stage_key(stage):
+            return False
+        files = record.get("files")
+        if not isinstance(files, dict):
+            return False
+        for name, digest in files.items():
+            path = self.path(name)
+            if not path.exists() or file_sha256(path) != digest:
+                return False
+        return True
+
+    def last_valid_stage(self, stages: tuple[str, ...] = STAGES) -> str | None:
+        """stages のうち、再開に使える最も後ろのstageを返す. 無ければNone."""
+        for stage in reversed(stages):
+            if self.is_valid(stage):
+                return stage
+        return None
+
+    def save(self, stage: str, files: list[Path]) -> list[Path]:
+        """files を stage のcheckpointとして記録し、work_dir 内のpathを返す.
+
+        work_dir 外 (scratch) のファイルは work_dir にコピーしてから記録する.
+        stage を保存し直した時点で、それより後ろのstageは無効になる.
+        """
+        saved: list[Path] = []
+        for path in files:
+            target = self.path(path.name)
+            if path.resolve() != target.resolve():
+                shutil.copy(path, target)
+            saved.append(target)
+        manifest = self._read_manifest()
+        for later in STAGES[STAGES.index(stage) :]:
+            manifest.pop(later, None)
+        manifest[stage] = {
+            "key": self.stage_key(stage),
+            "files": {path.name: file_sha256(path) for path in saved},
+        }
+        self._write_manifest(manifest)
+        return saved
+
+    def reset(self) -> None:
+        """既存のcheckpointを破棄し、空のwork_dirを用意する."""
+        self.clear()
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+
+    def clear(self) -> None:
+        """work_dir ごとcheckpointを削除する."""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
@@ -1,19 +1,25 @@
-"""CLI entrypoint. typer で `generate` / `print` を提供する."""
+"""CLI entrypoint. typer で `generate` / `serve` / `print` などを提供する."""
 
 from __future__ import annotations
 
-from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, cast
 
 import typer
 
 from . import __version__
+from .cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_SIZE, format_size, parse_size
 
 if TYPE_CHECKING:
+    from .config import Config
     from .generator import BuildRequest
+    from .synthetic import Complexity, Distribution
 
 app = typer.Typer(add_completion=False, no_args_is_help=True)
+cache_app = typer.Typer(add_completion=False, no_args_is_help=True, help="cacheの確認・削除.")
+app.add_typer(cache_app, name="cache")
+bench_app = typer.Typer(add_completion=False, no_args_is_help=True, help="build時間の計測.")
+app.add_typer(bench_app, name="bench")
 
 
 StyleOption = typer.Option(
@@ -22,6 +28,22 @@ StyleOption = typer.Option(
     help="生成対象style. 複数指定可 (未指定なら4種すべて).",
 )
 
+CacheDirOption = typer.Option(
+    DEFAULT_CACHE_DIR, "--cache-dir", help="前処理済みフォントや生成結果のcache保存先."
+)
+
+CacheMaxSizeOption = typer.Option(
+    DEFAULT_CACHE_MAX_SIZE,
+    "--cache-max-size",
+    "--max-size",
+    help="cacheの上限サイズ ('512M', '8G' など). 超えた分は最終利用の古い順に削除する.",
+)
+
+
+DaemonSocketOption = typer.Option(
+    DEFAULT_CACHE_DIR / "daemon.sock", "--socket", help="常駐daemonのUnix socketのpath."
+)
+
 
 def _resolve_styles(styles: list[str] | None) -> list[str]:
     from .properties import STYLES
@@ -34,102 +56,719 @@ def _resolve_styles(styles: list[str] | None) -> list[str]:
     return styles
 
 
-def _build_request(request: BuildRequest) -> tuple[str, Path]:
-    """style 1件分を生成し、style名と出力pathを返す."""
-    from .generator import build
+def _check_unique_families(paths: list[Path], configs: list[Config]) -> None:
+    """出力先が衝突しないよう、configごとのfamilynameが重複していないか確かめる."""
+    seen: dict[str, Path] = {}
+    for path, cfg in zip(paths, configs, strict=True):
+        family = cfg.familyname_for()
+        if family in seen:
+            raise typer.BadParameter(f"{path} and {seen[family]} both generate family {family!r}")
+        seen[family] = path
 
-    return request.style, build(request)
+
+def _parse_max_size(value: str) -> int:
+    try:
+        return parse_size(value)
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+
+
+def _parse_jobs(value: str) -> int | None:
+    """--jobs の値. 'auto' ならNone (core数と空きメモリから決める)."""
+    if value == "auto":
+        return None
+    try:
+        jobs = int(value)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        raise typer.BadParameter(f"--jobs must be a positive integer or 'auto': got {value!r}")
+    return jobs
 
 
 @app.command()
 def generate(
-    config: Path = typer.Option(..., "-c", "--config", exists=True, dir_okay=False, readable=True),
+    configs: list[Path] = typer.Option(
+        ...,
+        "-c",
+        "--config",
+        exists=True,
+        dir_okay=False,
+        readable=True,
+        help="config.yaml. 複数指定すると全configを1つのtask graphで生成する.",
+    ),
     output: Path = typer.Option(Path("dist"), "-o", "--output"),
     style: list[str] | None = StyleOption,
-    jobs: int = typer.Option(4, "--jobs", "-j", min=1, help="style生成の並列数."),
+    jobs: str = typer.Option(
+        "4",
+        "--jobs",
+        "-j",
+        help="style生成の並列数. 'auto' ならcore数と空きメモリ (または --max-memory) から決める.",
+    ),
+    max_memory: str | None = typer.Option(
+        None,
+        "--max-memory",
+        help="同時に実行するtaskの見積もりピークRSSの合計の上限 ('6G' など). "
+        "超える間は次のtaskの投入を待つ.",
+    ),
     no_nerd_font: bool = typer.Option(False, "--no-nerd-font", help="Nerd Font パッチをスキップ."),
     version_suffix: str = typer.Option(
         "", "--version-suffix", help="フォントversionに付与するsuffix."
     ),
+    cache_dir: Path = CacheDirOption,
+    cache_max_size: str = CacheMaxSizeOption,
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="cacheを使わず、全style/variantを入力フォントから生成する."
+    ),
+    checkpoint: bool = typer.Option(
+        False,
+        "--checkpoint",
+        help="stageごとのcheckpointを cache-dir/work に保存し、中断しても --resume で再開できるようにする.",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="前回中断したbuildを、入力が同じなら最後に保存したstageのcheckpointから再開する "
+        "(--checkpoint を含む).",
+    ),
+    mono_delta: bool = typer.Option(
+        False,
+        "--mono-delta",
+        help="Mono版をフルbuildせず、Default版の出力から曖昧幅glyphの差分だけで作る.",
+    ),
+    derive_italic: bool = typer.Option(
+        False,
+        "--derive-italic",
+        help="Italic/BoldItalicをフルbuildせず、Regular/Boldの出力をskewして作る.",
+    ),
+    nerd_overlay: bool = typer.Option(
+        False,
+        "--nerd-overlay",
+        help="font-patcherをLatinだけのcarrierフォントに1回だけ当ててcacheし、"
+        "Nerd glyphを各出力に重ねる.",
+    ),
+    hint_shards: int = typer.Option(
+        1,
+        "--hint-shards",
+        min=1,
+        help="1つのbuildの重なり除去・ヒンティングをglyphのshardに分け、この数のprocessで並列に行う.",
+    ),
+    prepare_shards: int = typer.Option(
+        1,
+        "--prepare-shards",
+        min=1,
+        help="JPフォントのサイズ調整・strokeをglyphのshardに分け、この数のprocessで並列に行う.",
+    ),
+    verify_shards: bool = typer.Option(
+        False,
+        "--verify-shards",
+        help="--hint-shards / --prepare-shards の結果を1processでの処理結果と比べ、"
+        "違えばbuildを失敗させる.",
+    ),
+    webfont: bool = typer.Option(
+        False,
+        "--webfont",
+        help="生成後、familyごとに unicode-range で分けたWOFF2と @font-face CSSを "
+        "<family>/web に書き出す (brotli が必要).",
+    ),
+    via_daemon: bool = typer.Option(
+        False,
+        "--via-daemon",
+        help="`serve` で起動した常駐daemonにbuildを依頼し、進捗を受け取る.",
+    ),
+    daemon_socket: Path = DaemonSocketOption,
+    trace: Path | None = typer.Option(
+        None,
+        "--trace",
+        help="全workerのstageの所要時間を Chrome trace-event形式 (Perfetto で開ける) で書き出す.",
+    ),
+    plan: bool = typer.Option(
+        False,
+        "--plan",
+        help="buildせずに、過去の所要時間から --jobs 並列での投入順・critical path・"
+        "所要時間の見積もりを表示する.",
+    ),
+    scratch_dir: str | None = typer.Option(
+        None,
+        "--scratch-dir",
+        help="中間フォントの一時置き場. 'auto' なら /dev/shm などのtmpfsを使い、"
+        "空きメモリが少なければdiskに戻す.",
+    ),
 ) -> None:
-    """config.yaml から通常版とMono版のフォントを生成する."""
+    """config.yaml (複数可) から通常版とMono版のフォントを生成する.
+
+    入力・config・version・Nerd Fonts・生成コードが前回と同じ出力はcacheから復元する.
+    """
     from .config import load_config
     from .generator import BuildRequest
-
-    cfg = load_config(config)
+    from .properties import base_style_of
+    from .scratch import resolve_scratch_dir
+
+    if (resume or checkpoint) and no_cache:
+        raise typer.BadParameter(
+            "--checkpoint / --resume はcheckpointをcacheに保存するため --no-cache と併用できません"
+        )
+    if webfont and not plan:
+        _require_brotli()
+    max_bytes = _parse_max_size(cache_max_size)
+    worker_count = _parse_jobs(jobs)
+    memory_budget = _parse_max_size(max_memory) if max_memory is not None else None
+    loaded = [load_config(path) for path in configs]
+    _check_unique_families(configs, loaded)
     styles = _resolve_styles(style)
     version = f"{__version__}{version_suffix}"
+    scratch = resolve_scratch_dir(scratch_dir)
+    if scratch_dir is not None:
+        typer.echo(f"[scratch] {scratch or 'system temp dir (no tmpfs available)'}")
 
     requests = []
-    for mono in (False, True):
-        for style_name in styles:
-            variant = "Mono" if mono else "Default"
-            typer.echo(f"[generate] variant={variant} style={style_name}")
-            requests.append(
-                BuildRequest(
-                    config=cfg,
-                    style=style_name,
-                    version=version,
-                    output_dir=output,
-                    mono=mono,
-                    apply_nerd_font=not no_nerd_font,
+    for cfg in loaded:
+        for mono in (False, True):
+            for style_name in styles:
+                variant = "Mono" if mono else "Default"
+                typer.echo(
+                    f"[generate] family={cfg.familyname_for()} variant={variant} style={style_name}"
+                )
+                requests.append(
+                    BuildRequest(
+                        config=cfg,
+                        style=style_name,
+                        version=version,
+                        output_dir=output,
+                        mono=mono,
+                        apply_nerd_font=not no_nerd_font,
+                        cache_dir=None if no_cache else cache_dir,
+                        checkpoint=checkpoint,
+                        resume=resume,
+                        scratch_dir=scratch,
+                        mono_delta=mono_delta,
+                        # uprightも同じrunで生成するときだけ派生できる.
+                        italic_from_upright=derive_italic and base_style_of(style_name) in styles,
+                        nerd_overlay=nerd_overlay,
+                        hint_shards=hint_shards,
+                        prepare_shards=prepare_shards,
+                        verify_shards=verify_shards,
+                    )
                 )
-            )
 
-    if jobs == 1 or len(requests) == 1:
-        results = [_build_request(request) for request in requests]
+    if plan:
+        from .runner import plan_builds
+
+        plan_builds(
+            requests,
+            cache_dir=cache_dir,
+            no_cache=no_cache,
+            jobs=worker_count,
+            max_memory=memory_budget,
+            echo=typer.echo,
+        )
+        return
+
+    if via_daemon:
+        from .daemon import DaemonError, submit
+
+        try:
+            submit(
+                requests,
+                cache_dir=cache_dir,
+                no_cache=no_cache,
+                max_bytes=max_bytes,
+                max_memory=memory_budget,
+                trace=trace,
+                socket_path=daemon_socket,
+                echo=typer.echo,
+            )
+        except DaemonError as exc:
+            typer.echo(f"[daemon] {exc}", err=True)
+            raise typer.Exit(1) from exc
     else:
-        with ProcessPoolExecutor(max_workers=min(jobs, len(requests))) as executor:
-            results = list(executor.map(_build_request, requests))
+        from .runner import run_builds
+
+        run_builds(
+            requests,
+            cache_dir=cache_dir,
+            no_cache=no_cache,
+            max_bytes=max_bytes,
+            jobs=worker_count,
+            max_memory=memory_budget,
+            trace=trace,
+            echo=typer.echo,
+        )
+    if webfont:
+        _write_family_webfonts(requests)
+
+
+def _require_brotli() -> None:
+    """WOFF2を書き出せなければ、buildを始める前に終わらせる."""
+    from .webfont import has_brotli
+
+    if not has_brotli():
+        typer.echo("[webfont] WOFF2の書き出しには brotli が必要です (pip install brotli)", err=True)
+        raise typer.Exit(1)
+
+
+def _write_family_webfonts(requests: list[BuildRequest]) -> None:
+    """生成したttfをfamilyごとにまとめ、<family>/web にWOFF2 shard とCSSを書き出す."""
+    from .generator import output_paths
+    from .webfont import write_css
+
+    families: dict[Path, list[Path]] = {}
+    for request in requests:
+        ttf, _ = output_paths(request)
+        families.setdefault(ttf.parent, []).append(ttf)
+    for family_dir, fonts in families.items():
+        css = write_css(fonts, family_dir / "web", family_dir.name)
+        typer.echo(f"[webfont] wrote {css}")
+
+
+@app.command()
+def serve(
+    jobs: int = typer.Option(4, "--jobs", "-j", min=1, help="常駐workerの数."),
+    socket_path: Path = DaemonSocketOption,
+    stop: bool = typer.Option(False, "--stop", help="起動中のdaemonを停止する."),
+) -> None:
+    """generate --via-daemon を受け付ける常駐daemonを起動する.
+
+    workerはfontforgeと開いた前処理済みフォントを保持したまま、buildを繰り返し受け付ける.
+    """
+    from .daemon import DaemonError, serve, shutdown
+
+    try:
+        if stop:
+            shutdown(socket_path)
+            typer.echo(f"stopped daemon on {socket_path}")
+            return
+        typer.echo(f"[daemon] listening on {socket_path} (jobs={jobs})")
+        serve(socket_path, jobs)
+    except DaemonError as exc:
+        typer.echo(f"[daemon] {exc}", err=True)
+        raise typer.Exit(1) from exc
+
+
+@cache_app.command("stats")
+def cache_stats_command(cache_dir: Path = CacheDirOption) -> None:
+    """cacheのentry数と使用量を表示する."""
+    from .cache import cache_stats
+
+    stats = cache_stats(cache_dir)
+    typer.echo(f"cache dir: {cache_dir}")
+    typer.echo(f"  outputs:  {stats.outputs}")
+    typer.echo(f"  prepared: {stats.prepared}")
+    typer.echo(f"  size:     {format_size(stats.total_bytes)}")
+
+
+@cache_app.command("gc")
+def cache_gc_command(
+    cache_dir: Path = CacheDirOption,
+    max_size: str = CacheMaxSizeOption,
+) -> None:
+    """cacheが上限サイズに収まるまで、最終利用の古いentryから削除する."""
+    from .cache import gc
+
+    removed = gc(cache_dir, _parse_max_size(max_size))
+    for entry in removed:
+        typer.echo(f"removed {entry.kind} {entry.path.name} ({format_size(entry.size)})")
+    typer.echo(f"removed {len(removed)} entries")
+
+
+@bench_app.command("stages")
+def bench_stages_command(
+    glyphs: list[int] | None = typer.Option(
+        None, "--glyphs", min=2, help="JP合成フォントのglyph数. 複数指定可 (既定 1000/4000/16000)."
+    ),
+    distribution: str = typer.Option(
+        "cjk", "--distribution", help="codepointの分布: latin / cjk / mixed."
+    ),
+    complexity: str = typer.Option(
+        "medium", "--complexity", help="outlineの複雑さ: simple / medium / complex."
+    ),
+    stage: list[str] | None = typer.Option(
+        None, "--stage", help="計測するstage. 複数指定可 (未指定なら測れる全stage)."
+    ),
+    repeat: int = typer.Option(1, "--repeat", min=1, help="各計測の繰り返し数 (最小値を採る)."),
+    max_exponent: float = typer.Option(
+        1.25, "--max-exponent", help="glyph数に対する所要時間の傾きがこれを超えたら失敗にする."
+    ),
+    output: Path | None = typer.Option(None, "-o", "--output", help="結果のJSONの書き出し先."),
+    cache_dir: Path = CacheDirOption,
+) -> None:
+    """合成フォントで generator の各stageを測り、glyphs/sec と scaling を表示する.
+
+    glyph数に対して線形より速く所要時間が増えるstageがあれば exit 1 で終わる.
+    """
+    from . import stagebench
+    from .synthetic import COMPLEXITIES, DISTRIBUTIONS
+
+    if distribution not in DISTRIBUTIONS:
+        raise typer.BadParameter(f"--distribution must be one of {sorted(DISTRIBUTIONS)}")
+    if complexity not in COMPLEXITIES:
+        raise typer.BadParameter(f"--complexity must be one of {sorted(COMPLEXITIES)}")
+    stages = stagebench.available_stages()
+    if stage:
+        known = {s.name for s in stagebench.STAGES}
+        unknown = sorted(set(stage) - known)
+        if unknown:
+            raise typer.BadParameter(f"unknown stage {unknown}: choose from {sorted(known)}")
+        stages = [s for s in stages if s.name in stage]
+    skipped = [s.name for s in stagebench.STAGES if s not in stagebench.available_stages()]
+    if skipped:
+        typer.echo(f"[bench] fontforge not available, skipping: {', '.join(skipped)}")
+    if not stages:
+        raise typer.Exit(1)
+
+    results = stagebench.run(
+        stages,
+        glyphs or stagebench.DEFAULT_GLYPH_COUNTS,
+        distribution=cast("Distribution", distribution),
+        complexity=cast("Complexity", complexity),
+        repeat=repeat,
+        font_dir=cache_dir / "synthetic",
+        echo=typer.echo,
+    )
+    scalings = stagebench.analyze(results, max_exponent)
+    for scaling in scalings:
+        mark = "  SUPERLINEAR" if scaling.superlinear else ""
+        typer.echo(f"[scaling] {scaling.stage:<28} exponent {scaling.exponent:.2f}{mark}")
+    if output is not None:
+        stagebench.write_report(output, results, scalings)
+        typer.echo(f"wrote {output}")
+    if any(scaling.superlinear for scaling in scalings):
+        raise typer.Exit(1)
+
+
+BenchResultsDirOption = typer.Option(
+    Path("bench-results"), "--results-dir", help="bench run の計測結果の保存先."
+)
+
+ThresholdOption = typer.Option(
+    None,
+    "--threshold",
+    help="regressionとみなす増加率 (%). 'wall=10' の形で複数指定可"
+    " (指標: wall / cpu / rss / size. 既定 10 / 10 / 10 / 1).",
+)
+
+
+def _parse_thresholds(values: list[str] | None) -> dict[str, float]:
+    """--threshold の値を既定値に重ねる."""
+    from .buildbench import DEFAULT_THRESHOLDS
+
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for value in values or []:
+        metric, _, percent = value.partition("=")
+        if metric not in thresholds:
+            raise typer.BadParameter(
+                f"--threshold metric must be one of {sorted(thresholds)}: got {value!r}"
+            )
+        try:
+            thresholds[metric] = float(percent.rstrip("%"))
+        except ValueError as exc:
+            raise typer.BadParameter(f"--threshold must be like 'wall=10': got {value!r}") from exc
+    return thresholds
 
-    for _, path in results:
-        typer.echo(f"  -> {path}")
+
+def _report_comparison(
+    baseline_ref: str, candidate_ref: str, results_dir: Path, thresholds: dict[str, float]
+) -> None:
+    """results_dir の2つのrunを比べて表示し、regressionがあれば exit 1 で終わる."""
+    from .buildbench import compare, find_run, format_comparison, unmatched
+
+    try:
+        baseline = find_run(results_dir, baseline_ref)
+        candidate = find_run(results_dir, candidate_ref)
+    except LookupError as exc:
+        typer.echo(f"[compare] {exc}", err=True)
+        raise typer.Exit(1) from exc
+    typer.echo(
+        f"[compare] baseline {baseline.id} ({baseline.version}) -> candidate {candidate.id} ({candidate.version})"
+    )
+    if baseline.host != candidate.host:
+        typer.echo(f"[compare] warning: host differs: {baseline.host} -> {candidate.host}")
+    comparisons = compare(baseline, candidate, thresholds)
+    for comparison in comparisons:
+        typer.echo(format_comparison(comparison))
+    only_baseline, only_candidate = unmatched(baseline, candidate)
+    for key in only_baseline:
+        typer.echo(f"[compare] {key}: only in baseline")
+    for key in only_candidate:
+        typer.echo(f"[compare] {key}: only in candidate")
+    regressions = sum(comparison.regressed for comparison in comparisons)
+    typer.echo(f"[compare] {regressions} regression(s)")
+    if regressions:
+        raise typer.Exit(1)
+
+
+@bench_app.command("run")
+def bench_run_command(
+    configs: list[Path] | None = typer.Option(
+        None,
+        "-c",
+        "--config",
+        exists=True,
+        dir_okay=False,
+        readable=True,
+        help="計測するconfig. 複数指定可 (未指定なら plex / lineseed / zenkaku).",
+    ),
+    style: list[str] | None = StyleOption,
+    no_nerd_font: bool = typer.Option(False, "--no-nerd-font", help="Nerd Font パッチをスキップ."),
+    label: str = typer.Option(
+        "", "--label", help="runに付ける名前. compare で id の代わりに使える."
+    ),
+    baseline: str | None = typer.Option(
+        None, "--baseline", help="計測後に比べる run (id / label / latest / previous)."
+    ),
+    threshold: list[str] | None = ThresholdOption,
+    results_dir: Path = BenchResultsDirOption,
+) -> None:
+    """fonts/ の実フォントで build 全体を (config, style, variant) ごとに計測し、結果を保存する.
+
+    cacheは使わない. --baseline を指定すると保存した run と比べ、regressionがあれば exit 1 で終わる.
+    """
+    from . import buildbench
+    from .config import load_config
+    from .generator import BuildRequest
+
+    paths = list(configs or buildbench.DEFAULT_CONFIGS)
+    loaded = [load_config(path) for path in paths]
+    _check_unique_families(paths, loaded)
+    thresholds = _parse_thresholds(threshold)
+    version = __version__
+    requests = [
+        BuildRequest(
+            config=cfg,
+            style=style_name,
+            version=version,
+            output_dir=Path(),
+            mono=mono,
+            apply_nerd_font=not no_nerd_font,
+        )
+        for cfg in loaded
+        for mono in (False, True)
+        for style_name in _resolve_styles(style)
+    ]
+    baseline_id = None
+    if baseline is not None:
+        # 計測に何十分もかけた後で baseline が無いと分からないよう、先に確かめる.
+        try:
+            baseline_id = buildbench.find_run(results_dir, baseline).id
+        except LookupError as exc:
+            raise typer.BadParameter(str(exc)) from exc
+
+    measurements = buildbench.run(requests, echo=typer.echo)
+    bench_run = buildbench.new_run(measurements, label)
+    path = buildbench.save_run(results_dir, bench_run)
+    typer.echo(f"[bench] saved run {bench_run.id} -> {path}")
+    if baseline_id is not None:
+        _report_comparison(baseline_id, bench_run.id, results_dir, thresholds)
+
+
+@bench_app.command("compare")
+def bench_compare_command(
+    baseline: str = typer.Argument(..., help="基準の run (id / label / latest / previous)."),
+    candidate: str = typer.Argument("latest", help="比べる run (既定は最新)."),
+    threshold: list[str] | None = ThresholdOption,
+    results_dir: Path = BenchResultsDirOption,
+) -> None:
+    """保存済みの2つの run を比べ、閾値を超えて悪化した項目があれば exit 1 で終わる."""
+    _report_comparison(baseline, candidate, results_dir, _parse_thresholds(threshold))
+
+
+@bench_app.command("list")
+def bench_list_command(results_dir: Path = BenchResultsDirOption) -> None:
+    """保存済みの run を古い順に表示する."""
+    from .buildbench import list_runs
+
+    for bench_run in list_runs(results_dir):
+        label = f" [{bench_run.label}]" if bench_run.label else ""
+        commit = (bench_run.commit or "-")[:12]
+        typer.echo(
+            f"{bench_run.id}{label} version={bench_run.version} commit={commit}"
+            f" builds={len(bench_run.measurements)}"
+        )
 
 
 @app.command("print")
 def print_command(
-    font_path: Path = typer.Argument(..., exists=True, dir_okay=False, readable=True),
+    font_path: Path | None = typer.Argument(
+        None,
+        exists=True,
+        dir_okay=False,
+        readable=True,
+        help="対象フォント. --jobs-file では job file の fonts の代わりに使う.",
+    ),
     sample: str = typer.Argument("", help="レンダリングする文字列."),
-    output: Path = typer.Option(..., "-o", "--output"),
+    output: Path | None = typer.Option(None, "-o", "--output"),
     size: int | None = typer.Option(None, "--size", help="レンダリングpt."),
+    jobs_file: Path | None = typer.Option(
+        None,
+        "--jobs-file",
+        exists=True,
+        dir_okay=False,
+        readable=True,
+        help="fonts・samples・sizes を並べたYAML. フォントごとに1回だけ開いて全組をレンダリングする.",
+    ),
+    jobs: int | None = typer.Option(
+        None, "--jobs", "-j", min=1, help="--jobs-file で並列に描くprocessの数. 未指定ならcore数."
+    ),
 ) -> None:
     """指定フォントで文字列をPDFにレンダリングする."""
-    from .printer import print_pdf
+    from .printer import load_jobs, plan_jobs, print_fonts, print_pdf
 
-    result = print_pdf(font_path, sample, output, size=size)
-    typer.echo(f"wrote {result}")
+    if jobs_file is None:
+        if font_path is None or output is None:
+            raise typer.BadParameter("FONT_PATH と --output を指定してください")
+        typer.echo(f"wrote {print_pdf(font_path, sample, output, size=size)}")
+        return
+
+    if sample or output is not None or size is not None:
+        raise typer.BadParameter("--jobs-file では SAMPLE / --output / --size は job file に書く")
+    try:
+        targets = plan_jobs(load_jobs(jobs_file), [font_path] if font_path else None)
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+    for path in print_fonts(targets, jobs):
+        typer.echo(f"wrote {path}")
 
 
 @app.command()
 def eyecatch(
-    font_path: Path = typer.Argument(..., exists=True, dir_okay=False, readable=True),
-    output: Path = typer.Option(Path("eyecatch.svg"), "-o", "--output"),
+    font_paths: list[Path] = typer.Argument(
+        ..., exists=True, readable=True, help="フォント、またはフォントを探すディレクトリ."
+    ),
+    output: str = typer.Option(
+        "eyecatch.svg",
+        "-o",
+        "--output",
+        help="出力先SVG. 複数フォントでは {family} / {stem} を含むテンプレート "
+        "(例: docs/images/{family}.svg).",
+    ),
+    pattern: str = typer.Option(
+        "*-Regular.ttf", "--glob", help="ディレクトリから描くフォントのglob."
+    ),
     title: str | None = typer.Option(
         None, "--title", help="タイトル。未指定ならフォントのfamily名."
     ),
+    precision: int = typer.Option(
+        0, "--precision", min=0, help="glyph座標 (fontユニット) の小数桁数."
+    ),
+    relative: bool = typer.Option(
+        True, "--relative/--absolute", help="glyphのpathを相対/絶対コマンドで書く."
+    ),
+    jobs: int | None = typer.Option(
+        None, "--jobs", "-j", min=1, help="並列に描くprocessの数. 未指定ならcore数."
+    ),
 ) -> None:
     """指定フォントでterminal風のアイキャッチSVGを生成する."""
-    from .eyecatch import generate_eyecatch
+    from .eyecatch import eyecatch_jobs, generate_eyecatches
 
-    result = generate_eyecatch(font_path, output, title=title)
+    try:
+        targets = eyecatch_jobs(font_paths, output, pattern)
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+    if not targets:
+        raise typer.BadParameter(f"{pattern} に合うフォントがありません")
+    for path in generate_eyecatches(targets, title, precision, relative, jobs):
+        typer.echo(f"wrote {path}")
+
+
+@app.command()
+def webfont(
+    font_paths: list[Path] = typer.Argument(..., exists=True, dir_okay=False, readable=True),
+    output: Path = typer.Option(Path("web"), "-o", "--output", help="出力先ディレクトリ."),
+    name: str | None = typer.Option(
+        None, "--name", help="CSSのファイル名 (拡張子なし)。未指定なら最初のフォントのfamily名."
+    ),
+) -> None:
+    """フォントを unicode-range ごとのWOFF2 shard に分け、@font-face CSSを生成する."""
+    from .webfont import write_css
+
+    _require_brotli()
+    result = write_css(font_paths, output, name)
     typer.echo(f"wrote {result}")
 
 
 @app.command()
 def preview(
-    font_path: Path = typer.Argument(..., exists=True, dir_okay=False, readable=True),
+    font_path: Path = typer.Argument(
+        ..., exists=True, dir_okay=False, readable=True, help="ttf/otf/woff2 または webfont のCSS."
+    ),
     output: Path = typer.Option(Path("preview.html"), "-o", "--output"),
     title: str | None = typer.Option(
         None, "--title", help="ページタイトル。未指定ならフォントのfamily名."
     ),
+    embed_subset: bool = typer.Option(
+        False,
+        "--embed-subset",
+        help="表示する文字だけにsubsetしたWOFF2を data URI で埋め込み、単体で開けるHTMLにする "
+        "(brotli が必要).",
+    ),
+    atlas: bool = typer.Option(
+        False,
+        "--atlas",
+        help="SAMPLESではなくcmapの全glyphをUnicode blockごとに並べる、仮想スクロールのページにする. "
+        "WOFF2 subset を <output名>_files/ に書き出す (brotli が必要).",
+    ),
 ) -> None:
     """指定フォントを確認する静的HTMLを生成する."""
     from .preview import generate_preview
 
-    result = generate_preview(font_path, output, title=title)
+    if embed_subset or atlas:
+        if font_path.suffix.lower() == ".css":
+            raise typer.BadParameter(
+                "--embed-subset / --atlas にはフォントファイルを指定してください"
+            )
+        _require_brotli()
+    if atlas:
+        from .atlas import generate_atlas
+
+        result = generate_atlas(font_path, output, title=title)
+    else:
+        result = generate_preview(font_path, output, title=title, embed_subset=embed_subset)
     typer.echo(f"wrote {result}")
 
 
+@app.command()
+def inspect(
+    root: Path = typer.Argument(
+        Path("dist"), exists=True, file_okay=False, help="フォントを探すディレクトリ."
+    ),
+    lacks: str | None = typer.Option(
+        None, "--lacks", help="この文字 ('U+3042' / '0x3042' / 'あ') が無いフォントを表示する."
+    ),
+    families: bool = typer.Option(False, "--families", help="family名とstyleの一覧を表示する."),
+    cache_dir: Path = CacheDirOption,
+) -> None:
+    """ディレクトリ配下のフォントをindexし、name・収録文字などを表示する.
+
+    indexは cache_dir/fontindex.sqlite に保存し、変わっていないフォントは開き直さない.
+    """
+    from .fontindex import FontIndex, parse_codepoint
+
+    code: int | None = None
+    if lacks is not None:
+        try:
+            code = parse_codepoint(lacks)
+        except ValueError as exc:
+            raise typer.BadParameter(str(exc)) from exc
+
+    index = FontIndex(cache_dir)
+    result = index.update(root)
+    typer.echo(
+        f"indexed {result.indexed}, reused {result.reused}, removed {result.removed}", err=True
+    )
+    if code is not None:
+        for record in index.lacking(code, root):
+            typer.echo(record.path)
+    elif families:
+        for family, styles in index.families(root).items():
+            typer.echo(f"{family}: {', '.join(styles)}")
+    else:
+        for record in index.records(root):
+            typer.echo(
+                f"{record.path}\t{record.family}\t{record.style}\t"
+                f"{record.glyph_count} glyphs\t{record.codepoint_count} codepoints"
+            )
+
+
 def main() -> None:
     """`robotomonojp` entrypoint (project.scripts から呼ばれる)."""
     app()
@@ -0,0 +1,229 @@
+"""generate を受け付ける常駐daemon と、そのclient.
+
+daemon は Unix socket で待ち受け、常駐workerのprocess poolでbuildを実行する.
+workerはfontforgeのimport・入力フォントのhash・開いた前処理済みフォントを
+buildをまたいで保持するため、configを調整しながらの再生成が速くなる.
+
+protocolはJSON lines. clientは1行のrequestを送り、daemonは
+{"event": "log"} を1行ずつ返した後、{"event": "done"} か {"event": "error"} で終える.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import socket
+import socketserver
+import threading
+import traceback
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, fields
+from pathlib import Path
+from typing import Any
+
+from .cache import DEFAULT_CACHE_DIR, code_fingerprint
+from .config import Config
+from .generator import BuildRequest, keep_prepared_fonts
+from .runner import run_builds
+
+DEFAULT_SOCKET_PATH = DEFAULT_CACHE_DIR / "daemon.sock"
+# worker 1つが開いたまま保持する前処理済みフォント数 (EN/JP × Regular/Bold 程度).
+PREPARED_FONTS_PER_WORKER = 4
+
+_PATH_FIELDS = frozenset({"output_dir", "nerd_fonts_root", "cache_dir", "scratch_dir"})
+
+
+class DaemonError(RuntimeError):
+    """daemonへの接続失敗や、daemon側のbuild失敗時に投げる."""
+
+
+def request_to_json(request: BuildRequest) -> dict[str, Any]:
+    """BuildRequest をJSON化できるdictにする."""
+    data = asdict(request)
+    data["config"] = request.config.model_dump(mode="json")
+    for name in _PATH_FIELDS:
+        if data[name] is not None:
+            data[name] = str(data[name])
+    return data
+
+
+def request_from_json(data: dict[str, Any]) -> BuildRequest:
+    """request_to_json の逆変換."""
+    values = {field.name: data[field.name] for field in fields(BuildRequest) if field.name in data}
+    values["config"] = Config.model_validate(values["config"])
+    for name in _PATH_FIELDS & values.keys():
+        if values[name] is not None:
+            values[name] = Path(values[name])
+    return BuildRequest(**values)
+
+
+def _init_worker() -> None:
+    keep_prepared_fonts(PREPARED_FONTS_PER_WORKER)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """1接続 = 1 request を処理する."""
+
+    server: DaemonServer
+
+    def _send(self, event: dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def handle(self) -> None:
+        try:
+            message = json.loads(self.rfile.readline())
+            op = message.get("op")
+            if op == "ping":
+                self._send({"event": "done", "pid": os.getpid(), "jobs": self.server.jobs})
+            elif op == "shutdown":
+                self._send({"event": "done"})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            elif op == "generate":
+                outputs = self.server.generate(message, lambda line: self._send(_log(line)))
+                self._send({"event": "done", "outputs": [str(path) for path in outputs]})
+            else:
+                self._send({"event": "error", "message": f"unknown op: {op!r}"})
+        except Exception as exc:
+            # daemonは落とさず、失敗をclientへ返す.
+            self._send({"event": "error", "message": f"{exc}\n{traceback.format_exc()}"})
+
+
+def _log(line: str) -> dict[str, Any]:
+    return {"event": "log", "message": line}
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Unix socketで generate を受け付け、常駐workerでbuildする.
+
+    同じ出力先への並行buildを避けるため、接続は1つずつ順に処理する.
+    """
+
+    def __init__(self, socket_path: Path, jobs: int) -> None:
+        """socket_path で待ち受け、jobs 個のworkerを用意する."""
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if socket_path.exists():
+            if ping(socket_path) is not None:
+                raise DaemonError(f"daemon is already running on {socket_path}")
+            socket_path.unlink()
+        super().__init__(str(socket_path), _Handler)
+        self.socket_path = socket_path
+        self.jobs = jobs
+        # daemonとworkerが起動時にimportした生成コード. cache keyはディスク上のコードから作るため、
+        # 食い違ったままbuildすると古いコードの結果を新しいコードのkeyで保存してしまう.
+        self.code = code_fingerprint()
+        self.executor = self._new_executor()
+
+    def generate(self, message: dict[str, Any], echo: Callable[[str], None]) -> list[Path]:
+        """client から受け取った generate requestを実行する."""
+        # configの入力フォントpathはclientのcwdからの相対pathで書かれている.
+        if Path(message["cwd"]).resolve() != Path.cwd().resolve():
+            raise DaemonError(
+                f"daemon runs in {Path.cwd()}, but client runs in {message['cwd']}; "
+                "start `serve` in the same directory"
+            )
+        if code_fingerprint() != self.code:
+            raise DaemonError("code changed since the daemon started; restart `serve`")
+        requests = [request_from_json(data) for data in message["requests"]]
+        try:
+            return run_builds(
+                requests,
+                cache_dir=Path(message["cache_dir"]),
+                no_cache=message["no_cache"],
+                max_bytes=message["max_bytes"],
+                jobs=self.jobs,
+                max_memory=message.get("max_memory"),
+                trace=Path(message["trace"]) if message.get("trace") else None,
+                echo=echo,
+                executor=self.executor,
+            )
+        except BrokenProcessPool:
+            # workerが落ちた (FontForgeのsegfaultなど). 次のrequestのためにpoolを作り直す.
+            self.executor = self._new_executor()
+            raise
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker)
+
+    def server_close(self) -> None:
+        """socketを閉じてworkerを止め、socketファイルを消す."""
+        super().server_close()
+        self.executor.shutdown(cancel_futures=True)
+        self.socket_path.unlink(missing_ok=True)
+
+
+def serve(socket_path: Path = DEFAULT_SOCKET_PATH, jobs: int = 4) -> None:
+    """daemonを起動し、shutdown requestか割り込みまで待ち受ける."""
+    with DaemonServer(socket_path, jobs) as server, contextlib.suppress(KeyboardInterrupt):
+        server.serve_forever()
+
+
+def _request(socket_path: Path, message: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    """daemonに message を送り、返ってくるeventを順に返す."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except OSError as exc:
+            raise DaemonError(
+                f"daemon is not running on {socket_path} (start it with `serve`): {exc}"
+            ) from exc
+        sock.sendall(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as stream:
+            for line in stream:
+                yield json.loads(line)
+
+
+def _final_event(events: Iterator[dict[str, Any]], echo: Callable[[str], None]) -> dict[str, Any]:
+    for event in events:
+        if event["event"] == "log":
+            echo(event["message"])
+        elif event["event"] == "error":
+            raise DaemonError(event["message"])
+        else:
+            return event
+    raise DaemonError("daemon closed the connection without a result")
+
+
+def ping(socket_path: Path = DEFAULT_SOCKET_PATH) -> dict[str, Any] | None:
+    """daemonが応答すれば pid などを返す. 起動していなければNone."""
+    try:
+        return _final_event(_request(socket_path, {"op": "ping"}), print)
+    except DaemonError:
+        return None
+
+
+def shutdown(socket_path: Path = DEFAULT_SOCKET_PATH) -> None:
+    """daemonを停止する."""
+    _final_event(_request(socket_path, {"op": "shutdown"}), print)
+
+
+def submit(
+    requests: list[BuildRequest],
+    *,
+    cache_dir: Path,
+    no_cache: bool,
+    max_bytes: int,
+    max_memory: int | None = None,
+    trace: Path | None = None,
+    socket_path: Path = DEFAULT_SOCKET_PATH,
+    echo: Callable[[str], None] = print,
+) -> list[Path]:
+    """requests をdaemonでbuildし、進捗を echo に流して出力ttfのpathを返す.
+
+    workerの数はdaemonの起動時に決まるため、max_memory だけを渡す.
+    """
+    message = {
+        "op": "generate",
+        "cwd": str(Path.cwd()),
+        "requests": [request_to_json(request) for request in requests],
+        "cache_dir": str(cache_dir),
+        "no_cache": no_cache,
+        "max_bytes": max_bytes,
+        "max_memory": max_memory,
+        "trace": str(trace) if trace is not None else None,
+    }
+    event = _final_event(_request(socket_path, message), echo)
+    return [Path(path) for path in event["outputs"]]
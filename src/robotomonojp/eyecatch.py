@@ -6,9 +6,13 @@
 
 from __future__ import annotations
 
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Any, cast
 
+from fontTools.pens.basePen import BasePen
+
 # 配色 (docs/images/font_preview.png とdotfiles bannerを踏襲)
 BACKDROP_COLOR = "#4A90E2"
 WINDOW_COLOR = "#282C34"
@@ -26,6 +30,9 @@ WINDOW_WIDTH = CANVAS_WIDTH - WINDOW_X * 2
 WINDOW_HEIGHT = CANVAS_HEIGHT - WINDOW_Y * 2
 CONTENT_X = 148
 
+# glyph座標 (fontユニット) の小数桁数. BODY_SIZE でも1 unitは0.02px未満なので整数で足りる.
+DEFAULT_PRECISION = 0
+
 TITLE_SIZE = 54
 BODY_SIZE = 32
 LINE_HEIGHT = 40
@@ -46,27 +53,122 @@ SAMPLE_LINES: list[tuple[str, str]] = [
 ]
 
 
+def _format_number(value: float, precision: int) -> str:
+    """value を小数 precision 桁に丸め、末尾の0と "-0" を除いた文字列にする."""
+    text = f"{round(value, precision):.{precision}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+class _PathPen(BasePen):
+    """glyphの輪郭をSVG pathのd属性にするpen.
+
+    座標を precision 桁に丸め、relative なら相対コマンドで書く. componentは glyph_set から分解する.
+    """
+
+    def __init__(self, glyph_set: Any, precision: int, relative: bool) -> None:
+        """空のpathを作る."""
+        super().__init__(glyph_set)
+        self.precision = precision
+        self.relative = relative
+        self.commands: list[str] = []
+        # 丸めた後の現在点. 相対コマンドの差分はこれから取り、誤差を溜めない.
+        self._last = (0.0, 0.0)
+        self._start = (0.0, 0.0)
+
+    def _round(self, pt: tuple[float, float]) -> tuple[float, float]:
+        return round(pt[0], self.precision), round(pt[1], self.precision)
+
+    def _number(self, value: float) -> str:
+        return _format_number(value, self.precision)
+
+    def _emit(self, command: str, *points: tuple[float, float]) -> None:
+        rounded = [self._round(pt) for pt in points]
+        ox, oy = self._last if self.relative else (0.0, 0.0)
+        numbers = " ".join(f"{self._number(x - ox)} {self._number(y - oy)}" for x, y in rounded)
+        self.commands.append((command.lower() if self.relative else command) + numbers)
+        self._last = rounded[-1]
+
+    def _moveTo(self, pt: tuple[float, float]) -> None:
+        self._emit("M", pt)
+        self._start = self._last
+
+    def _lineTo(self, pt: tuple[float, float]) -> None:
+        x, y = self._round(pt)
+        last_x, last_y = self._last
+        if (x, y) == self._last:
+            return
+        if y != last_y and x != last_x:
+            self._emit("L", (x, y))
+            return
+        # 水平・垂直の直線は座標1つの H / V にする.
+        if y == last_y:
+            command, value = "H", x - last_x if self.relative else x
+        else:
+            command, value = "V", y - last_y if self.relative else y
+        self.commands.append((command.lower() if self.relative else command) + self._number(value))
+        self._last = (x, y)
+
+    def _curveToOne(
+        self, pt1: tuple[float, float], pt2: tuple[float, float], pt3: tuple[float, float]
+    ) -> None:
+        self._emit("C", pt1, pt2, pt3)
+
+    def _qCurveToOne(self, pt1: tuple[float, float], pt2: tuple[float, float]) -> None:
+        self._emit("Q", pt1, pt2)
+
+    def _closePath(self) -> None:
+        self.commands.append("z" if self.relative else "Z")
+        self._last = self._start
+
+    def _endPath(self) -> None:
+        self._last = self._start
+
+
 class _FontOutline:
-    """fontToolsでglyph outlineをSVG path化するヘルパー."""
+    """fontToolsでglyph outlineをSVG path化するヘルパー.
+
+    glyphのpathは <defs> に1回だけ書き、文字ごとに <use> で参照する.
+    """
 
-    def __init__(self, font_path: Path) -> None:
+    def __init__(
+        self, font_path: Path, precision: int = DEFAULT_PRECISION, relative: bool = True
+    ) -> None:
         """フォントを読み込み、glyph set / cmap / upem を用意する."""
         from fontTools.ttLib import TTFont
 
-        self._font = TTFont(str(font_path))
+        # 使うのはcmap・hmtx・サンプル文字のglyf/CFF・nameだけ. lazy で他のglyphは展開しない.
+        self._font = TTFont(str(font_path), lazy=True)
         self._glyph_set = self._font.getGlyphSet()
         self._cmap: dict[int, str] = self._font.getBestCmap() or {}
         self.upem: int = cast(Any, self._font["head"]).unitsPerEm
+        self._precision = precision
+        self._relative = relative
+        # glyph名 → d属性. 空のglyphは "".
+        self._paths: dict[str, str] = {}
+        # glyph名 → <defs> のid. 参照された順に振る.
+        self._ids: dict[str, str] = {}
 
     def family_name(self) -> str:
         """フォントのfamily名を返す."""
         name = self._font["name"].getBestFamilyName()
         return name or "Unknown"
 
-    def text_paths(self, text: str) -> str:
-        """テキストをglyphごとの <path> 群 (fontユニット座標) に変換する."""
-        from fontTools.pens.svgPathPen import SVGPathPen
+    def close(self) -> None:
+        """フォントファイルを閉じる."""
+        self._font.close()
 
+    def glyph_path(self, glyph_name: str) -> str:
+        """glyph のd属性 (fontユニット座標). フォントごとにcacheする."""
+        if glyph_name not in self._paths:
+            pen = _PathPen(self._glyph_set, self._precision, self._relative)
+            self._glyph_set[glyph_name].draw(pen)
+            self._paths[glyph_name] = "".join(pen.commands)
+        return self._paths[glyph_name]
+
+    def text_paths(self, text: str) -> str:
+        """テキストをglyphごとの <use> 群 (fontユニット座標) に変換する."""
         parts: list[str] = []
         x = 0
         for ch in text:
@@ -74,15 +176,19 @@ class _FontOutline:
             if glyph_name is None:
                 x += self.upem // 2
                 continue
-            glyph = self._glyph_set[glyph_name]
-            pen = SVGPathPen(self._glyph_set)
-            glyph.draw(pen)
-            commands = pen.getCommands()
-            if commands:
-                parts.append(f'<path transform="translate({x} 0)" d="{commands}"/>')
-            x += glyph.width
+            if self.glyph_path(glyph_name):
+                glyph_id = self._ids.setdefault(glyph_name, f"g{len(self._ids)}")
+                parts.append(f'<use href="#{glyph_id}" x="{x}"/>')
+            x += self._glyph_set[glyph_name].width
         return "".join(parts)
 
+    def defs(self) -> str:
+        """text_paths で参照したglyphの <path> 群."""
+        return "".join(
+            f'<path id="{glyph_id}" d="{self._paths[glyph_name]}"/>'
+            for glyph_name, glyph_id in self._ids.items()
+        )
+
 
 def _text_group(outline: _FontOutline, text: str, x: int, y: int, size: float, fill: str) -> str:
     """テキスト1行をSVGグループにする. yはbaseline位置 (px)."""
@@ -91,15 +197,23 @@ def _text_group(outline: _FontOutline, text: str, x: int, y: int, size: float, f
     return f'<g transform="translate({x} {y}) scale({scale:.6f} -{scale:.6f})" fill="{fill}">{paths}</g>'
 
 
-def generate_eyecatch(font_path: Path, output: Path, title: str | None = None) -> Path:
+def generate_eyecatch(
+    font_path: Path,
+    output: Path,
+    title: str | None = None,
+    precision: int = DEFAULT_PRECISION,
+    relative: bool = True,
+) -> Path:
     """指定フォントでterminal風アイキャッチSVGを生成する.
 
     Args:
         font_path: 描画に使うttf/otfのpath.
         output: 出力先SVGのpath.
         title: タイトル文字列. 未指定ならフォントのfamily名.
+        precision: glyph座標 (fontユニット) の小数桁数.
+        relative: glyphのpathを相対コマンドで書く.
     """
-    outline = _FontOutline(font_path)
+    outline = _FontOutline(font_path, precision=precision, relative=relative)
     title_text = title or outline.family_name()
 
     body: list[str] = []
@@ -118,6 +232,9 @@ def generate_eyecatch(font_path: Path, output: Path, title: str | None = None) -
         fill = ACCENT_COLOR if kind == "accent" else TEXT_COLOR
         body.append(_text_group(outline, text, CONTENT_X, baseline, BODY_SIZE, fill))
 
+    defs = outline.defs()
+    outline.close()
+
     svg = f"""<svg xmlns="http://www.w3.org/2000/svg" width="{CANVAS_WIDTH}" height="{CANVAS_HEIGHT}" viewBox="0 0 {CANVAS_WIDTH} {CANVAS_HEIGHT}" role="img" aria-label="{title_text}">
   <defs>
     <linearGradient id="title" x1="0" y1="0" x2="1" y2="0">
@@ -125,6 +242,7 @@ def generate_eyecatch(font_path: Path, output: Path, title: str | None = None) -
       <stop offset="50%" stop-color="{TITLE_GRADIENT[1]}"/>
       <stop offset="100%" stop-color="{TITLE_GRADIENT[2]}"/>
     </linearGradient>
+    {defs}
   </defs>
   <rect width="{CANVAS_WIDTH}" height="{CANVAS_HEIGHT}" fill="{BACKDROP_COLOR}"/>
   <rect x="{WINDOW_X}" y="{WINDOW_Y}" width="{WINDOW_WIDTH}" height="{WINDOW_HEIGHT}" rx="16" fill="{WINDOW_COLOR}" stroke="{WINDOW_BORDER_COLOR}"/>
@@ -135,3 +253,56 @@ def generate_eyecatch(font_path: Path, output: Path, title: str | None = None) -
     output.parent.mkdir(parents=True, exist_ok=True)
     output.write_text(svg, encoding="utf-8")
     return output
+
+
+# ディレクトリを渡したときに描くフォント.
+DEFAULT_FONT_GLOB = "*-Regular.ttf"
+
+
+def eyecatch_jobs(
+    paths: list[Path], output: str, pattern: str = DEFAULT_FONT_GLOB
+) -> list[tuple[Path, Path]]:
+    """フォント (ディレクトリなら配下の pattern に合うフォント) ごとの (フォント, 出力SVG).
+
+    output は {stem} (ファイル名の拡張子以外) と {family} ({stem} から "-<style>" を除いたもの)
+    を含むテンプレート. 含まなければ1つのフォントの出力pathとして扱う.
+    """
+    fonts: list[Path] = []
+    for path in paths:
+        fonts.extend(sorted(path.rglob(pattern)) if path.is_dir() else [path])
+    if "{" not in output:
+        if len(fonts) != 1:
+            raise ValueError(
+                f"{len(fonts)}個のフォントに1つの出力pathは使えません. "
+                "{family} / {stem} を含むテンプレートを指定してください"
+            )
+        return [(fonts[0], Path(output))]
+    jobs: list[tuple[Path, Path]] = []
+    for font in fonts:
+        family = font.stem.rsplit("-", 1)[0]
+        jobs.append((font, Path(output.format(stem=font.stem, family=family))))
+    outputs = [svg for _, svg in jobs]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError(f"出力pathが重複します: {output}")
+    return jobs
+
+
+def generate_eyecatches(
+    jobs: list[tuple[Path, Path]],
+    title: str | None = None,
+    precision: int = DEFAULT_PRECISION,
+    relative: bool = True,
+    workers: int | None = None,
+) -> list[Path]:
+    """jobs の (フォント, 出力SVG) を別processで並列に描き、出力pathを jobs の順に返す."""
+    if len(jobs) <= 1 or workers == 1:
+        return [
+            generate_eyecatch(font, svg, title=title, precision=precision, relative=relative)
+            for font, svg in jobs
+        ]
+    with ProcessPoolExecutor(max_workers=min(len(jobs), workers or os.cpu_count() or 1)) as pool:
+        futures = [
+            pool.submit(generate_eyecatch, font, svg, title, precision, relative)
+            for font, svg in jobs
+        ]
+        return [future.result() for future in futures]
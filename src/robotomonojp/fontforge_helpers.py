@@ -110,36 +110,55 @@ def fix_all_glyph_points(font: Any, do_round: bool = False, add_extrema: bool =
             glyph.addExtrema("all")
 
 
+def skew_factor(italic_angle: float) -> float:
+    """skew_matrix の x += factor * y の factor. angleが負なら正 (右上がり)."""
+    return math.tan(-1 * italic_angle * math.pi / 180)
+
+
 def skew_matrix(italic_angle: float) -> Any:
     """italic_angle (度) から skew 行列を作る. angleが負なら右上がりのItalic."""
     rot_rad = -1 * italic_angle * math.pi / 180
     return psMat.skew(rot_rad)
 
 
+# make_italic で skew するcodepointレンジ (両端含む).
+ITALIC_CODEPOINT_RANGES: tuple[tuple[int, int], ...] = (
+    (0x21, 0x217F),
+    (0x2460, 0x24EA),
+    (0x2768, 0x277E),
+    (0x27E6, 0x27EB),
+    (0x2987, 0x2998),
+    (0x2E18, 0x2E18),
+    (0x2E22, 0x2E2E),
+    (0x2E8E, 0xFFE5),
+    (0x1F100, 0x1F100),
+    (0x20B9F, 0x2F920),
+)
+
+# make_italic で skew するglyph名レンジ (encoding順、両端含む).
+# Regular/Boldでcodepointが異なるため名前で指定する.
+ITALIC_GLYPH_NAME_RANGES: tuple[tuple[str, str], ...] = (
+    (".notdef", "uni301F.half"),
+    ("acute.half", "zero.alt01"),
+)
+
+
 def make_italic(font: Any, italic_angle: float) -> None:
     """フォント全体を skew してItalic化する. 旧 utils.make_italic を移植."""
     transform_mat = skew_matrix(italic_angle)
 
     def select_more(start: int | str, end: int | str | None = None) -> None:
-        if end is None:
+        if end is None or end == start:
             font.selection.select(("more", "encoding"), start)
         else:
             font.selection.select(("more", "ranges", "encoding"), start, end)
 
-    select_more(0x21, 0x217F)
-    select_more(0x2460, 0x24EA)
-    select_more(0x2768, 0x277E)
-    select_more(0x27E6, 0x27EB)
-    select_more(0x2987, 0x2998)
-    select_more(0x2E18)
-    select_more(0x2E22, 0x2E2E)
-    select_more(0x2E8E, 0xFFE5)
-    select_more(0x1F100)
-    select_more(0x20B9F, 0x2F920)
+    for start, end in ITALIC_CODEPOINT_RANGES:
+        select_more(start, end)
     # コードポイントを名前で指定する範囲 (Regular/Boldでcodepointが異なるため).
     try:
-        select_more(".notdef", "uni301F.half")
-        select_more("acute.half", "zero.alt01")
+        for start_name, end_name in ITALIC_GLYPH_NAME_RANGES:
+            select_more(start_name, end_name)
     except Exception:  # noqa: BLE001 - glyph名が無い環境ではスキップ
         pass
     font.transform(transform_mat)
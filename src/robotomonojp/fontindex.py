@@ -0,0 +1,275 @@
+"""ディレクトリ配下のフォントの name・style・収録文字・metrics をまとめたSQLite index (inspect).
+
+family名やstyle、ある文字を収録しているかを調べるたびにフォントを開き直すと、CJKフォントでは
+1つ数百msかかる. path・サイズ・mtimeが前回と同じフォントは index の値を使い、
+変わったフォントだけを fontTools で読み直す. 収録文字は U+0000〜U+10FFFF の
+bitmap (zlib圧縮) で持ち、「ある文字が無いフォント」をフォントを開かずに答える.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import zlib
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, cast
+
+from fontTools.ttLib import TTFont
+
+from .cache import FONTINDEX_FILENAME, file_sha256
+from .charclass import CODEPOINTS
+
+# index するフォントの拡張子.
+FONT_SUFFIXES = (".ttf", ".otf")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fonts (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    family TEXT NOT NULL,
+    style TEXT NOT NULL,
+    full_name TEXT NOT NULL,
+    postscript_name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    weight INTEGER NOT NULL,
+    italic INTEGER NOT NULL,
+    glyph_count INTEGER NOT NULL,
+    codepoint_count INTEGER NOT NULL,
+    metrics TEXT NOT NULL,
+    coverage BLOB NOT NULL
+);
+"""
+_COLUMNS = (
+    "path",
+    "size",
+    "mtime_ns",
+    "sha256",
+    "family",
+    "style",
+    "full_name",
+    "postscript_name",
+    "version",
+    "weight",
+    "italic",
+    "glyph_count",
+    "codepoint_count",
+    "metrics",
+    "coverage",
+)
+
+
+@dataclass(frozen=True)
+class FontRecord:
+    """index の1フォント分. coverage は codepoint ごとに1bitの bitmap (zlib圧縮)."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    family: str
+    style: str
+    full_name: str
+    postscript_name: str
+    version: str
+    weight: int
+    italic: bool
+    glyph_count: int
+    codepoint_count: int
+    metrics: dict[str, int] = field(compare=False)
+    coverage: bytes = field(repr=False)
+
+    def covers(self, code: int) -> bool:
+        """code のglyphを収録しているか."""
+        return _has_bit(zlib.decompress(self.coverage), code)
+
+
+@dataclass(frozen=True)
+class UpdateResult:
+    """FontIndex.update で読み直した・そのまま使った・index から消したフォントの数."""
+
+    indexed: int
+    reused: int
+    removed: int
+
+
+def coverage_bitmap(codepoints: list[int]) -> bytes:
+    """codepoints を U+0000〜U+10FFFF の bitmap にし、zlibで圧縮する."""
+    bitmap = bytearray(CODEPOINTS // 8)
+    for code in codepoints:
+        if 0 <= code < CODEPOINTS:
+            bitmap[code >> 3] |= 1 << (code & 7)
+    return zlib.compress(bytes(bitmap), 9)
+
+
+def _has_bit(bitmap: bytes, code: int) -> bool:
+    return 0 <= code < CODEPOINTS and bool(bitmap[code >> 3] & (1 << (code & 7)))
+
+
+def _name(font: TTFont, *name_ids: int) -> str:
+    """name table の name_ids のうち最初にあるもの (英語を優先)."""
+    table = font["name"]
+    for name_id in name_ids:
+        record = table.getName(name_id, 3, 1, 0x409) or table.getName(name_id, 1, 0, 0)
+        if record is None:
+            record = next((r for r in table.names if r.nameID == name_id), None)
+        if record is not None:
+            return str(record.toUnicode())
+    return ""
+
+
+def read_font(path: Path) -> FontRecord:
+    """path のフォントを fontTools で読み、index の1行にする."""
+    stat = path.stat()
+    font = TTFont(str(path), lazy=True)
+    try:
+        os2 = cast(Any, font["OS/2"])
+        hhea = cast(Any, font["hhea"])
+        codepoints = list(font.getBestCmap() or {})
+        metrics = {
+            "units_per_em": int(cast(Any, font["head"]).unitsPerEm),
+            "hhea_ascent": int(hhea.ascent),
+            "hhea_descent": int(hhea.descent),
+            "hhea_line_gap": int(hhea.lineGap),
+            "typo_ascender": int(os2.sTypoAscender),
+            "typo_descender": int(os2.sTypoDescender),
+            "typo_line_gap": int(os2.sTypoLineGap),
+            "win_ascent": int(os2.usWinAscent),
+            "win_descent": int(os2.usWinDescent),
+            "x_height": int(getattr(os2, "sxHeight", 0)),
+            "cap_height": int(getattr(os2, "sCapHeight", 0)),
+            "average_width": int(os2.xAvgCharWidth),
+        }
+        return FontRecord(
+            path=str(path.resolve()),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            sha256=file_sha256(path),
+            family=_name(font, 16, 1),
+            style=_name(font, 17, 2),
+            full_name=_name(font, 4),
+            postscript_name=_name(font, 6),
+            version=_name(font, 5),
+            weight=int(os2.usWeightClass),
+            italic=bool(os2.fsSelection & 1),
+            glyph_count=len(font.getGlyphOrder()),
+            codepoint_count=len(codepoints),
+            metrics=metrics,
+            coverage=coverage_bitmap(codepoints),
+        )
+    finally:
+        font.close()
+
+
+def _to_row(record: FontRecord) -> tuple[object, ...]:
+    values = {
+        **record.__dict__,
+        "metrics": json.dumps(record.metrics),
+        "italic": int(record.italic),
+    }
+    return tuple(values[column] for column in _COLUMNS)
+
+
+def _from_row(row: tuple[Any, ...]) -> FontRecord:
+    values = dict(zip(_COLUMNS, row, strict=True))
+    values["metrics"] = json.loads(values["metrics"])
+    values["italic"] = bool(values["italic"])
+    return FontRecord(**values)
+
+
+def parse_codepoint(value: str) -> int:
+    """'U+3042' / '0x3042' / 'あ' を codepoint にする."""
+    text = value.strip()
+    upper = text.upper()
+    if upper.startswith(("U+", "0X")):
+        return int(text[2:], 16)
+    if len(text) == 1:
+        return ord(text)
+    raise ValueError(f"invalid codepoint: {value!r} (expected e.g. 'U+3042' or 'あ')")
+
+
+class FontIndex:
+    """cache_dir/fontindex.sqlite の読み書き."""
+
+    def __init__(self, cache_dir: Path) -> None:
+        """cache_dir 直下の fontindex.sqlite を使う. ファイルは最初の読み書きで作る."""
+        self.path = cache_dir / FONTINDEX_FILENAME
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.path)) as connection:
+            connection.executescript(_SCHEMA)
+            with connection:
+                yield connection
+
+    def update(self, root: Path) -> UpdateResult:
+        """root 配下のフォントを index に反映する.
+
+        path・サイズ・mtimeが index と同じフォントは読まない. 消えたフォントは index から消す.
+        """
+        paths = sorted(
+            path
+            for path in root.rglob("*")
+            if path.suffix.lower() in FONT_SUFFIXES and path.is_file()
+        )
+        with self._connect() as connection:
+            known = {
+                path: (size, mtime_ns)
+                for path, size, mtime_ns in connection.execute(
+                    "SELECT path, size, mtime_ns FROM fonts"
+                )
+            }
+            indexed = reused = 0
+            seen: set[str] = set()
+            for path in paths:
+                key = str(path.resolve())
+                seen.add(key)
+                stat = path.stat()
+                if known.get(key) == (stat.st_size, stat.st_mtime_ns):
+                    reused += 1
+                    continue
+                connection.execute(
+                    f"INSERT OR REPLACE INTO fonts ({', '.join(_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                    _to_row(read_font(path)),
+                )
+                indexed += 1
+            prefix = str(root.resolve())
+            stale = [
+                path for path in known if path not in seen and Path(path).is_relative_to(prefix)
+            ]
+            connection.executemany("DELETE FROM fonts WHERE path = ?", [(p,) for p in stale])
+        return UpdateResult(indexed, reused, len(stale))
+
+    def records(self, root: Path | None = None) -> list[FontRecord]:
+        """index のフォントを path 順に返す. root を渡せばその配下だけ."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM fonts ORDER BY path"
+            ).fetchall()
+        records = [_from_row(row) for row in rows]
+        if root is None:
+            return records
+        prefix = root.resolve()
+        return [record for record in records if Path(record.path).is_relative_to(prefix)]
+
+    def lacking(self, code: int, root: Path | None = None) -> list[FontRecord]:
+        """code のglyphを収録していないフォント."""
+        return [record for record in self.records(root) if not record.covers(code)]
+
+    def families(self, root: Path | None = None) -> dict[str, list[str]]:
+        """family名 → style の一覧 (weight・italic順)."""
+        families: dict[str, list[tuple[int, bool, str]]] = {}
+        for record in self.records(root):
+            families.setdefault(record.family, []).append(
+                (record.weight, record.italic, record.style)
+            )
+        return {
+            family: list(dict.fromkeys(style for *_, style in sorted(styles)))
+            for family, styles in sorted(families.items())
+        }
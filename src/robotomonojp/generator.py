@@ -4,24 +4,35 @@ from __future__ import annotations
 
 import shutil
 import tempfile
-import unicodedata
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from datetime import date
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
-from . import params, properties
+from fontTools.ttLib import TTFont
+
+from . import __version__, charclass, params, properties, tracing
+from .cache import PreparedFontCache, code_fingerprint, file_sha256, hash_key
+from .checkpoint import STAGES, Checkpoints
 from .config import Config, parse_codepoint_range
 from .fontforge_helpers import (
+    ITALIC_CODEPOINT_RANGES,
     clear_font_glyph,
     fix_all_glyph_points,
     fontforge,
     make_italic,
     psMat,
     remove_glyphs_with_features,
+    skew_matrix,
 )
-from .patcher import DEFAULT_NERD_FONTS_ROOT
+from .hintcache import HintCache, Program, dump_glyph, hint_context, outline_key, restore_glyph
+from .italic import derive_italic
+from .nerd_overlay import carrier_signature, make_carrier, overlay_nerd_glyphs
+from .patcher import DEFAULT_NERD_FONTS_ROOT, nerd_fonts_revision
 from .patcher import patch as run_nerd_font_patch
+from .scratch import IOStats, scratch_root
+from .sharding import ShardMismatchError, run_shards, shard_count, split_by_codepoint
 
 
 @dataclass(frozen=True)
@@ -35,6 +46,63 @@ class BuildRequest:
     mono: bool = False
     apply_nerd_font: bool = True
     nerd_fonts_root: Path = DEFAULT_NERD_FONTS_ROOT
+    # 前処理済みEN/JPフォントとcheckpointの保存先. Noneならbuildごとの一時ディレクトリに作る.
+    cache_dir: Path | None = None
+    # stageごとのcheckpointを cache_dir/work に保存する. resume なら常に保存する.
+    checkpoint: bool = False
+    # cache_dir/work に残ったcheckpointから再開する.
+    resume: bool = False
+    # 一時ファイルの置き場. tmpfsを指定すると中間フォントの書き出し・読み込みがRAM上で済む.
+    scratch_dir: Path | None = None
+    # Mono版 (mono=True) を、生成済みのDefault版から曖昧幅glyphの差分だけで作る.
+    mono_delta: bool = False
+    # Italic/BoldItalic を、生成済みの同じvariantの Regular/Bold から fontTools で skew して作る.
+    italic_from_upright: bool = False
+    # font-patcher をフォント全体ではなくLatinだけのcarrierに当て、Nerd glyphを出力に重ねる.
+    nerd_overlay: bool = False
+    # hinted stage のglyphを codepoint 順の shard に分けて並列に処理する数. 出力は変わらない.
+    hint_shards: int = 1
+    # JPの前処理 (サイズ調整・stroke) のglyphを shard に分けて並列に処理する数.
+    prepare_shards: int = 1
+    # shard で処理した結果を1processでの処理結果と比べる.
+    verify_shards: bool = False
+
+
+@dataclass(frozen=True)
+class PrepareRequest:
+    """EN/JP入力フォント1つ分の前処理の入力.
+
+    前処理結果はstyle (Regular/Italic) に依存せず、ENはconfigにも依存しないため、
+    key が同じrequest同士で中間TTFを共有できる.
+    """
+
+    kind: Literal["en", "jp"]
+    source: Path
+    config: Config
+    mono: bool = False
+    # JPのサイズ調整・strokeをglyphの shard に分けて並列に行う数. 結果は変わらないためkeyに含めない.
+    shards: int = 1
+    # shard の結果を1processでの処理結果と比べる.
+    verify: bool = False
+
+    def key(self) -> str:
+        """入力フォントの内容と前処理に効くConfig値から作るcache key."""
+        if self.kind == "en":
+            return hash_key("en", file_sha256(self.source), code_fingerprint())
+        cfg = self.config
+        return hash_key(
+            "jp",
+            file_sha256(self.source),
+            code_fingerprint(),
+            cfg.ascent,
+            cfg.descent,
+            cfg.em,
+            cfg.en_width,
+            cfg.jp_width,
+            cfg.jp_scale_offset,
+            cfg.jp_stroke_width,
+            self.mono,
+        )
 
 
 def _new_font(
@@ -69,8 +137,7 @@ def _new_font(
     font.fullname = f"{familyname}-{style}"
     font.version = version
 
-    subfamily = "".join([" " + c if c.isupper() else c for c in style]).lstrip()
-    font.appendSFNTName("English (US)", "SubFamily", subfamily)
+    font.appendSFNTName("English (US)", "SubFamily", properties.subfamily_of(style))
     font.appendSFNTName(
         "English (US)",
         "UniqueID",
@@ -127,8 +194,6 @@ def _new_font(
     return font
 
 
-_CONTROL_OR_SPACE_CATEGORIES = frozenset({"Cc", "Zs", "Zl", "Zp"})
-
 # JP側で主unicodeとaltuniが複数文字を兼務し、かつENフォントとglyph名が衝突するグリフ。
 # mergeFontsでEN側が勝つと全角文字まで半角幅になるため、
 # 全角文字ぶんを衝突しない名前の独立glyphに複製・分離してからmergeする。
@@ -144,17 +209,6 @@ _SPLIT_FULLWIDTH_ALTUNI: dict[str, tuple[int, ...]] = {
 }
 
 
-def _is_control_or_space(code: int) -> bool:
-    """ENフォント側と重複しうる制御・スペース系のcodepointか判定する.
-
-    RobotoMono (Latin-1範囲) に存在しうる制御・空白文字のみを対象にする.
-    U+3000 (全角スペース) など全角幅を持つべき文字はこの範囲外なので対象にならない.
-    """
-    if not 0 <= code <= 0xFF:
-        return False
-    return unicodedata.category(chr(code)) in _CONTROL_OR_SPACE_CATEGORIES
-
-
 def _normalize_symbol_width(
     glyph: Any,
     source_width: int,
@@ -168,7 +222,7 @@ def _normalize_symbol_width(
         return
     half_em = source_em / 2
     source_fullwidth = abs(source_width - source_em) <= abs(source_width - half_em)
-    is_ambiguous = unicodedata.east_asian_width(chr(glyph.encoding)) == "A"
+    is_ambiguous = bool(charclass.classify(glyph.encoding) & charclass.AMBIGUOUS)
     target_width = jp_width if source_fullwidth else en_width
     if mono and is_ambiguous:
         if source_fullwidth:
@@ -184,17 +238,13 @@ def _normalize_symbol_width(
     glyph.width = target_width
 
 
-def _load_jp_font(
-    path: Path,
-    ascent: int,
-    descent: int,
-    em: int,
-    en_width: int,
-    jp_width: int,
-    jp_scale_offset: float,
-    mono: bool = False,
-) -> Any:
-    """JPフォントを開き、旧 main.py 相当のサイズ調整を行う."""
+def _open_jp_font(
+    path: Path, ascent: int, descent: int, em: int, jp_scale_offset: float
+) -> tuple[Any, dict[str, int], int, float]:
+    """JPフォントを開き、encoding・縦metrics・emを揃える.
+
+    (font, 元のglyph幅, 元のem, glyphのscale) を返す.
+    """
     font = fontforge.open(str(path))
     old_jp_ascent = font.ascent
     source_em = font.em
@@ -208,41 +258,68 @@ def _load_jp_font(
     font.ascent = ascent
     font.descent = descent
     font.em = em
+    return font, source_widths, source_em, scale
+
 
+def _jp_glyphs_to_adjust(font: Any) -> list[Any]:
+    """出力しないglyphと制御・スペース系のglyphを消し、サイズ調整の対象のglyphを返す."""
+    glyphs: list[Any] = []
     for glyph in font.glyphs():
         if not glyph.isWorthOutputting:
             font.selection.select(glyph)
             font.clear()
             continue
 
-        if _is_control_or_space(glyph.encoding):
+        if charclass.classify(glyph.encoding) & charclass.CONTROL_OR_SPACE:
             # 制御文字やスペース系はENフォント側の幅・字形をそのまま使わせる.
+            # U+3000 (全角スペース) などLatin-1範囲外の空白は対象にならない.
             # clear()だけだとencodingスロットが空glyphのまま残り、
             # mergeFonts後にJP側の(意図しない)幅で上書きされてしまうため、
             # removeGlyphでglyphそのものをJPフォントから除去する.
             font.removeGlyph(glyph)
             continue
+        glyphs.append(glyph)
+    return glyphs
+
+
+def _adjust_jp_glyph(
+    glyph: Any,
+    scale: float,
+    source_width: int,
+    source_em: int,
+    en_width: int,
+    jp_width: int,
+    mono: bool,
+) -> None:
+    """glyphをscaleし、半角カナ・全角・記号の別に幅を決める."""
+    glyph.transform(psMat.scale(scale, scale))
+
+    # FontForgeの未割り当てslot (U+10FFFFより後) は幅を触らない.
+    if not 0 <= glyph.encoding <= 0x10FFFF:
+        return
+    kind = charclass.classify(glyph.encoding)
+    if kind & charclass.HANKAKU_KANA:
+        glyph.width = en_width
+    elif kind & charclass.FULLWIDTH:
+        glyph.width = jp_width
+    else:
+        _normalize_symbol_width(
+            glyph,
+            source_width=source_width,
+            source_em=source_em,
+            en_width=en_width,
+            jp_width=jp_width,
+            mono=mono,
+        )
 
-        glyph.transform(psMat.scale(scale, scale))
-
-        if glyph.encoding in params.HANKAKU_KANA_LIST:
-            glyph.width = en_width
-        elif glyph.encoding in params.FULLWIDTH_CODES_LIST:
-            glyph.width = jp_width
-        elif 0 <= glyph.encoding <= 0x10FFFF:
-            _normalize_symbol_width(
-                glyph,
-                source_width=source_widths[glyph.glyphname],
-                source_em=source_em,
-                en_width=en_width,
-                jp_width=jp_width,
-                mono=mono,
-            )
 
-    # JP側で主unicodeとaltuniが複数文字を兼務し、ENフォントとglyph名が衝突する
-    # グリフについて、全角文字ぶんを衝突しない名前の独立glyphへ複製・分離する.
-    # 対象グリフが無い、またはaltuniに対象codepointが含まれない場合は何もしない
-    # (bizud/genjyuu/zenkaku等、別名glyphで全角スペースを持つJPフォントには無関係).
+def _split_fullwidth_altuni(font: Any) -> None:
+    """主unicodeとaltuniが複数文字を兼務し、ENフォントとglyph名が衝突するグリフについて、
+    全角文字ぶんを衝突しない名前の独立glyphへ複製・分離する.
+
+    対象グリフが無い、またはaltuniに対象codepointが含まれない場合は何もしない
+    (bizud/genjyuu/zenkaku等、別名glyphで全角スペースを持つJPフォントには無関係).
+    """
     for src_name, codepoints in _SPLIT_FULLWIDTH_ALTUNI.items():
         try:
             src_glyph = font[src_name]
@@ -275,6 +352,78 @@ def _load_jp_font(
             new_glyph.width = src_width
             new_glyph.altuni = None
 
+
+def _load_jp_font(
+    path: Path,
+    ascent: int,
+    descent: int,
+    em: int,
+    en_width: int,
+    jp_width: int,
+    jp_scale_offset: float,
+    mono: bool = False,
+) -> Any:
+    """JPフォントを開き、旧 main.py 相当のサイズ調整を行う."""
+    font, source_widths, source_em, scale = _open_jp_font(
+        path, ascent, descent, em, jp_scale_offset
+    )
+    for glyph in _jp_glyphs_to_adjust(font):
+        _adjust_jp_glyph(
+            glyph, scale, source_widths[glyph.glyphname], source_em, en_width, jp_width, mono
+        )
+    _split_fullwidth_altuni(font)
+    return font
+
+
+def _prepare_jp_shard(request: PrepareRequest, names: list[str]) -> dict[str, bytes]:
+    """JP前処理の shard のworker. names のglyphだけをサイズ調整・strokeし、結果を返す."""
+    cfg = request.config
+    font, source_widths, source_em, scale = _open_jp_font(
+        request.source, cfg.ascent, cfg.descent, cfg.em, cfg.jp_scale_offset
+    )
+    glyphs = [font[name] for name in names]
+    for glyph in glyphs:
+        _adjust_jp_glyph(
+            glyph,
+            scale,
+            source_widths[glyph.glyphname],
+            source_em,
+            cfg.en_width,
+            cfg.jp_width,
+            request.mono,
+        )
+    _stroke_glyphs(font, glyphs, cfg.jp_stroke_width)
+    result = {glyph.glyphname: dump_glyph(glyph) for glyph in glyphs}
+    font.close()
+    return result
+
+
+def _load_jp_font_sharded(request: PrepareRequest) -> Any:
+    """_load_jp_font と _apply_jp_stroke_width を、glyphの shard ごとに別processで行う.
+
+    glyphの削除とaltuniの分離はこのprocessで行い、workerの結果は輪郭と幅だけを戻すため、
+    glyph順・altuniは1processで処理したときと変わらない.
+    """
+    cfg = request.config
+    font, *_ = _open_jp_font(request.source, cfg.ascent, cfg.descent, cfg.em, cfg.jp_scale_offset)
+    glyphs = _jp_glyphs_to_adjust(font)
+    count = shard_count(len(glyphs), request.shards)
+    shards = split_by_codepoint([(glyph.unicode, glyph.glyphname) for glyph in glyphs], count)
+    with tracing.span("prepare-shards", shards=len(shards)):
+        results = run_shards(_prepare_jp_shard, shards, request)
+    dumps = {name: data for result in results for name, data in result.items()}
+    if request.verify:
+        with tracing.span("verify-shards"):
+            expected = _prepare_jp_shard(request, [glyph.glyphname for glyph in glyphs])
+        differ = sorted(name for name, data in expected.items() if dumps[name] != data)
+        if differ:
+            raise ShardMismatchError(
+                f"{len(differ)} glyph(s) differ from single-process JP preparation: "
+                f"{', '.join(differ[:5])}"
+            )
+    for glyph in glyphs:
+        restore_glyph(glyph, dumps[glyph.glyphname])
+    _split_fullwidth_altuni(font)
     return font
 
 
@@ -300,6 +449,20 @@ def _apply_jp_stroke_width(font: Any, stroke_width: int) -> None:
         glyph.width = width
 
 
+def _stroke_glyphs(font: Any, glyphs: list[Any], stroke_width: int) -> None:
+    """_apply_jp_stroke_width を glyphs だけに行う."""
+    if stroke_width == 0:
+        return
+    widths = [glyph.width for glyph in glyphs]
+    font.selection.none()
+    for glyph in glyphs:
+        font.selection.select(("more",), glyph)
+    font.stroke("circular", stroke_width, "round", "round", ("removeinternal", "cleanup"))
+    font.selection.none()
+    for glyph, width in zip(glyphs, widths, strict=True):
+        glyph.width = width
+
+
 def _scale_nerd_glyphs(font: Any, scales: dict[str, float]) -> None:
     """指定codepointのglyphを、advanceを変えずにink中心基準で拡大縮小する.
 
@@ -346,25 +509,177 @@ def _copy_unicode_mappings(base_font: Any, source_font: Any) -> None:
             pass
 
 
-def build(request: BuildRequest) -> Path:
-    """1つのstyleを生成し、ttfとotfを出力してttfのpathを返す."""
+def _trace_glyphs(args: dict[str, Any], font: Any) -> None:
+    """trace中なら、span の args に font のglyph数を入れる."""
+    if tracing.enabled():
+        args["glyphs"] = sum(1 for _ in font.glyphs())
+
+
+def _generate(font: Any, output: Path, flags: tuple[str, ...] = ()) -> None:
+    """font.generate を trace の span つきで呼ぶ."""
+    with tracing.span("generate", output=output.name, flags=list(flags)) as args:
+        _trace_glyphs(args, font)
+        font.generate(str(output), flags=flags)
+
+
+def _generate_prepared_font(request: PrepareRequest, output: Path, io_stats: IOStats) -> None:
+    """EN/JPフォントを読み込み・前処理し、output にTTFとして書き出す."""
+    io_stats.record_read("prepare", request.source)
+    if request.kind == "en":
+        with tracing.span("_load_en_font", source=request.source.name) as args:
+            font = _load_en_font(request.source)
+            _trace_glyphs(args, font)
+    else:
+        cfg = request.config
+        if request.shards > 1:
+            # strokeも shard ごとに行う.
+            with tracing.span(
+                "_load_jp_font",
+                source=request.source.name,
+                mono=request.mono,
+                shards=request.shards,
+            ) as args:
+                font = _load_jp_font_sharded(request)
+                _trace_glyphs(args, font)
+        else:
+            with tracing.span(
+                "_load_jp_font", source=request.source.name, mono=request.mono
+            ) as args:
+                font = _load_jp_font(
+                    request.source,
+                    ascent=cfg.ascent,
+                    descent=cfg.descent,
+                    em=cfg.em,
+                    en_width=cfg.en_width,
+                    jp_width=cfg.jp_width,
+                    jp_scale_offset=cfg.jp_scale_offset,
+                    mono=request.mono,
+                )
+                _trace_glyphs(args, font)
+            with tracing.span("stroke", stroke_width=cfg.jp_stroke_width):
+                _apply_jp_stroke_width(font, cfg.jp_stroke_width)
+    _generate(font, output)
+    font.close()
+    io_stats.record_write("prepare", output)
+
+
+def prepare_requests_for(request: BuildRequest) -> tuple[PrepareRequest, PrepareRequest]:
+    """build 1件が使う (EN, JP) の前処理requestを返す."""
     cfg = request.config
-
-    familyname = cfg.familyname_for(request.mono)
-    copyright_text = cfg.metadata.copyright or properties.DEFAULT_COPYRIGHT
-    vendor = cfg.metadata.vendor or properties.DEFAULT_VENDOR
-
     base_style = properties.base_style_of(request.style)
     en_path = getattr(cfg.fonts.en, base_style.lower())
     jp_path = getattr(cfg.fonts.jp, base_style.lower())
+    return (
+        PrepareRequest(kind="en", source=en_path, config=cfg),
+        PrepareRequest(
+            kind="jp",
+            source=jp_path,
+            config=cfg,
+            mono=request.mono,
+            shards=request.prepare_shards,
+            verify=request.verify_shards,
+        ),
+    )
+
+
+def output_key(request: BuildRequest) -> str:
+    """build 1件の出力 (ttf / otf) を一意に決めるcache key.
+
+    入力フォントの内容・Config全体・package/フォントversion・Nerd Fonts
+    submoduleのcommit・生成コードのいずれかが変われば別keyになる.
+    """
+    en_request, jp_request = prepare_requests_for(request)
+    nerd_revision = (
+        nerd_fonts_revision(request.nerd_fonts_root) if request.apply_nerd_font else None
+    )
+    return hash_key(
+        "output",
+        file_sha256(en_request.source),
+        file_sha256(jp_request.source),
+        request.config.model_dump(mode="json"),
+        __version__,
+        request.version,
+        nerd_revision,
+        code_fingerprint(),
+        request.style,
+        request.mono,
+        request.mono and request.mono_delta,
+        derives_italic(request),
+        request.apply_nerd_font and request.nerd_overlay,
+    )
+
+
+def derives_italic(request: BuildRequest) -> bool:
+    """request が生成済みのupright出力からItalicを派生させるか."""
+    return request.italic_from_upright and properties.is_italic(request.style)
+
+
+def output_paths(request: BuildRequest) -> tuple[Path, Path]:
+    """build 1件が出力する (ttf, otf) のpathを返す."""
+    familyname = request.config.familyname_for(request.mono)
+    family_out = request.output_dir / familyname
+    return (
+        family_out / f"{familyname}-{request.style}.ttf",
+        family_out / f"{familyname}-{request.style}.otf",
+    )
+
 
+def prepare(request: PrepareRequest, cache_dir: Path, io_stats: IOStats | None = None) -> Path:
+    """前処理済みTTFを cache_dir から返す. 未生成なら生成してcacheに保存する."""
+    cache = PreparedFontCache(cache_dir)
+    stats = io_stats if io_stats is not None else IOStats()
+    return cache.get_or_create(
+        request.kind,
+        request.key(),
+        lambda output: _generate_prepared_font(request, output, stats),
+    )
+
+
+# daemonのworkerで、開いた前処理済みフォントをbuildをまたいで保持する数. 0なら毎回閉じる.
+# 前処理済みフォントのpathは内容のhashを含むため、同じpathなら中身も同じ.
+_prepared_font_limit = 0
+_prepared_fonts: OrderedDict[Path, Any] = OrderedDict()
+
+
+def keep_prepared_fonts(limit: int) -> None:
+    """開いた前処理済みフォントを、最近使った limit 個までプロセス内に保持する."""
+    global _prepared_font_limit
+    _prepared_font_limit = limit
+    while len(_prepared_fonts) > limit:
+        _, font = _prepared_fonts.popitem(last=False)
+        font.close()
+
+
+def _open_prepared(path: Path, io_stats: IOStats) -> Any:
+    """前処理済みフォントを開く. 保持中ならそれを返す."""
+    font = _prepared_fonts.get(path)
+    if font is not None:
+        _prepared_fonts.move_to_end(path)
+        return font
+    io_stats.record_read("merged", path)
+    font = fontforge.open(str(path))
+    if _prepared_font_limit > 0:
+        _prepared_fonts[path] = font
+        keep_prepared_fonts(_prepared_font_limit)
+    return font
+
+
+def _close_prepared(path: Path, font: Any) -> None:
+    """保持していない前処理済みフォントを閉じる."""
+    if path not in _prepared_fonts:
+        font.close()
+
+
+def _merge_sources(request: BuildRequest, prepare_root: Path, io_stats: IOStats) -> Any:
+    """新規フォントに前処理済みの EN → JP を mergeFonts し、そのフォントを返す."""
+    cfg = request.config
     base_font = _new_font(
-        familyname=familyname,
+        familyname=cfg.familyname_for(request.mono),
         style=request.style,
         italic_angle=cfg.italic_angle,
         version=request.version,
-        copyright_text=copyright_text,
-        vendor=vendor,
+        copyright_text=cfg.metadata.copyright or properties.DEFAULT_COPYRIGHT,
+        vendor=cfg.metadata.vendor or properties.DEFAULT_VENDOR,
         ascent=cfg.ascent,
         descent=cfg.descent,
         em=cfg.em,
@@ -374,82 +689,505 @@ def build(request: BuildRequest) -> Path:
         os2_descent=cfg.os2_descent,
     )
 
-    with tempfile.TemporaryDirectory(prefix="robotomonojp-") as tmpdir:
-        tmp_root = Path(tmpdir)
-        en_tmp = tmp_root / f"en-{request.style}.ttf"
-        jp_tmp = tmp_root / f"jp-{request.style}.ttf"
-
-        en_font = _load_en_font(en_path)
-        en_font.generate(str(en_tmp))
-        en_font.close()
+    en_request, jp_request = prepare_requests_for(request)
+    en_prepared = prepare(en_request, prepare_root, io_stats)
+    jp_prepared = prepare(jp_request, prepare_root, io_stats)
 
-        en_reload = fontforge.open(str(en_tmp))
-        en_reload.encoding = properties.ENCODING
+    en_reload = _open_prepared(en_prepared, io_stats)
+    en_reload.encoding = properties.ENCODING
+    with tracing.span("mergeFonts", source="en") as args:
+        _trace_glyphs(args, en_reload)
         base_font.mergeFonts(en_reload)
-        en_reload.close()
-
-        jp_font = _load_jp_font(
-            jp_path,
-            ascent=cfg.ascent,
-            descent=cfg.descent,
-            em=cfg.em,
-            en_width=cfg.en_width,
-            jp_width=cfg.jp_width,
-            jp_scale_offset=cfg.jp_scale_offset,
-            mono=request.mono,
-        )
-        _apply_jp_stroke_width(jp_font, cfg.jp_stroke_width)
-        jp_font.generate(str(jp_tmp))
-        jp_font.close()
+    _close_prepared(en_prepared, en_reload)
 
-        jp_reload = fontforge.open(str(jp_tmp))
+    jp_reload = _open_prepared(jp_prepared, io_stats)
+    with tracing.span("mergeFonts", source="jp") as args:
+        _trace_glyphs(args, jp_reload)
         base_font.mergeFonts(jp_reload)
+    with tracing.span("_copy_unicode_mappings") as args:
         _copy_unicode_mappings(base_font, jp_reload)
-        jp_reload.close()
-
-        base_font.selection.all()
-        base_font.removeOverlap()
-        base_font.round()
-        base_font.autoHint()
-        base_font.autoInstr()
-        base_font.selection.none()
-
-        if properties.is_italic(request.style):
-            make_italic(base_font, cfg.italic_angle)
-            fix_all_glyph_points(base_font, do_round=True, add_extrema=True)
-        else:
-            fix_all_glyph_points(base_font, add_extrema=True)
+        _trace_glyphs(args, base_font)
+    _close_prepared(jp_prepared, jp_reload)
+    return base_font
+
+
+def _hint_selection(font: Any) -> None:
+    """選択中glyphの重なり除去・整数化・ヒンティングを行う."""
+    font.removeOverlap()
+    font.round()
+    font.autoHint()
+    font.autoInstr()
+
+
+@dataclass(frozen=True)
+class HintOptions:
+    """hinted stage の実行方法. 結果は変えない."""
+
+    # glyphを codepoint 順の shard に分け、別processで並列に処理する数. 1なら分けない.
+    shards: int = 1
+    # shard で処理した結果を1processでの処理結果と比べ、違えば ShardMismatchError にする.
+    verify: bool = False
+    # shard のworkerへ渡すフォントの一時置き場.
+    scratch_dir: Path | None = None
+
+
+def _hint(font: Any, cache: HintCache | None = None, options: HintOptions | None = None) -> None:
+    """全glyphの重なり除去・整数化・ヒンティングを行う.
+
+    cache があれば、輪郭が保存済みのglyphは処理結果をcacheから戻し、残りだけを処理する.
+    """
+    options = options or HintOptions()
+    with tracing.span("hinting", shards=options.shards) as args:
+        _trace_glyphs(args, font)
+        if cache is None:
+            _hint_all(font, options)
+            return
+        args["cached"] = _hint_with_cache(font, cache, options)
+
+
+def _hint_all(font: Any, options: HintOptions) -> None:
+    if options.shards > 1:
+        _hint_glyphs(font, list(font.glyphs()), options)
+        return
+    font.selection.all()
+    _hint_selection(font)
+    font.selection.none()
+
+
+def _hint_glyphs(font: Any, glyphs: list[Any], options: HintOptions | None = None) -> None:
+    options = options or HintOptions()
+    if shard_count(len(glyphs), options.shards) > 1:
+        # dump_glyph は reference を運べないため、composite glyphは shard に出さずこのprocessで処理する.
+        composites = [glyph for glyph in glyphs if glyph.references]
+        _hint_sharded(font, [glyph for glyph in glyphs if not glyph.references], options)
+        if not composites:
+            return
+        glyphs = composites
+    font.selection.none()
+    for glyph in glyphs:
+        font.selection.select(("more",), glyph)
+    _hint_selection(font)
+    font.selection.none()
+
+
+def _hint_shard(sfd: Path, names: list[str]) -> tuple[dict[str, bytes], Program]:
+    """shard のworker. sfd を開き、names のglyphだけを処理して結果を返す."""
+    font = fontforge.open(str(sfd))
+    _hint_glyphs(font, [font[name] for name in names])
+    result = {name: dump_glyph(font[name]) for name in names}
+    program = Program.of(font)
+    font.close()
+    return result, program
+
+
+def _hint_sharded(font: Any, glyphs: list[Any], options: HintOptions) -> None:
+    """glyphs を shard に分けて別processで処理し、結果を font に戻す.
+
+    workerはフォント全体を開いて自分の shard だけを選択するため、autoHint が参照する
+    フォント全体の値 (blue zoneなど) は1processで処理したときと変わらない.
+    """
+    count = shard_count(len(glyphs), options.shards)
+    shards = split_by_codepoint([(glyph.unicode, glyph.glyphname) for glyph in glyphs], count)
+    scratch = scratch_root(options.scratch_dir)
+    with tempfile.TemporaryDirectory(prefix="robotomonojp-shards-", dir=scratch) as tmpdir:
+        sfd = Path(tmpdir) / "hint.sfd"
+        font.save(str(sfd))
+        with tracing.span("hinting-shards", shards=len(shards)):
+            results = run_shards(_hint_shard, shards, sfd)
+        programs = {program for _, program in results}
+        if len(programs) != 1:
+            raise ShardMismatchError(f"shards produced {len(programs)} different cvt/fpgm/prep")
+        dumps = {name: data for result, _ in results for name, data in result.items()}
+        if options.verify:
+            with tracing.span("verify-shards"):
+                _verify_shards(sfd, dumps, programs)
+    for glyph in glyphs:
+        restore_glyph(glyph, dumps[glyph.glyphname])
+    programs.pop().apply(font)
+
+
+def _verify_shards(sfd: Path, dumps: dict[str, bytes], programs: set[Program]) -> None:
+    """同じglyphを1processで処理し、shard の結果と一致するか確かめる."""
+    expected, program = _hint_shard(sfd, list(dumps))
+    differ = sorted(name for name, data in expected.items() if dumps[name] != data)
+    if differ:
+        raise ShardMismatchError(
+            f"{len(differ)} glyph(s) differ from single-process hinting: {', '.join(differ[:5])}"
+        )
+    if programs != {program}:
+        raise ShardMismatchError("cvt/fpgm/prep differ from single-process hinting")
+
 
-        # 最終ステージ: リガチャを削除.
-        remove_glyphs_with_features(base_font, params.LIGATURE_FEATURES)
+def _hint_with_cache(font: Any, cache: HintCache, options: HintOptions | None = None) -> int:
+    """cacheにある輪郭のglyphは結果を戻し、無いglyphだけをヒンティングする. 戻したglyph数を返す.
+
+    新たにヒンティングした結果の cvt / fpgm / prep が保存済みのものと食い違ったら、
+    cacheの instruction は使えないため、cacheにあったglyphもヒンティングする.
+    """
+    options = options or HintOptions()
+    context = hint_context(font)
+    program = cache.program(context)
+    glyphs = [(glyph, outline_key(glyph)) for glyph in font.glyphs()]
+    found: dict[str, bytes] = {}
+    if program is not None:
+        found = cache.lookup(context, [key for _, key in glyphs if key is not None])
+    hits = [(glyph, key) for glyph, key in glyphs if key in found]
+    misses = [(glyph, key) for glyph, key in glyphs if key not in found]
+    if not hits:
+        _hint_all(font, options)
+    elif misses:
+        _hint_glyphs(font, [glyph for glyph, _ in misses], options)
+        if Program.of(font) != program:
+            _hint_glyphs(font, [glyph for glyph, _ in hits], options)
+            misses += hits
+            hits = []
+    for glyph, key in hits:
+        restore_glyph(glyph, found[key])
+    if program is not None and not misses:
+        program.apply(font)
+    if misses:
+        cache.store(context, {key: dump_glyph(glyph) for glyph, key in misses if key is not None})
+        cache.store_program(context, Program.of(font))
+    return len(hits)
+
+
+def _finalize(font: Any, request: BuildRequest) -> None:
+    """Italic化とリガチャ削除を行い、Nerd Font patch前の最終形にする."""
+    if properties.is_italic(request.style):
+        with tracing.span("make_italic", italic_angle=request.config.italic_angle):
+            make_italic(font, request.config.italic_angle)
+        with tracing.span("fix_all_glyph_points"):
+            fix_all_glyph_points(font, do_round=True, add_extrema=True)
+    else:
+        with tracing.span("fix_all_glyph_points"):
+            fix_all_glyph_points(font, add_extrema=True)
+
+    # 最終ステージ: リガチャを削除.
+    with tracing.span("remove_glyphs_with_features") as args:
+        remove_glyphs_with_features(font, params.LIGATURE_FEATURES)
         # 旧実装で明示的に消していた FB00-FB4F のUnicodeレンジも念のため削除.
-        clear_font_glyph(base_font, params.LIGATURE[0], params.LIGATURE[1])
-
-        family_out = request.output_dir / familyname
-        family_out.mkdir(parents=True, exist_ok=True)
-        ttf_out = family_out / f"{familyname}-{request.style}.ttf"
-        otf_out = family_out / f"{familyname}-{request.style}.otf"
-
-        pre_patch_ttf = tmp_root / f"{familyname}-{request.style}.pre.ttf"
-        base_font.generate(str(pre_patch_ttf))
-        base_font.generate(str(otf_out), flags=("opentype",))
-        base_font.close()
-
-        if request.apply_nerd_font:
-            patched_ttf = run_nerd_font_patch(
-                pre_patch_ttf,
-                tmp_root / "patched",
-                nerd_fonts_root=request.nerd_fonts_root,
-                complete=True,
-                mono=False,
+        clear_font_glyph(font, params.LIGATURE[0], params.LIGATURE[1])
+        _trace_glyphs(args, font)
+
+
+def _patch_nerd_font(
+    request: BuildRequest, pre_patch_ttf: Path, patched_ttf: Path, io_stats: IOStats
+) -> None:
+    """Nerd Font patchを当て、nerd glyphの拡大縮小をしてから patched_ttf に書き出す."""
+    generated = run_nerd_font_patch(
+        pre_patch_ttf,
+        patched_ttf.parent / "patched",
+        nerd_fonts_root=request.nerd_fonts_root,
+        complete=True,
+        mono=False,
+    )
+    # font-patcher (subprocess) がpatch前のttfを読み、patch後のttfを書き出す.
+    io_stats.record_read("patched", pre_patch_ttf)
+    io_stats.record_write("patched", generated)
+    scales = request.config.nerd_font_glyph_scales
+    if scales:
+        io_stats.record_read("patched", generated)
+        patched_font = fontforge.open(str(generated))
+        with tracing.span("_scale_nerd_glyphs", ranges=len(scales)):
+            _scale_nerd_glyphs(patched_font, scales)
+        _generate(patched_font, generated)
+        patched_font.close()
+        io_stats.record_write("patched", generated)
+    shutil.move(generated, patched_ttf)
+
+
+def _overlay_nerd_font(
+    request: BuildRequest,
+    pre_patch_ttf: Path,
+    patched_ttf: Path,
+    cache_root: Path,
+    io_stats: IOStats,
+) -> None:
+    """cache済みのpatch済みcarrierから、Nerd glyphを pre_patch_ttf に重ねて書き出す.
+
+    carrierのkeyは font-patcher の出力に効く値 (carrier_signature)・Nerd Fontsのcommit・
+    nerd_font_glyph_scales・生成コードから作るため、同じweightのbuild同士で共有される.
+    """
+    font = TTFont(str(pre_patch_ttf))
+    key = hash_key(
+        "nerd",
+        carrier_signature(font),
+        nerd_fonts_revision(request.nerd_fonts_root),
+        request.config.nerd_font_glyph_scales,
+        code_fingerprint(),
+    )
+    font.close()
+
+    def create(output: Path) -> None:
+        # font-patcher の出力先は並列buildと共有しないよう、build専用の一時ディレクトリに作る.
+        scratch = scratch_root(request.scratch_dir)
+        with tempfile.TemporaryDirectory(prefix="robotomonojp-nerd-", dir=scratch) as tmpdir:
+            work_dir = Path(tmpdir)
+            carrier = make_carrier(pre_patch_ttf, work_dir / "carrier.ttf")
+            io_stats.record_write("patched", carrier)
+            _patch_nerd_font(request, carrier, work_dir / "carrier.patched.ttf", io_stats)
+            shutil.move(work_dir / "carrier.patched.ttf", output)
+
+    nerd_font = PreparedFontCache(cache_root).get_or_create("nerd", key, create)
+    io_stats.record_read("patched", pre_patch_ttf)
+    io_stats.record_read("patched", nerd_font)
+    with tracing.span("overlay_nerd_glyphs") as args:
+        args["glyphs"] = len(overlay_nerd_glyphs(pre_patch_ttf, nerd_font, patched_ttf))
+    io_stats.record_write("patched", patched_ttf)
+
+
+def build(request: BuildRequest, io_stats: IOStats | None = None) -> Path:
+    """1つのstyleを生成し、ttfとotfを出力してttfのpathを返す.
+
+    cache_dir があり request.checkpoint か request.resume なら、stageごとのcheckpointを
+    cache_dir/work に保存する. request.resume なら、入力hashが一致する最後のcheckpointから再開する.
+    io_stats を渡すと、stageごとに書き出し・読み込んだフォントのbyte数と所要時間を記録する.
+    """
+    stats = io_stats if io_stats is not None else IOStats()
+    stem = f"{request.config.familyname_for(request.mono)}-{request.style}"
+    ttf_out, otf_out = output_paths(request)
+
+    scratch = scratch_root(request.scratch_dir)
+    with tempfile.TemporaryDirectory(prefix="robotomonojp-", dir=scratch) as tmpdir:
+        tmp_root = Path(tmpdir)
+        # cache_dir未指定時もprepareを経由し、一時ディレクトリをcache代わりに使う.
+        prepare_root = request.cache_dir or tmp_root
+        checkpoints = None
+        if request.cache_dir is not None and (request.checkpoint or request.resume):
+            checkpoints = Checkpoints(request.cache_dir / "work" / stem, output_key(request))
+        work_dir = checkpoints.work_dir if checkpoints is not None else tmp_root
+
+        stages = STAGES if request.apply_nerd_font else STAGES[:-1]
+        resumed = None
+        if checkpoints is not None:
+            resumed = checkpoints.last_valid_stage(stages) if request.resume else None
+            if resumed is None:
+                checkpoints.reset()
+        done = stages.index(resumed) + 1 if resumed else 0
+
+        # sfdはcheckpointとしてだけ使うため work_dir に直接保存する.
+        # ttf/otfは後段で読み直すためscratchに書き出し、checkpointにはコピーを残す.
+        merged_sfd = work_dir / f"{stem}.merged.sfd"
+        hinted_sfd = work_dir / f"{stem}.hinted.sfd"
+        pre_patch_ttf = tmp_root / f"{stem}.pre.ttf"
+        pre_patch_otf = tmp_root / f"{stem}.otf"
+        patched_ttf = tmp_root / f"{stem}.patched.ttf"
+        if checkpoints is not None and done >= 3:
+            pre_patch_ttf, pre_patch_otf, patched_ttf = (
+                checkpoints.path(path.name) for path in (pre_patch_ttf, pre_patch_otf, patched_ttf)
             )
-            if cfg.nerd_font_glyph_scales:
-                patched_font = fontforge.open(str(patched_ttf))
-                _scale_nerd_glyphs(patched_font, cfg.nerd_font_glyph_scales)
-                patched_font.generate(str(patched_ttf))
-                patched_font.close()
-            shutil.copy(patched_ttf, ttf_out)
-        else:
-            shutil.copy(pre_patch_ttf, ttf_out)
 
+        font = None
+        if done < 1:
+            with stats.timed("merged"):
+                font = _merge_sources(request, prepare_root, stats)
+                if checkpoints is not None:
+                    font.save(str(merged_sfd))
+                    stats.record_write("merged", merged_sfd)
+                    checkpoints.save("merged", [merged_sfd])
+        if done < 2:
+            with stats.timed("hinted"):
+                if font is None:
+                    font = fontforge.open(str(merged_sfd))
+                    stats.record_read("hinted", merged_sfd)
+                _hint(
+                    font,
+                    HintCache(request.cache_dir) if request.cache_dir else None,
+                    HintOptions(request.hint_shards, request.verify_shards, request.scratch_dir),
+                )
+                if checkpoints is not None:
+                    font.save(str(hinted_sfd))
+                    stats.record_write("hinted", hinted_sfd)
+                    checkpoints.save("hinted", [hinted_sfd])
+        if done < 3:
+            with stats.timed("finalized"):
+                if font is None:
+                    font = fontforge.open(str(hinted_sfd))
+                    stats.record_read("finalized", hinted_sfd)
+                _finalize(font, request)
+                _generate(font, pre_patch_ttf)
+                _generate(font, pre_patch_otf, ("opentype",))
+                font.close()
+                stats.record_write("finalized", pre_patch_ttf)
+                stats.record_write("finalized", pre_patch_otf)
+                if checkpoints is not None:
+                    for path in checkpoints.save("finalized", [pre_patch_ttf, pre_patch_otf]):
+                        stats.record_write("checkpoint", path)
+        if request.apply_nerd_font and done < 4:
+            with stats.timed("patched"):
+                if request.nerd_overlay:
+                    _overlay_nerd_font(request, pre_patch_ttf, patched_ttf, prepare_root, stats)
+                else:
+                    _patch_nerd_font(request, pre_patch_ttf, patched_ttf, stats)
+                if checkpoints is not None:
+                    for path in checkpoints.save("patched", [patched_ttf]):
+                        stats.record_write("checkpoint", path)
+
+        ttf_out.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(patched_ttf if request.apply_nerd_font else pre_patch_ttf, ttf_out)
+        shutil.copy(pre_patch_otf, otf_out)
+        stats.record_write("output", ttf_out)
+        stats.record_write("output", otf_out)
+
+    if checkpoints is not None:
+        checkpoints.clear()
+    return ttf_out
+
+
+# Default版からMono版を作るときに、family名を書き換えるSFNT name.
+_FAMILY_SFNT_NAME_IDS = frozenset(
+    {"Family", "Fullname", "UniqueID", "PostScriptName", "Preferred Family", "Compatible Full"}
+)
+
+
+def _has_glyph(font: Any, key: int | str) -> bool:
+    """glyph名またはcodepointのglyphが font にあるか判定する."""
+    try:
+        font[key]
+    except TypeError:
+        return False
+    return True
+
+
+def _mono_delta_glyphs(en_font: Any, jp_default: Any, jp_mono: Any) -> list[tuple[int, str]]:
+    """Mono版でDefault版と幅が変わるJP glyphを (codepoint, glyph名) で返す.
+
+    _normalize_symbol_width が全角の曖昧幅glyphを en_width へ縮小したglyphだけが対象.
+    mergeFontsでEN側が優先されるglyphと、Nerd Font patchが上書きするglyphは除く.
+    """
+    delta: list[tuple[int, str]] = []
+    for glyph in jp_mono.glyphs():
+        code = glyph.unicode
+        if code < 0 or charclass.is_nerd(code):
+            continue
+        if _has_glyph(en_font, glyph.glyphname) or _has_glyph(en_font, code):
+            continue
+        try:
+            default_glyph = jp_default[glyph.glyphname]
+        except TypeError:
+            continue
+        if default_glyph.width != glyph.width:
+            delta.append((code, glyph.glyphname))
+    return delta
+
+
+def _apply_mono_delta(
+    font: Any, jp_mono: Any, delta: list[tuple[int, str]], request: BuildRequest
+) -> list[int]:
+    """font の delta 対象glyphをMono版のJP glyphで置き換え、build と同じ後処理をかける."""
+    applied: list[int] = []
+    for code, name in delta:
+        if not _has_glyph(font, code):
+            # リガチャ削除などで最終フォントに残っていないglyph.
+            continue
+        jp_mono.selection.select(name)
+        jp_mono.copy()
+        font.selection.select(("unicode",), code)
+        font.paste()
+        applied.append(code)
+    jp_mono.selection.none()
+    font.selection.none()
+    if not applied:
+        return applied
+
+    for code in applied:
+        font.selection.select(("more", "unicode"), code)
+    _hint_selection(font)
+    font.selection.none()
+
+    italic = properties.is_italic(request.style)
+    for code in applied:
+        glyph = font[code]
+        if italic and params.in_ranges(code, ITALIC_CODEPOINT_RANGES):
+            glyph.transform(skew_matrix(request.config.italic_angle))
+            glyph.round()
+        glyph.addExtrema("all")
+    return applied
+
+
+def _rename_family(font: Any, old: str, new: str) -> None:
+    """familyname を old から new へ書き換える (fontname / fullname / SFNT name含む)."""
+    font.familyname = new
+    font.fontname = font.fontname.replace(old, new, 1)
+    font.fullname = font.fullname.replace(old, new, 1)
+    font.sfnt_names = tuple(
+        (lang, strid, value.replace(old, new) if strid in _FAMILY_SFNT_NAME_IDS else value)
+        for lang, strid, value in font.sfnt_names
+    )
+
+
+def derive_mono(request: BuildRequest, io_stats: IOStats | None = None) -> Path:
+    """生成済みのDefault版から、曖昧幅glyphだけを差し替えてMono版のttf/otfを作る.
+
+    Mono版とDefault版の違いは、JP前処理で曖昧幅glyphを半角セルへ縮小するかだけなので、
+    merge・全glyphのヒンティング・Nerd Font patchをやり直さずに済む.
+    Default版の出力 (output_paths) が先に存在している必要がある.
+    """
+    stats = io_stats if io_stats is not None else IOStats()
+    cfg = request.config
+    default_request = replace(request, mono=False, mono_delta=False)
+    default_ttf, default_otf = output_paths(default_request)
+    ttf_out, otf_out = output_paths(request)
+
+    scratch = scratch_root(request.scratch_dir)
+    with tempfile.TemporaryDirectory(prefix="robotomonojp-", dir=scratch) as tmpdir:
+        prepare_root = request.cache_dir or Path(tmpdir)
+        en_request, jp_mono_request = prepare_requests_for(request)
+        _, jp_default_request = prepare_requests_for(default_request)
+        prepared = [
+            prepare(prepare_request, prepare_root, stats)
+            for prepare_request in (en_request, jp_default_request, jp_mono_request)
+        ]
+        for path in prepared:
+            stats.record_read("delta", path)
+        en_font, jp_default, jp_mono = (fontforge.open(str(path)) for path in prepared)
+        delta = _mono_delta_glyphs(en_font, jp_default, jp_mono)
+        en_font.close()
+        jp_default.close()
+
+        ttf_out.parent.mkdir(parents=True, exist_ok=True)
+        targets = ((default_ttf, ttf_out, ()), (default_otf, otf_out, ("opentype",)))
+        for source, target, flags in targets:
+            stats.record_read("delta", source)
+            font = fontforge.open(str(source))
+            font.encoding = properties.ENCODING
+            with tracing.span("_apply_mono_delta", glyphs=len(delta)):
+                _apply_mono_delta(font, jp_mono, delta, request)
+            _rename_family(font, cfg.familyname_for(False), cfg.familyname_for(True))
+            _generate(font, target, flags)
+            font.close()
+            stats.record_write("output", target)
+        jp_mono.close()
+
+    return ttf_out
+
+
+def derive_italic_outputs(request: BuildRequest, io_stats: IOStats | None = None) -> Path:
+    """生成済みの同じvariantの Regular/Bold のttf/otfを skew してItalicのttf/otfを作る.
+
+    merge・全glyphのヒンティング・Nerd Font patchをやり直さずに済む.
+    Nerd Font patch済みのttfでは、Nerd Fontsのレンジはpatch後に入ったglyphなので傾けない.
+    upright側の出力 (output_paths) が先に存在している必要がある.
+    """
+    stats = io_stats if io_stats is not None else IOStats()
+    upright_request = replace(
+        request, style=properties.base_style_of(request.style), italic_from_upright=False
+    )
+    upright_ttf, upright_otf = output_paths(upright_request)
+    ttf_out, otf_out = output_paths(request)
+    # otfにはNerd Font patchを当てていない.
+    nerd_ranges = params.NERD_FONT_RANGES if request.apply_nerd_font else []
+    targets = ((upright_ttf, ttf_out, nerd_ranges), (upright_otf, otf_out, []))
+    for source, target, exclude in targets:
+        stats.record_read("italic", source)
+        with tracing.span("derive_italic", output=target.name):
+            derive_italic(
+                source,
+                target,
+                familyname=request.config.familyname_for(request.mono),
+                style=request.style,
+                italic_angle=request.config.italic_angle,
+                exclude_ranges=exclude,
+            )
+        stats.record_write("output", target)
     return ttf_out
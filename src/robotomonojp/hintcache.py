@@ -0,0 +1,213 @@
+"""glyphの輪郭hashをkeyにした、重なり除去・整数化・ヒンティング結果の永続cache.
+
+JP側の2万前後のglyphは、styleのDefault版/Mono版やrunをまたいで輪郭がほぼ変わらない.
+hinting前の輪郭 (正規化してhash) と、ヒンティングに効くフォント側の値 (context) をkeyに、
+処理後の輪郭・PostScript hint・TrueType instructionを cache_dir/hints.sqlite に保存する.
+
+TrueType instructionはフォント全体の cvt / fpgm / prep を参照するため、contextごとに
+それら (program) も保存し、cacheから戻したglyphと新たにヒンティングしたglyphで
+programが食い違わないことを generator 側で確かめる.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import zlib
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .cache import HINTS_FILENAME, code_fingerprint, hash_key
+from .fontforge_helpers import fontforge
+
+# 並列workerが同時に書き込むときの待ち時間 (秒).
+BUSY_TIMEOUT = 60.0
+# autoHint / autoInstr が参照する private dict の項目.
+PRIVATE_KEYS = (
+    "BlueValues",
+    "OtherBlues",
+    "FamilyBlues",
+    "FamilyOtherBlues",
+    "BlueScale",
+    "BlueShift",
+    "BlueFuzz",
+    "StdHW",
+    "StdVW",
+    "StemSnapH",
+    "StemSnapV",
+    "ForceBold",
+)
+# glyph単位の instruction が参照するフォント全体のtable.
+PROGRAM_TABLES = ("cvt ", "fpgm", "prep")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS glyphs (key TEXT PRIMARY KEY, data BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS programs (context TEXT PRIMARY KEY, data BLOB NOT NULL);
+"""
+
+
+@dataclass(frozen=True)
+class Program:
+    """TrueType instructionが参照するフォント全体のtable. 無いtableはNone."""
+
+    tables: tuple[bytes | None, ...]
+
+    @classmethod
+    def of(cls, font: Any) -> Program:
+        """font の現在の cvt / fpgm / prep."""
+        tables: list[bytes | None] = []
+        for tag in PROGRAM_TABLES:
+            try:
+                data = font.getTableData(tag)
+            except OSError:
+                data = None
+            tables.append(bytes(data) if data else None)
+        return cls(tuple(tables))
+
+    def apply(self, font: Any) -> None:
+        """font の cvt / fpgm / prep をこの内容にする."""
+        for tag, data in zip(PROGRAM_TABLES, self.tables, strict=True):
+            if data is not None:
+                font.setTableData(tag, data)
+
+
+def _round(value: float) -> float:
+    # 整数化前の輪郭は浮動小数を含む. 計算誤差程度の違いは同じ輪郭として扱う.
+    return round(value, 3)
+
+
+def outline_key(glyph: Any) -> str | None:
+    """hinting前の glyph の輪郭と幅のhash. referenceを含むglyphはcacheしない (None)."""
+    if glyph.references:
+        return None
+    layer = glyph.foreground
+    outline = [
+        glyph.width,
+        layer.is_quadratic,
+        [
+            [contour.closed, [[_round(p.x), _round(p.y), p.on_curve] for p in contour]]
+            for contour in layer
+        ],
+    ]
+    return hashlib.sha256(json.dumps(outline).encode()).hexdigest()
+
+
+def hint_context(font: Any) -> str:
+    """ヒンティング結果に効くフォント側の値とFontForge・生成コードのversionのkey.
+
+    処理の本体は generator._hint_selection にあるため、package全体のコードをkeyに含める.
+    """
+    private = {name: font.private[name] for name in PRIVATE_KEYS if name in font.private}
+    return hash_key(
+        "hints",
+        fontforge.version(),
+        code_fingerprint(),
+        font.em,
+        font.ascent,
+        font.descent,
+        font.italicangle,
+        private,
+    )
+
+
+def dump_glyph(glyph: Any) -> bytes:
+    """hinting後の glyph の輪郭・幅・hint・instructionを保存用のbyte列にする."""
+    layer = glyph.foreground
+    data = {
+        "width": glyph.width,
+        "quadratic": layer.is_quadratic,
+        "contours": [
+            [contour.closed, [[p.x, p.y, p.on_curve] for p in contour]] for contour in layer
+        ],
+        "hhints": [list(hint) for hint in glyph.hhints],
+        "vhints": [list(hint) for hint in glyph.vhints],
+        "dhints": [[list(point) for point in hint] for hint in glyph.dhints],
+        "instrs": bytes(glyph.ttinstrs or b"").hex(),
+    }
+    return zlib.compress(json.dumps(data).encode())
+
+
+def restore_glyph(glyph: Any, blob: bytes) -> None:
+    """dump_glyph の内容を glyph に戻す."""
+    data = json.loads(zlib.decompress(blob))
+    layer = fontforge.layer()
+    layer.is_quadratic = data["quadratic"]
+    for closed, points in data["contours"]:
+        contour = fontforge.contour()
+        contour.is_quadratic = data["quadratic"]
+        for x, y, on_curve in points:
+            contour += fontforge.point(x, y, on_curve)
+        contour.closed = closed
+        layer += contour
+    glyph.foreground = layer
+    glyph.width = data["width"]
+    glyph.hhints = tuple(tuple(hint) for hint in data["hhints"])
+    glyph.vhints = tuple(tuple(hint) for hint in data["vhints"])
+    glyph.dhints = tuple(tuple(tuple(point) for point in hint) for hint in data["dhints"])
+    glyph.ttinstrs = bytes.fromhex(data["instrs"])
+
+
+def _dump_program(program: Program) -> bytes:
+    return json.dumps(
+        [data.hex() if data is not None else None for data in program.tables]
+    ).encode()
+
+
+def _load_program(blob: bytes) -> Program:
+    return Program(tuple(bytes.fromhex(data) if data else None for data in json.loads(blob)))
+
+
+class HintCache:
+    """cache_dir/hints.sqlite の読み書き. 複数processから同時に使える."""
+
+    def __init__(self, cache_dir: Path) -> None:
+        """cache_dir 直下の hints.sqlite を使う. ファイルは最初の読み書きで作る."""
+        self.path = cache_dir / HINTS_FILENAME
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)) as connection:
+            connection.executescript(_SCHEMA)
+            with connection:
+                yield connection
+
+    def lookup(self, context: str, keys: list[str]) -> dict[str, bytes]:
+        """context で keys のうち保存済みのものを返す."""
+        found: dict[str, bytes] = {}
+        with self._connect() as connection:
+            for key in keys:
+                row = connection.execute(
+                    "SELECT data FROM glyphs WHERE key = ?", (hash_key(context, key),)
+                ).fetchone()
+                if row is not None:
+                    found[key] = row[0]
+        return found
+
+    def store(self, context: str, glyphs: dict[str, bytes]) -> None:
+        """context での glyph (輪郭key → dump_glyph) を保存する."""
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO glyphs (key, data) VALUES (?, ?)",
+                [(hash_key(context, key), data) for key, data in glyphs.items()],
+            )
+
+    def program(self, context: str) -> Program | None:
+        """context で保存済みの cvt / fpgm / prep."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT data FROM programs WHERE context = ?", (context,)
+            ).fetchone()
+        return _load_program(row[0]) if row is not None else None
+
+    def store_program(self, context: str, program: Program) -> None:
+        """context の cvt / fpgm / prep を保存する."""
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO programs (context, data) VALUES (?, ?)",
+                (context, _dump_program(program)),
+            )
@@ -0,0 +1,141 @@
+"""task ごとの過去の所要時間とピークRSS. scheduler の投入順・投入制御と generate --plan に使う.
+
+cache_dir/history.json に、task の history key ごとの所要秒数 (指数移動平均)・
+stageごとの内訳・ピークRSSを保存する. history key は入力フォントのhashを含まないため、
+入力を差し替えても直前の実測値を見積もりに使い続ける.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+HISTORY_FILENAME = "history.json"
+# 新しい実測値の重み. 直近のbuild環境 (jobs数・tmpfsの有無など) の影響を早めに反映する.
+SMOOTHING = 0.5
+# 履歴が無い種類のtaskの見積もり秒数. 4並列のDocker環境でのおおよその実測値.
+DEFAULT_SECONDS: dict[str, float] = {
+    "prepare-en": 10.0,
+    "prepare-jp": 90.0,
+    "build": 600.0,
+    "build+nerd": 780.0,
+    "build+overlay": 630.0,
+    "mono-delta": 60.0,
+    "italic": 30.0,
+}
+FALLBACK_SECONDS = 60.0
+
+
+def kind_of(key: str) -> str:
+    """history key ("build+nerd:RobotoMonoPlex-Bold" など) のtaskの種類部分."""
+    return key.partition(":")[0]
+
+
+@dataclass
+class HistoryEntry:
+    """history key 1つ分の実測値."""
+
+    seconds: float
+    runs: int = 1
+    stages: dict[str, float] = field(default_factory=dict)
+    # byte. 0なら未計測.
+    peak_rss: int = 0
+
+
+class History:
+    """history.json の読み書き."""
+
+    def __init__(self, path: Path, entries: dict[str, HistoryEntry] | None = None) -> None:
+        """path の履歴を entries で初期化する. 読み込みは load を使う."""
+        self.path = path
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def load(cls, cache_dir: Path) -> History:
+        """cache_dir の履歴を読み込む. 無い・壊れている場合は空の履歴にする."""
+        path = cache_dir / HISTORY_FILENAME
+        try:
+            data = json.loads(path.read_text())
+            entries = {
+                key: HistoryEntry(
+                    seconds=float(value["seconds"]),
+                    runs=int(value.get("runs", 1)),
+                    stages={name: float(s) for name, s in value.get("stages", {}).items()},
+                    peak_rss=int(value.get("peak_rss", 0)),
+                )
+                for key, value in data["tasks"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            entries = {}
+        return cls(path, entries)
+
+    def record(
+        self,
+        key: str,
+        seconds: float,
+        stages: dict[str, float] | None = None,
+        peak_rss: int | None = None,
+    ) -> None:
+        """key の実測値を加える. 既にあれば指数移動平均で更新する.
+
+        ピークRSSは、OOMを避けるため増えた値はそのまま採り、減った値だけ平均で下げる.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = HistoryEntry(seconds, 1, dict(stages or {}), peak_rss or 0)
+            return
+        entry.seconds += SMOOTHING * (seconds - entry.seconds)
+        entry.runs += 1
+        for name, value in (stages or {}).items():
+            previous = entry.stages.get(name, value)
+            entry.stages[name] = previous + SMOOTHING * (value - previous)
+        if peak_rss:
+            if peak_rss >= entry.peak_rss:
+                entry.peak_rss = peak_rss
+            else:
+                entry.peak_rss = round(entry.peak_rss + SMOOTHING * (peak_rss - entry.peak_rss))
+
+    def estimate(self, key: str) -> float:
+        """key のtaskの見積もり秒数.
+
+        実測が無ければ同じ種類のtaskの平均、それも無ければ DEFAULT_SECONDS を使う.
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry.seconds
+        kind = kind_of(key)
+        same_kind = [e.seconds for k, e in self.entries.items() if kind_of(k) == kind]
+        if same_kind:
+            return sum(same_kind) / len(same_kind)
+        return DEFAULT_SECONDS.get(kind, FALLBACK_SECONDS)
+
+    def peak_rss(self, key: str) -> int | None:
+        """key のtaskの実測ピークRSS (byte). 未計測ならNone."""
+        entry = self.entries.get(key)
+        return entry.peak_rss if entry is not None and entry.peak_rss else None
+
+    def is_measured(self, key: str) -> bool:
+        """key の実測値があるか."""
+        return key in self.entries
+
+    def save(self) -> None:
+        """履歴を書き出す. 並行するgenerateと競合しても壊れないよう置き換えで書く."""
+        data: dict[str, Any] = {
+            "version": 1,
+            "tasks": {
+                key: {
+                    "seconds": round(e.seconds, 3),
+                    "runs": e.runs,
+                    "stages": {name: round(value, 3) for name, value in e.stages.items()},
+                    "peak_rss": e.peak_rss,
+                }
+                for key, e in sorted(self.entries.items())
+            },
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
@@ -0,0 +1,372 @@
+"""生成済みの Regular/Bold の ttf/otf から、fontToolsで Italic/BoldItalic を派生させる.
+
+FontForge で merge からやり直す代わりに、完成したフォントの glyf 座標へ
+make_italic と同じ範囲の skew をまとめてかけ、Italic用のメタデータに書き換える.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+from fontTools.misc.bezierTools import solveQuadratic, splitCubicAtT, splitQuadraticAtT
+from fontTools.misc.roundTools import otRound
+from fontTools.pens.basePen import BasePen
+from fontTools.pens.boundsPen import BoundsPen
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.transformPen import TransformPen
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables import ttProgram
+from fontTools.ttLib.tables._g_l_y_f import (
+    Glyph,
+    GlyphCoordinates,
+    flagOnCurve,
+    flagOverlapSimple,
+)
+
+from . import params, properties
+from .fontforge_helpers import ITALIC_CODEPOINT_RANGES, ITALIC_GLYPH_NAME_RANGES, skew_factor
+
+# fsSelection の ITALIC / BOLD / REGULAR bit.
+_FS_SELECTION_STYLE_MASK = 0b0110_0001
+# head.macStyle の BOLD / ITALIC bit.
+_MAC_STYLE_BOLD = 1 << 0
+_MAC_STYLE_ITALIC = 1 << 1
+
+Point = tuple[float, float]
+
+
+def italic_glyph_names(font: TTFont, exclude_ranges: Sequence[tuple[int, int]] = ()) -> set[str]:
+    """make_italic が選択するglyphの名前を返す.
+
+    codepointは ITALIC_CODEPOINT_RANGES のうち exclude_ranges に入らないもの.
+    名前レンジ (ITALIC_GLYPH_NAME_RANGES) はFontForgeのencoding順の代わりにglyph順で解釈し、
+    cmapに無いglyph (半角字形などの異体字) だけを選ぶ. 生成したTTFのglyph順では
+    名前レンジの間に encodeされたglyphも並ぶが、それらは codepointレンジだけで選ぶ.
+    """
+    cmap = font.getBestCmap()
+    names: set[str] = set()
+    for code, name in cmap.items():
+        if params.in_ranges(code, ITALIC_CODEPOINT_RANGES) and not params.in_ranges(
+            code, exclude_ranges
+        ):
+            names.add(name)
+    encoded = set(cmap.values())
+    order = font.getGlyphOrder()
+    index = {name: i for i, name in enumerate(order)}
+    for first, last in ITALIC_GLYPH_NAME_RANGES:
+        if first in index and last in index:
+            names.update(
+                name for name in order[index[first] : index[last] + 1] if name not in encoded
+            )
+    return names
+
+
+def _depends_on(glyf: Any, name: str, targets: set[str], memo: dict[str, bool]) -> bool:
+    """name が targets のglyphを (間接的にも) componentとして参照するか."""
+    if name not in memo:
+        memo[name] = False
+        glyph = glyf[name]
+        if glyph.isComposite():
+            memo[name] = any(
+                component.glyphName in targets
+                or _depends_on(glyf, component.glyphName, targets, memo)
+                for component in glyph.components
+            )
+    return memo[name]
+
+
+def decompose_glyph(glyf: Any, name: str) -> Glyph:
+    """composite glyph の componentを展開した単純glyphを返す (glyf は変更しない)."""
+    coordinates, end_points, flags = glyf[name].getCoordinates(glyf)
+    glyph = Glyph()
+    glyph.numberOfContours = len(end_points)
+    glyph.coordinates = GlyphCoordinates(coordinates)
+    glyph.endPtsOfContours = list(end_points)
+    glyph.flags = array("B", (flag & 0x01 for flag in flags))
+    glyph.program = ttProgram.Program()
+    glyph.program.fromBytecode(b"")
+    return glyph
+
+
+def skew_coordinates(coordinate_sets: Iterable[GlyphCoordinates], factor: float) -> None:
+    """複数glyphの座標に x += factor * y をかける (in place)."""
+    for coords in coordinate_sets:
+        if len(coords):
+            coords.transform(((1, 0), (factor, 1)))
+
+
+def _rounds_apart(point: Point, *others: Point) -> bool:
+    """整数化しても point が others のどれとも重ならないか."""
+    rounded = (otRound(point[0]), otRound(point[1]))
+    return all(rounded != (otRound(x), otRound(y)) for x, y in others)
+
+
+def _quadratic_extrema(p0: Point, p1: Point, p2: Point) -> list[float]:
+    """2次ベジエ曲線の内部で x か y が極値になる t (昇順)."""
+    ts: set[float] = set()
+    for axis in (0, 1):
+        denominator = p0[axis] - 2 * p1[axis] + p2[axis]
+        if not denominator:
+            continue
+        t = (p0[axis] - p1[axis]) / denominator
+        if 0 < t < 1:
+            point = (
+                (1 - t) ** 2 * p0[0] + 2 * t * (1 - t) * p1[0] + t**2 * p2[0],
+                (1 - t) ** 2 * p0[1] + 2 * t * (1 - t) * p1[1] + t**2 * p2[1],
+            )
+            if _rounds_apart(point, p0, p2):
+                ts.add(t)
+    return sorted(ts)
+
+
+def _cubic_extrema(p0: Point, p1: Point, p2: Point, p3: Point) -> list[float]:
+    """3次ベジエ曲線の内部で x か y が極値になる t (昇順)."""
+    ts: set[float] = set()
+    for axis in (0, 1):
+        a = p3[axis] - 3 * p2[axis] + 3 * p1[axis] - p0[axis]
+        b = 2 * (p2[axis] - 2 * p1[axis] + p0[axis])
+        c = p1[axis] - p0[axis]
+        for t in solveQuadratic(a, b, c):
+            if 0 < t < 1:
+                (_, _, _, point), _ = splitCubicAtT(p0, p1, p2, p3, t)
+                if _rounds_apart(point, p0, p3):
+                    ts.add(t)
+    return sorted(ts)
+
+
+def _contour_with_extrema(points: list[tuple[Point, bool]]) -> list[tuple[Point, bool]] | None:
+    """glyf の1 contour ((座標, on-curveか) の列) に極値点を足した列. 足す点が無ければNone.
+
+    連続するoff-curveの間の暗黙のon-curveは、隣の曲線を分割したときだけ明示する.
+    """
+    # (座標, on-curveか, 暗黙のon-curveか).
+    explicit: list[tuple[Point, bool, bool]] = []
+    for index, (point, on_curve) in enumerate(points):
+        explicit.append((point, on_curve, False))
+        following, following_on_curve = points[(index + 1) % len(points)]
+        if not on_curve and not following_on_curve:
+            middle = ((point[0] + following[0]) / 2, (point[1] + following[1]) / 2)
+            explicit.append((middle, True, True))
+    if len(explicit) < 3:
+        return None
+
+    splits: dict[int, list[tuple[Point, ...]]] = {}
+    required: set[int] = set()
+    for index, (point, on_curve, _) in enumerate(explicit):
+        if on_curve:
+            continue
+        before = (index - 1) % len(explicit)
+        after = (index + 1) % len(explicit)
+        start, end = explicit[before][0], explicit[after][0]
+        ts = _quadratic_extrema(start, point, end)
+        if ts:
+            splits[index] = splitQuadraticAtT(start, point, end, *ts)
+            required.update((before, after))
+    if not splits:
+        return None
+
+    contour: list[tuple[Point, bool]] = []
+    for index, (point, on_curve, implied) in enumerate(explicit):
+        if index in splits:
+            segments = splits[index]
+            for number, (_, control, end) in enumerate(segments):
+                contour.append((control, False))
+                if number < len(segments) - 1:
+                    contour.append((end, True))
+        elif not implied or index in required:
+            contour.append((point, on_curve))
+    return contour
+
+
+def add_extrema(glyph: Glyph) -> None:
+    """単純glyphの曲線を x/y の極値で分割し、極値点を足す (in place, FontForgeの addExtrema 相当)."""
+    coordinates = list(glyph.coordinates)
+    new_coordinates: list[Point] = []
+    new_flags: list[int] = []
+    end_points: list[int] = []
+    changed = False
+    start = 0
+    for last in glyph.endPtsOfContours:
+        points = [
+            (coordinates[index], bool(glyph.flags[index] & flagOnCurve))
+            for index in range(start, last + 1)
+        ]
+        contour = _contour_with_extrema(points)
+        if contour is None:
+            contour = points
+        else:
+            changed = True
+        new_coordinates.extend(point for point, _ in contour)
+        new_flags.extend(flagOnCurve if on_curve else 0 for _, on_curve in contour)
+        end_points.append(len(new_coordinates) - 1)
+        start = last + 1
+    if not changed:
+        return
+    new_flags[0] |= glyph.flags[0] & flagOverlapSimple
+    glyph.coordinates = GlyphCoordinates(new_coordinates)
+    glyph.coordinates.toInt()
+    glyph.flags = array("B", new_flags)
+    glyph.endPtsOfContours = end_points
+
+
+class _ExtremaPen(BasePen):
+    """3次ベジエ曲線を x/y の極値で分割して out_pen に描く (CFF用の addExtrema)."""
+
+    def __init__(self, out_pen: Any) -> None:
+        super().__init__(None)
+        self.out_pen = out_pen
+
+    def _moveTo(self, pt: Point) -> None:
+        self.out_pen.moveTo(pt)
+
+    def _lineTo(self, pt: Point) -> None:
+        self.out_pen.lineTo(pt)
+
+    def _curveToOne(self, pt1: Point, pt2: Point, pt3: Point) -> None:
+        start = self._getCurrentPoint()
+        ts = _cubic_extrema(start, pt1, pt2, pt3)
+        for _, control1, control2, end in splitCubicAtT(start, pt1, pt2, pt3, *ts):
+            self.out_pen.curveTo(control1, control2, end)
+
+    def _closePath(self) -> None:
+        self.out_pen.closePath()
+
+    def _endPath(self) -> None:
+        self.out_pen.endPath()
+
+
+def _skew_glyf(font: TTFont, names: set[str], factor: float) -> None:
+    """glyf の names を skew し、整数化・極値点の追加・bbox/lsb再計算・instructionの破棄を行う."""
+    glyf = font["glyf"]
+    hmtx = font["hmtx"]
+    # 選択外のglyphが選択glyphを参照していると一緒に傾いてしまうため、
+    # skew前の形で展開しておく. 選択されたcompositeも展開してから傾ける.
+    memo: dict[str, bool] = {}
+    for name in font.getGlyphOrder():
+        if glyf[name].isComposite() and (name in names or _depends_on(glyf, name, names, memo)):
+            glyf[name] = decompose_glyph(glyf, name)
+
+    targets = [glyf[name] for name in sorted(names) if glyf[name].numberOfContours > 0]
+    skew_coordinates((glyph.coordinates for glyph in targets), factor)
+    for name in sorted(names):
+        glyph = glyf[name]
+        if glyph.numberOfContours <= 0:
+            continue
+        # FontForge版 (fix_all_glyph_points(do_round=True, add_extrema=True)) と同じく
+        # 整数化してから、傾けて内部に移った極値に点を足す.
+        glyph.coordinates.toInt()
+        add_extrema(glyph)
+        glyph.recalcBounds(glyf)
+        # 傾けたoutlineには元のhintingが合わない.
+        glyph.program = ttProgram.Program()
+        glyph.program.fromBytecode(b"")
+        width, _ = hmtx[name]
+        hmtx[name] = (width, glyph.xMin)
+
+
+def _skew_cff(font: TTFont, names: set[str], factor: float) -> None:
+    """CFF の names のcharstringを skew し、極値点を足したoutlineで描き直す."""
+    top = font["CFF "].cff.topDictIndex[0]
+    charstrings = top.CharStrings
+    glyph_set = font.getGlyphSet()
+    hmtx = font["hmtx"]
+    for name in sorted(names):
+        old = charstrings[name]
+        private = old.private
+        width, _ = hmtx[name]
+        # charstringのwidthは defaultWidthX なら省略し、それ以外は nominalWidthX との差で持つ.
+        default_width = getattr(private, "defaultWidthX", 0)
+        nominal_width = getattr(private, "nominalWidthX", 0)
+        pen = T2CharStringPen(None if width == default_width else width - nominal_width, glyph_set)
+        glyph_set[name].draw(TransformPen(_ExtremaPen(pen), (1, 0, factor, 1, 0, 0)))
+        charstrings[name] = pen.getCharString(private=private, globalSubrs=old.globalSubrs)
+    glyph_set = font.getGlyphSet()
+    for name in sorted(names):
+        bounds_pen = BoundsPen(glyph_set)
+        glyph_set[name].draw(bounds_pen)
+        width, _ = hmtx[name]
+        hmtx[name] = (width, 0 if bounds_pen.bounds is None else round(bounds_pen.bounds[0]))
+
+
+def _replace_all(value: str, replacements: Iterable[tuple[str, str]]) -> str:
+    for old, new in replacements:
+        value = value.replace(old, new)
+    return value
+
+
+def _rename_style(font: TTFont, familyname: str, base_style: str, style: str) -> None:
+    """name table の style部分を base_style から style へ書き換える."""
+    subfamily = properties.subfamily_of(style)
+    replacements = (
+        (f"{familyname}-{base_style}", f"{familyname}-{style}"),
+        (f"{familyname} {base_style}", f"{familyname} {style}"),
+    )
+    for record in font["name"].names:
+        if record.nameID == 2:
+            record.string = subfamily
+        elif record.nameID in (3, 4, 6):
+            record.string = _replace_all(record.toUnicode(), replacements)
+    if "CFF " in font:
+        cff = font["CFF "].cff
+        cff.fontNames = [_replace_all(name, replacements) for name in cff.fontNames]
+        top = cff.topDictIndex[0]
+        if hasattr(top, "FullName"):
+            top.FullName = _replace_all(top.FullName, replacements)
+
+
+def _patch_metadata(
+    font: TTFont, familyname: str, base_style: str, style: str, italic_angle: float
+) -> None:
+    """post / hhea / OS/2 / head / name を Italic用に書き換える."""
+    style_property = properties.STYLE_PROPERTIES[style]
+    font["post"].italicAngle = float(italic_angle)
+    if "CFF " in font:
+        font["CFF "].cff.topDictIndex[0].ItalicAngle = italic_angle
+
+    units_per_em = font["head"].unitsPerEm
+    hhea = font["hhea"]
+    hhea.caretSlopeRise = units_per_em
+    hhea.caretSlopeRun = round(units_per_em * skew_factor(italic_angle))
+
+    os2 = font["OS/2"]
+    os2.fsSelection = (os2.fsSelection & ~_FS_SELECTION_STYLE_MASK) | style_property.os2_stylemap
+    os2.panose.bLetterForm = style_property.panose_letterform
+
+    head = font["head"]
+    head.macStyle |= _MAC_STYLE_ITALIC
+    if style_property.weight == "Bold":
+        head.macStyle |= _MAC_STYLE_BOLD
+
+    _rename_style(font, familyname, base_style, style)
+
+
+def derive_italic(
+    upright: Path,
+    output: Path,
+    *,
+    familyname: str,
+    style: str,
+    italic_angle: float,
+    exclude_ranges: Sequence[tuple[int, int]] = (),
+) -> Path:
+    """生成済みの upright (Regular/Bold) のttf/otfから style のItalicを作り output に書き出す.
+
+    glyphの選択は make_italic と同じ範囲で、exclude_ranges (Nerd Font patch後のglyphなど)
+    は傾けない. 傾けたglyphは整数座標に丸めて極値点を足し、TrueType instructionは破棄する.
+    """
+    base_style = properties.base_style_of(style)
+    font = TTFont(str(upright))
+    names = italic_glyph_names(font, exclude_ranges)
+    factor = skew_factor(italic_angle)
+    if "glyf" in font:
+        _skew_glyf(font, names, factor)
+    else:
+        _skew_cff(font, names, factor)
+    _patch_metadata(font, familyname, base_style, style, italic_angle)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    font.save(str(output))
+    font.close()
+    return output
@@ -0,0 +1,110 @@
+"""task ごとのピークRSSの計測と見積もり. --max-memory の投入制御と --jobs auto に使う.
+
+FontForgeのbuildは、ENフォント・JPフォント・merge後のフォントを同時に開くため、
+ピークRSSは入力フォントのglyph数にほぼ比例する. 実測 (history) が無いtaskは、
+入力のglyph数 (maxp) から見積もる.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import resource
+import sys
+from collections.abc import Iterable
+from pathlib import Path
+
+from fontTools.ttLib import TTFont, TTLibError
+
+PROC_STATUS_PATH = Path("/proc/self/status")
+PROC_CLEAR_REFS_PATH = Path("/proc/self/clear_refs")
+
+MIB = 1024**2
+# taskの種類ごとの (固定分, glyph 1つあたり) のRSS. 手元のDocker環境での実測からの概算.
+# FontForgeのglyphはoutline・hint・undo情報を持つため、fontToolsより1桁重い.
+RSS_MODEL: dict[str, tuple[int, int]] = {
+    "prepare-en": (250 * MIB, 40 * 1024),
+    "prepare-jp": (250 * MIB, 40 * 1024),
+    "build": (300 * MIB, 60 * 1024),
+    "build+nerd": (300 * MIB, 60 * 1024),
+    "build+overlay": (300 * MIB, 60 * 1024),
+    "mono-delta": (300 * MIB, 60 * 1024),
+    "italic": (150 * MIB, 8 * 1024),
+}
+# 入力フォントを読めないときのglyph数. 大きめのCJKフォント相当.
+FALLBACK_GLYPHS = 25_000
+
+_glyph_counts: dict[tuple[str, int, int], int] = {}
+
+
+def glyph_count(path: Path) -> int | None:
+    """フォントの glyph数 (maxp.numGlyphs). 読めなければNone. maxpだけを読む."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    count = _glyph_counts.get(memo_key)
+    if count is None:
+        try:
+            with TTFont(str(path), lazy=True, fontNumber=0) as font:
+                count = int(font["maxp"].numGlyphs)
+        except (OSError, TTLibError, KeyError, AssertionError):
+            return None
+        _glyph_counts[memo_key] = count
+    return count
+
+
+def estimate_peak_rss(kind: str, sources: Iterable[Path]) -> int:
+    """kind の task が sources を入力にしたときのピークRSSの見積もり (byte)."""
+    base, per_glyph = RSS_MODEL.get(kind, RSS_MODEL["build"])
+    glyphs = 0
+    for source in sources:
+        count = glyph_count(source)
+        glyphs += count if count is not None else FALLBACK_GLYPHS
+    return base + per_glyph * glyphs
+
+
+def with_shard_processes(peak: int, processes: int) -> int:
+    """shard のprocessを processes 個並列に起動する task のピークRSS.
+
+    各processはフォント全体を開くため、task本体と同じだけ使うとみなす.
+    peak_rss() は task本体のprocessしか計らないため、履歴の値にも掛ける.
+    """
+    return peak * (1 + processes)
+
+
+def reset_peak_rss() -> None:
+    """現在のprocessのピークRSS (VmHWM) を今のRSSに戻す. Linux以外では何もしない.
+
+    常駐workerで、前のtaskのピークが次のtaskの計測に残らないようにする.
+    """
+    with contextlib.suppress(OSError):
+        PROC_CLEAR_REFS_PATH.write_text("5")
+
+
+def peak_rss() -> int | None:
+    """現在のprocessのピークRSS (byte). 読めなければNone."""
+    try:
+        for line in PROC_STATUS_PATH.read_text(encoding="utf-8").splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if not maxrss:
+        return None
+    # macOSはbyte、Linuxはkilobyte.
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def auto_jobs(peaks: Iterable[int], available: int | None, cores: int | None = None) -> int:
+    """core数と空きメモリから worker 数を決める.
+
+    最も重いtaskが全workerで同時に走っても available に収まる数にする.
+    """
+    cores = cores or os.cpu_count() or 1
+    heaviest = max(peaks, default=0)
+    if available is None or heaviest <= 0:
+        return cores
+    return max(1, min(cores, available // heaviest))
@@ -0,0 +1,134 @@
+"""Nerd Font glyphを、patch済みの小さなcarrierフォントから各buildの出力へ重ねる.
+
+font-patcher はCJKを含むフォント全体を読み書きするため重い. patcherがglyphの配置に使うのは
+em・縦metrics・Latin/罫線glyphのadvanceだけなので、それらだけを残したcarrierフォントを
+1回patchしてcacheし、できたNerd glyphを fontTools で各buildの出力にコピーする.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from pathlib import Path
+
+from fontTools import subset
+from fontTools.ttLib import TTFont
+
+from . import params
+from .italic import decompose_glyph
+
+# carrierに残すcodepoint. font-patcher はLatin (U+0000-017F) のadvanceからcell幅を、
+# 罫線・ブロック要素 (U+2500-259F) からPowerline glyphの寸法を決める.
+CARRIER_RANGES: list[tuple[int, int]] = [
+    (0x0000, 0x017F),
+    (0x2500, 0x259F),
+]
+
+
+def carrier_signature(font: TTFont) -> dict[str, object]:
+    """font-patcher の出力に効く値だけを集めた dict. carrierのcache keyに使う.
+
+    Italicとuprightはadvanceと縦metricsが同じなので、同じcarrierを共有できる.
+    """
+    os2 = font["OS/2"]
+    hhea = font["hhea"]
+    hmtx = font["hmtx"]
+    advances = {
+        f"{code:04X}": hmtx[name][0]
+        for code, name in sorted(font.getBestCmap().items())
+        if params.in_ranges(code, CARRIER_RANGES)
+    }
+    return {
+        "units_per_em": font["head"].unitsPerEm,
+        "hhea": [hhea.ascent, hhea.descent, hhea.lineGap],
+        "typo": [os2.sTypoAscender, os2.sTypoDescender, os2.sTypoLineGap],
+        "win": [os2.usWinAscent, os2.usWinDescent],
+        "use_typo_metrics": bool(os2.fsSelection & (1 << 7)),
+        "advances": advances,
+    }
+
+
+def make_carrier(source: Path, output: Path) -> Path:
+    """source からcarrierの codepoint だけを残したTTFを output に書き出す."""
+    font = TTFont(str(source))
+    options = subset.Options()
+    options.name_IDs = ["*"]
+    options.name_languages = ["*"]
+    options.name_legacy = True
+    options.glyph_names = True
+    options.notdef_outline = True
+    options.layout_features = []
+    options.prune_unicode_ranges = False
+    subsetter = subset.Subsetter(options)
+    codes = [code for code in font.getBestCmap() if params.in_ranges(code, CARRIER_RANGES)]
+    subsetter.populate(unicodes=codes)
+    subsetter.subset(font)
+    font.save(str(output))
+    font.close()
+    return output
+
+
+def _unique_name(name: str, existing: set[str]) -> str:
+    candidate = name
+    suffix = 1
+    while candidate in existing:
+        candidate = f"{name}.nerd{suffix}"
+        suffix += 1
+    return candidate
+
+
+def overlay_nerd_glyphs(
+    target: Path,
+    nerd_font: Path,
+    output: Path,
+    ranges: Sequence[tuple[int, int]] = params.NERD_FONT_RANGES,
+) -> list[int]:
+    """patch済みcarrier (nerd_font) の ranges 内のglyphを target に重ね、output に書き出す.
+
+    target に既にあるcodepointは、font-patcher と同じくNerd glyphで上書きする.
+    重ねたcodepointを返す.
+    """
+    font = TTFont(str(target))
+    nerd = TTFont(str(nerd_font))
+    nerd_glyf, nerd_hmtx = nerd["glyf"], nerd["hmtx"]
+    # glyph順を変える前に、glyph順に依存するtableを読み込んでおく.
+    glyf, hmtx = font["glyf"], font["hmtx"]
+    cmap = font.getBestCmap()
+    order = font.getGlyphOrder()
+    existing = set(order)
+    overlay: list[tuple[int, str, str]] = []
+    added: dict[int, str] = {}
+    for code, nerd_name in sorted(nerd.getBestCmap().items()):
+        if not params.in_ranges(code, ranges):
+            continue
+        name = cmap.get(code)
+        if name is None:
+            name = _unique_name(nerd_name, existing)
+            existing.add(name)
+            added[code] = name
+        overlay.append((code, name, nerd_name))
+    if added:
+        font.setGlyphOrder(order + list(added.values()))
+        # glyphごとのdevice metricsのcache. glyph数が変わると壊れるため捨てる.
+        for tag in ("hdmx", "LTSH"):
+            if tag in font:
+                del font[tag]
+
+    for _, name, nerd_name in overlay:
+        glyph = nerd_glyf[nerd_name]
+        if glyph.isComposite():
+            glyph = decompose_glyph(nerd_glyf, nerd_name)
+        glyf[name] = glyph
+        glyph.recalcBounds(glyf)
+        width, _ = nerd_hmtx[nerd_name]
+        hmtx[name] = (width, getattr(glyph, "xMin", 0))
+    for table in font["cmap"].tables:
+        if not table.isUnicode():
+            continue
+        for code, name in added.items():
+            if code <= 0xFFFF or table.format in (12, 13):
+                table.cmap[code] = name
+    output.parent.mkdir(parents=True, exist_ok=True)
+    font.save(str(output))
+    font.close()
+    nerd.close()
+    return [code for code, _, _ in overlay]
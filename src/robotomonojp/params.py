@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from collections.abc import Sequence
+
 # refer: https://www.asahi-net.or.jp/~ax2s-kmtn/ref/unicode/index_u.html
 
 ASCII_SYMBOLS: tuple[int, int] = (0x0021, 0x002F)
@@ -106,3 +108,29 @@ LIGATURE_FEATURES: tuple[str, ...] = (
     "hlig",
     "calt",
 )
+
+# Nerd Fonts font-patcher (--complete) が書き込むcodepointレンジ (v3系).
+# patch後のフォントを加工する処理で、nerd glyphを上書き・変形しないために使う.
+NERD_FONT_RANGES: list[tuple[int, int]] = [
+    (0x23FB, 0x23FE),  # IEC Power Symbols
+    (0x2665, 0x2665),  # Octicons
+    (0x26A1, 0x26A1),  # Octicons
+    (0x276C, 0x2771),  # Heavy Angle Brackets
+    (0x2B58, 0x2B58),  # IEC Power Symbols
+    (0xE000, 0xE00A),  # Pomicons
+    (0xE0A0, 0xE0D7),  # Powerline / Powerline Extra
+    (0xE200, 0xE2A9),  # Font Awesome Extension
+    (0xE300, 0xE3E3),  # Weather Icons
+    (0xE5FA, 0xE6B7),  # Seti-UI + Custom
+    (0xE700, 0xE8EF),  # Devicons
+    (0xEA60, 0xEC1E),  # Codicons
+    (0xED00, 0xF2FF),  # Font Awesome
+    (0xF300, 0xF381),  # Font Logos
+    (0xF400, 0xF533),  # Octicons
+    (0xF0001, 0xF1AF0),  # Material Design Icons
+]
+
+
+def in_ranges(code: int, ranges: Sequence[tuple[int, int]]) -> bool:
+    """code が (start, end) のいずれかのレンジ (両端含む) に入るか判定する."""
+    return any(start <= code <= end for start, end in ranges)
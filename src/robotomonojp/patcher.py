@@ -2,10 +2,14 @@
 
 from __future__ import annotations
 
+import hashlib
+import resource
 import shutil
 import subprocess
 from pathlib import Path
 
+from . import tracing
+
 # submoduleのrootパス. リポジトリ直下 vendor/nerd-fonts.
 DEFAULT_NERD_FONTS_ROOT = Path("vendor/nerd-fonts")
 
@@ -26,6 +30,39 @@ def find_font_patcher(root: Path = DEFAULT_NERD_FONTS_ROOT) -> Path:
     return candidate
 
 
+def _resolve_git_dir(root: Path) -> Path | None:
+    """submoduleの .git (ファイルなら gitdir: の参照先) を返す."""
+    dot_git = root / ".git"
+    if dot_git.is_dir():
+        return dot_git
+    if dot_git.is_file():
+        content = dot_git.read_text(encoding="utf-8").strip()
+        if content.startswith("gitdir:"):
+            return (root / content.removeprefix("gitdir:").strip()).resolve()
+    return None
+
+
+def nerd_fonts_revision(root: Path = DEFAULT_NERD_FONTS_ROOT) -> str:
+    """submoduleのcommit hashを返す.
+
+    Docker内ではリポジトリの所有者が異なり git コマンドが safe.directory で
+    失敗しうるため、HEADを直接読む. commitが分からなければ font-patcher の
+    内容のhashで代用する.
+    """
+    git_dir = _resolve_git_dir(root)
+    if git_dir is not None:
+        try:
+            head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+            if head.startswith("ref:"):
+                ref = head.removeprefix("ref:").strip()
+                head = (git_dir / ref).read_text(encoding="utf-8").strip()
+            return head
+        except OSError:
+            pass
+    script = find_font_patcher(root)
+    return "font-patcher:" + hashlib.sha256(script.read_bytes()).hexdigest()
+
+
 def patch(
     input_font: Path,
     output_dir: Path,
@@ -60,7 +97,14 @@ def patch(
     if extra_args:
         cmd.extend(extra_args)
 
-    proc = subprocess.run(cmd, capture_output=True, text=True, check=False)
+    # subprocess内は計測できないため、trace には1つのspanと子processのCPU時間を残す.
+    with tracing.span("font-patcher", input=input_font.name) as args:
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        proc = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        args["user_seconds"] = round(after.ru_utime - before.ru_utime, 3)
+        args["system_seconds"] = round(after.ru_stime - before.ru_stime, 3)
+        args["returncode"] = proc.returncode
     if proc.returncode != 0:
         raise NerdFontPatcherError(
             f"font-patcher failed (exit {proc.returncode})\n"
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import base64
 import os
 from html import escape
 from pathlib import Path
@@ -55,6 +56,24 @@ SAMPLES: list[tuple[str, list[str]]] = [
 ]
 
 
+# サイズ別の行とダーク背景の行.
+SIZE_SAMPLE = "ABC日本語abc123 あAアｱ 0OIl1"
+SIZES = (11, 12, 13, 14, 16, 20, 24)
+DARK_SAMPLES = [
+    'const message = "Roboto Mono 日本語 123";',
+    "半角: A B C D / 全角: A　B　C　D",
+]
+
+
+def sample_codepoints() -> list[int]:
+    """プレビューでフォントを使って表示する文字 (SAMPLES の見出しと行・サイズ別・ダーク背景)."""
+    texts = [SIZE_SAMPLE, *DARK_SAMPLES]
+    for section, lines in SAMPLES:
+        texts.append(section)
+        texts.extend(lines)
+    return sorted({ord(char) for text in texts for char in text})
+
+
 def _font_format(font_path: Path) -> str:
     """拡張子からCSSのfont formatを返す."""
     suffix = font_path.suffix.lower()
@@ -68,7 +87,7 @@ def _font_format(font_path: Path) -> str:
 
 
 def _font_url(font_path: Path, output: Path) -> str:
-    """HTMLから見たフォントファイルの相対URLを返す."""
+    """HTMLから見たフォントファイル (またはCSS) の相対URLを返す."""
     output_dir = output.parent.resolve()
     rel_path = os.path.relpath(font_path.resolve(), output_dir)
     return quote(Path(rel_path).as_posix(), safe="/:")
@@ -95,24 +114,61 @@ def _sample_block(title: str, lines: list[str]) -> str:
       </section>"""
 
 
-def generate_preview(font_path: Path, output: Path, title: str | None = None) -> Path:
+def _embedded_url(font_path: Path) -> str:
+    """font_path をプレビューで使う文字だけにsubsetしたWOFF2の data URI を返す."""
+    from .webfont import subset_woff2
+
+    data = subset_woff2(font_path, sample_codepoints())
+    return f"data:font/woff2;base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def generate_preview(
+    font_path: Path, output: Path, title: str | None = None, embed_subset: bool = False
+) -> Path:
     """指定フォントを確認する静的HTMLを生成する.
 
+    font_path に webfont のCSSを渡すと、CSSを読み込み、その @font-face のfamilyで表示する.
+    embed_subset なら、表示する文字だけにsubsetしたWOFF2を data URI でHTMLに埋め込む.
+
     Args:
-        font_path: 表示確認に使うttf/otf/woff/woff2のpath.
+        font_path: 表示確認に使うttf/otf/woff/woff2、または webfont のCSSのpath.
         output: 出力先HTMLのpath.
         title: ページタイトル. 未指定ならフォントのfamily名.
+        embed_subset: フォントを参照せず、subsetをHTMLに埋め込む.
     """
     font_path = font_path.resolve()
     output = output.resolve()
-    page_title = title or _family_name(font_path)
-    font_url = _font_url(font_path, output)
-    font_format = _font_format(font_path)
+    is_css = font_path.suffix.lower() == ".css"
+    if embed_subset and is_css:
+        raise ValueError("embed_subset にはCSSではなくフォントファイルを指定してください")
+    if embed_subset:
+        font_url, font_format = _embedded_url(font_path), "woff2"
+    else:
+        font_url, font_format = _font_url(font_path, output), _font_format(font_path)
+    if is_css:
+        from .webfont import css_family
+
+        face_name = css_family(font_path) or FONT_FACE_NAME
+        page_title = title or face_name
+        font_face = f'<link rel="stylesheet" href="{font_url}">'
+    else:
+        face_name = FONT_FACE_NAME
+        page_title = title or _family_name(font_path)
+        font_face = f"""<style>
+      @font-face {{
+        font-family: "{FONT_FACE_NAME}";
+        src: url("{font_url}") format("{font_format}");
+        font-display: block;
+      }}
+    </style>"""
     sample_blocks = "\n".join(_sample_block(section, lines) for section, lines in SAMPLES)
     sizes = "\n".join(
         f'        <div class="size-row" style="font-size: {size}px">'
-        f"<span>{size}px</span><p>ABC日本語abc123 あAアｱ 0OIl1</p></div>"
-        for size in (11, 12, 13, 14, 16, 20, 24)
+        f"<span>{size}px</span><p>{escape(SIZE_SAMPLE)}</p></div>"
+        for size in SIZES
+    )
+    dark_lines = "\n".join(
+        f'        <p class="sample-line">{escape(line)}</p>' for line in DARK_SAMPLES
     )
 
     html = f"""<!doctype html>
@@ -121,13 +177,8 @@ def generate_preview(font_path: Path, output: Path, title: str | None = None) ->
     <meta charset="utf-8">
     <meta name="viewport" content="width=device-width, initial-scale=1">
     <title>{escape(page_title)} preview</title>
+    {font_face}
     <style>
-      @font-face {{
-        font-family: "{FONT_FACE_NAME}";
-        src: url("{font_url}") format("{font_format}");
-        font-display: block;
-      }}
-
       :root {{
         color-scheme: light dark;
         --bg: #f6f7f9;
@@ -200,7 +251,7 @@ def generate_preview(font_path: Path, output: Path, title: str | None = None) ->
       }}
 
       .font-sample {{
-        font-family: "{FONT_FACE_NAME}", monospace;
+        font-family: "{face_name}", monospace;
         font-feature-settings: "kern" 0;
       }}
 
@@ -216,7 +267,7 @@ def generate_preview(font_path: Path, output: Path, title: str | None = None) ->
           var(--grid) calc(1ch - 1px),
           var(--grid) 1ch
         );
-        font-family: "{FONT_FACE_NAME}", monospace;
+        font-family: "{face_name}", monospace;
         font-feature-settings: "kern" 0;
         font-size: 20px;
         line-height: 1.55;
@@ -234,7 +285,7 @@ def generate_preview(font_path: Path, output: Path, title: str | None = None) ->
         gap: 12px;
         align-items: baseline;
         margin-top: 10px;
-        font-family: "{FONT_FACE_NAME}", monospace;
+        font-family: "{face_name}", monospace;
         font-feature-settings: "kern" 0;
       }}
 
@@ -300,8 +351,7 @@ def generate_preview(font_path: Path, output: Path, title: str | None = None) ->
       </section>
       <section class="theme-dark">
         <h2>ダーク背景</h2>
-        <p class="sample-line">const message = "Roboto Mono 日本語 123";</p>
-        <p class="sample-line">半角: A B C D / 全角: A　B　C　D</p>
+{dark_lines}
       </section>
     </main>
   </body>
@@ -2,9 +2,19 @@
 
 from __future__ import annotations
 
+import importlib.util
+import os
+import re
+import string
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, cast
 
+import yaml
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
 try:  # pragma: no cover
     import fontforge as _fontforge  # type: ignore[import-not-found]
 except ImportError:  # pragma: no cover
@@ -13,6 +23,141 @@ except ImportError:  # pragma: no cover
 fontforge: Any = cast(Any, _fontforge)
 
 DEFAULT_SIZE = 24
+# job file の出力テンプレートの既定値.
+DEFAULT_OUTPUT_TEMPLATE = "{stem}/{sample}-{size}.pdf"
+SAMPLE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+TEMPLATE_FIELDS = {"stem", "sample", "size"}
+
+
+class PrintJobs(BaseModel):
+    """print --jobs-file のスキーマ."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    fonts: list[Path] = Field(default_factory=list, description="レンダリングするttf/otf")
+    samples: dict[str, str] = Field(
+        ..., min_length=1, description="sample名 → 文字列. 空文字列ならglyph table"
+    )
+    sizes: list[int] = Field(default_factory=lambda: [DEFAULT_SIZE], min_length=1)
+    output: str = Field(
+        DEFAULT_OUTPUT_TEMPLATE, description="sample・sizeごとのPDF. {stem} {sample} {size}"
+    )
+    merge: str | None = Field(
+        None, description="指定するとフォントごとに1つのPDFにまとめる. {stem}"
+    )
+
+    @field_validator("samples")
+    @classmethod
+    def _check_sample_names(cls, value: dict[str, str]) -> dict[str, str]:
+        for name in value:
+            if not SAMPLE_NAME_PATTERN.match(name):
+                raise ValueError(f"sample name must match {SAMPLE_NAME_PATTERN.pattern}: {name!r}")
+        return value
+
+    @field_validator("sizes")
+    @classmethod
+    def _check_sizes(cls, value: list[int]) -> list[int]:
+        for size in value:
+            if size <= 0:
+                raise ValueError(f"size must be positive: got {size}")
+        return list(dict.fromkeys(value))
+
+    @field_validator("output")
+    @classmethod
+    def _check_output(cls, value: str) -> str:
+        _check_template(value, TEMPLATE_FIELDS)
+        return value
+
+    @field_validator("merge")
+    @classmethod
+    def _check_merge(cls, value: str | None) -> str | None:
+        if value is not None:
+            _check_template(value, {"stem"})
+        return value
+
+
+def _check_template(template: str, allowed: set[str]) -> None:
+    fields = {name for _, name, _, _ in string.Formatter().parse(template) if name is not None}
+    if not fields <= allowed:
+        raise ValueError(f"unknown template fields {sorted(fields - allowed)} in {template!r}")
+
+
+@dataclass(frozen=True)
+class FontPrintJob:
+    """1フォント分の仕事. renders は (sample, size, 出力PDF) の並び."""
+
+    font_path: Path
+    renders: tuple[tuple[str, int, Path], ...]
+    merged: Path | None = None
+
+
+def load_jobs(path: Path) -> PrintJobs:
+    """job file (YAML) を読む."""
+    with path.open("r", encoding="utf-8") as fp:
+        data = yaml.safe_load(fp)
+    if not isinstance(data, dict):
+        raise ValueError(f"jobs file root must be a mapping, got {type(data).__name__}")
+    return PrintJobs.model_validate(data)
+
+
+def plan_jobs(jobs: PrintJobs, fonts: list[Path] | None = None) -> list[FontPrintJob]:
+    """jobs をフォントごとの FontPrintJob にする. fonts を渡せば job file の fonts の代わりに使う.
+
+    出力先が重なるテンプレートは ValueError.
+    """
+    font_paths = fonts or jobs.fonts
+    if not font_paths:
+        raise ValueError("レンダリングするフォントがありません (fonts)")
+
+    planned: list[FontPrintJob] = []
+    seen: dict[Path, tuple[Path, str, int]] = {}
+    for font_path in font_paths:
+        renders: list[tuple[str, int, Path]] = []
+        for name, sample in jobs.samples.items():
+            for size in jobs.sizes:
+                output = Path(jobs.output.format(stem=font_path.stem, sample=name, size=size))
+                if jobs.merge is None:
+                    if output in seen:
+                        raise ValueError(
+                            f"{output} is written by both {seen[output]} and "
+                            f"{(font_path, name, size)}; add {{stem}} / {{sample}} / {{size}}"
+                        )
+                    seen[output] = (font_path, name, size)
+                renders.append((sample, size, output))
+        merged = None
+        if jobs.merge is not None:
+            merged = Path(jobs.merge.format(stem=font_path.stem))
+            if merged in seen:
+                raise ValueError(f"{merged} is written by multiple fonts; add {{stem}} to merge")
+            seen[merged] = (font_path, "", 0)
+        planned.append(FontPrintJob(font_path, tuple(renders), merged))
+    return planned
+
+
+def has_pypdf() -> bool:
+    """PDFの結合に使う pypdf が入っているか."""
+    return importlib.util.find_spec("pypdf") is not None
+
+
+def _print_sample(font: Any, sample: str, size: int, output: Path) -> None:
+    output.parent.mkdir(parents=True, exist_ok=True)
+    # printSample は (type, pointsize, sample, outputfile) を受ける.
+    # sample が空文字列なら "fontdisplay" タイプでglyph tableを吐く.
+    if not sample:
+        font.printSample("fontdisplay", size, "", str(output))
+    else:
+        font.printSample("fontsample", size, sample, str(output))
+
+
+def _merge_pdfs(pages: list[Path], output: Path) -> None:
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for path in pages:
+        writer.append(str(path))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("wb") as fp:
+        writer.write(fp)
 
 
 def print_pdf(font_path: Path, sample: str, output: Path, size: int | None = None) -> Path:
@@ -27,22 +172,42 @@ def print_pdf(font_path: Path, sample: str, output: Path, size: int | None = Non
         output: 出力先PDFのpath.
         size: レンダリングサイズ (pt). 未指定なら DEFAULT_SIZE.
     """
+    job = FontPrintJob(font_path, ((sample, size or DEFAULT_SIZE, output),))
+    return print_font(job)[0]
+
+
+def print_font(job: FontPrintJob) -> list[Path]:
+    """job のフォントを1回だけ開き、全 (sample, size) をレンダリングする.
+
+    job.merged があればそれぞれのPDFを1つにまとめて書き出し、[job.merged] を返す.
+    """
     if fontforge is None:
         raise RuntimeError("fontforge python bindings が使えません. Docker外で実行していませんか?")
+    if job.merged is not None and not has_pypdf():
+        raise RuntimeError("PDFの結合には pypdf が必要です (pip install pypdf).")
+
+    with tempfile.TemporaryDirectory(prefix="robotomonojp-print-") as tmp:
+        outputs = [
+            Path(tmp) / f"{index:04d}.pdf" if job.merged is not None else output
+            for index, (_, _, output) in enumerate(job.renders)
+        ]
+        font = fontforge.open(str(job.font_path))
+        try:
+            fontforge.printSetup("pdf-file")
+            for (sample, size, _), output in zip(job.renders, outputs, strict=True):
+                _print_sample(font, sample, size, output)
+        finally:
+            font.close()
+        if job.merged is None:
+            return outputs
+        _merge_pdfs(outputs, job.merged)
+    return [job.merged]
 
-    used_size = size or DEFAULT_SIZE
-    output.parent.mkdir(parents=True, exist_ok=True)
 
-    font = fontforge.open(str(font_path))
-    try:
-        fontforge.printSetup("pdf-file")
-        # printSample は (type, pointsize, sample, outputfile) を受ける.
-        # sample が空文字列なら "fontdisplay" タイプでglyph tableを吐く.
-        if not sample:
-            font.printSample("fontdisplay", used_size, "", str(output))
-        else:
-            font.printSample("fontsample", used_size, sample, str(output))
-    finally:
-        font.close()
-
-    return output
+def print_fonts(jobs: list[FontPrintJob], workers: int | None = None) -> list[Path]:
+    """jobs を別processで並列にレンダリングし、出力pathを jobs の順に返す."""
+    if len(jobs) <= 1 or workers == 1:
+        return [path for job in jobs for path in print_font(job)]
+    with ProcessPoolExecutor(max_workers=min(len(jobs), workers or os.cpu_count() or 1)) as pool:
+        futures = [pool.submit(print_font, job) for job in jobs]
+        return [path for future in futures for path in future.result()]
@@ -72,3 +72,8 @@ def base_style_of(style: str) -> Literal["Regular", "Bold"]:
 
 def is_italic(style: str) -> bool:
     return "Italic" in style
+
+
+def subfamily_of(style: str) -> str:
+    """SFNT SubFamily名. "BoldItalic" → "Bold Italic"."""
+    return "".join([" " + c if c.isupper() else c for c in style]).lstrip()
@@ -0,0 +1,252 @@
+"""generate の実行部分. cache復元と、前処理・buildのtask graphの実行・見積もりをまとめる.
+
+CLI (generate) と常駐daemon (serve) が共通で使う. 進捗は echo に1行ずつ渡す.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any
+
+from . import tracing
+from .cache import OutputCache, format_size, gc
+from .generator import (
+    BuildRequest,
+    build,
+    derive_italic_outputs,
+    derive_mono,
+    derives_italic,
+    output_key,
+    output_paths,
+)
+from .history import History, kind_of
+from .memory import auto_jobs, estimate_peak_rss, with_shard_processes
+from .scheduler import Task, TaskMetrics, build_graph, plan, run_graph
+from .scratch import IOStats, available_memory
+
+Echo = Callable[[str], None]
+
+
+def build_one(request: BuildRequest, key: str | None = None) -> tuple[Path, IOStats]:
+    """style 1件分を生成し、出力pathとI/O量を返す. key があれば出力をcacheへ保存する."""
+    io_stats = IOStats()
+    if derives_italic(request):
+        with io_stats.timed("italic"):
+            path = derive_italic_outputs(request, io_stats)
+    elif request.mono and request.mono_delta:
+        with io_stats.timed("delta"):
+            path = derive_mono(request, io_stats)
+    else:
+        path = build(request, io_stats)
+    if key is not None and request.cache_dir is not None:
+        OutputCache(request.cache_dir).store(
+            key,
+            list(output_paths(request)),
+            label=f"{request.config.familyname_for(request.mono)}-{request.style}",
+        )
+    return path, io_stats
+
+
+def format_io_stats(path: Path, io_stats: IOStats) -> str:
+    """build 1件のstageごとの書き込み・読み込み量を1行にする."""
+    stages = ", ".join(
+        f"{name} w={format_size(io.written)} r={format_size(io.read)}"
+        for name, io in io_stats.stages.items()
+    )
+    total = io_stats.total
+    return (
+        f"[io] {path.stem}: total w={format_size(total.written)} r={format_size(total.read)}"
+        f" ({stages})"
+    )
+
+
+def format_seconds(seconds: float) -> str:
+    """所要秒数を 1h02m03s / 4m05s / 6.0s の形にする."""
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, secs = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{secs:02d}s" if hours else f"{minutes}m{secs:02d}s"
+
+
+def _pending_requests(
+    requests: list[BuildRequest],
+    cache_dir: Path,
+    no_cache: bool,
+    echo: Echo,
+    *,
+    restore: bool,
+) -> tuple[list[BuildRequest], list[str | None], list[Path]]:
+    """cacheに無い request とその出力cache key、cacheにある出力のpathを返す.
+
+    restore が偽なら、cacheにあるかを調べるだけで出力先へは復元しない.
+    """
+    if no_cache:
+        return requests, [None] * len(requests), []
+    output_cache = OutputCache(cache_dir)
+    pending: list[BuildRequest] = []
+    keys: list[str | None] = []
+    hits: list[Path] = []
+    for request in requests:
+        key = output_key(request)
+        ttf_out, _ = output_paths(request)
+        if restore:
+            hit = output_cache.restore(key, ttf_out.parent) is not None
+        else:
+            hit = output_cache.lookup(key) is not None
+        if not hit:
+            pending.append(request)
+            keys.append(key)
+            continue
+        echo(f"[cache] hit {ttf_out.stem}")
+        hits.append(ttf_out)
+    return pending, keys, hits
+
+
+def _estimate(
+    graph: dict[str, Task],
+    history: History,
+    jobs: int | None,
+    max_memory: int | None,
+    echo: Echo,
+) -> tuple[dict[str, float], dict[str, int], int, int | None]:
+    """taskごとの見積もり秒数・ピークRSSと、実際に使う jobs・memory budget を返す.
+
+    jobs が None (--jobs auto) なら、core数と memory budget (未指定なら空きメモリ) から決める.
+    """
+    estimates = {task.id: history.estimate(task.cost_key) for task in graph.values()}
+    memory = {
+        task.id: with_shard_processes(
+            history.peak_rss(task.cost_key)
+            or estimate_peak_rss(kind_of(task.cost_key), task.sources),
+            task.shard_processes,
+        )
+        for task in graph.values()
+    }
+    if jobs is None:
+        if max_memory is None:
+            max_memory = available_memory()
+        jobs = auto_jobs(memory.values(), max_memory)
+        budget = format_size(max_memory) if max_memory is not None else "unknown"
+        echo(f"[schedule] --jobs auto: {jobs} worker(s) (memory budget {budget})")
+    return estimates, memory, jobs, max_memory
+
+
+def run_builds(
+    requests: list[BuildRequest],
+    *,
+    cache_dir: Path,
+    no_cache: bool,
+    max_bytes: int,
+    jobs: int | None,
+    max_memory: int | None = None,
+    trace: Path | None = None,
+    echo: Echo = print,
+    executor: Executor | None = None,
+) -> list[Path]:
+    """requests を生成し、出力ttfのpathを返す.
+
+    入力・config・version・Nerd Fonts・生成コードが前回と同じ出力はcacheから復元する.
+    taskの所要時間とピークRSSは cache_dir の履歴に記録し、次回の投入順・投入制御に使う.
+    jobs が None なら core数と空きメモリから決める. max_memory (byte) があれば、
+    実行中のtaskの見積もりピークRSSの合計がそれに収まる間だけ投入する.
+    trace があれば、全workerのstageを Chrome trace-event形式で書き出す.
+    """
+    requests, keys, results = _pending_requests(requests, cache_dir, no_cache, echo, restore=True)
+    graph = build_graph(
+        zip(requests, keys, strict=True), build_one, None if no_cache else cache_dir
+    )
+    builds = sum(1 for task_id in graph if task_id.startswith("build:"))
+    echo(f"[schedule] {len(graph) - builds} prepare + {builds} build task(s)")
+
+    history = History.load(cache_dir)
+    estimates, memory, jobs, max_memory = _estimate(graph, history, jobs, max_memory, echo)
+
+    events: list[dict[str, Any]] = []
+
+    def on_done(task: Task, result: Any, metrics: TaskMetrics) -> None:
+        events.extend(metrics.events)
+        if not task.id.startswith("build:"):
+            history.record(task.cost_key, metrics.seconds, peak_rss=metrics.peak_rss)
+            echo(f"[prepare] {task.label} ({format_seconds(metrics.seconds)})")
+            return
+        path, io_stats = result
+        history.record(
+            task.cost_key,
+            metrics.seconds,
+            {name: io.seconds for name, io in io_stats.stages.items() if io.seconds},
+            metrics.peak_rss,
+        )
+        echo(format_io_stats(path, io_stats))
+        results.append(path)
+
+    try:
+        run_graph(
+            graph,
+            jobs,
+            executor=executor,
+            on_done=on_done,
+            estimates=estimates,
+            memory=memory,
+            max_memory=max_memory,
+            trace=trace is not None,
+        )
+    finally:
+        # 失敗したrunでも、終わったtaskの実測値は次回の見積もりに使う.
+        if graph:
+            history.save()
+        if trace is not None:
+            tracing.write(trace, events)
+            echo(f"[trace] {len(events)} event(s) -> {trace}")
+
+    for path in results:
+        echo(f"  -> {path}")
+
+    if not no_cache:
+        removed = gc(cache_dir, max_bytes)
+        if removed:
+            echo(f"[cache] evicted {len(removed)} entries")
+    return results
+
+
+def plan_builds(
+    requests: list[BuildRequest],
+    *,
+    cache_dir: Path,
+    no_cache: bool,
+    jobs: int | None,
+    max_memory: int | None = None,
+    echo: Echo = print,
+) -> None:
+    """requests を jobs 並列で生成したときの投入順・critical path・所要時間の見積もりを出す.
+
+    buildは実行せず、FontForgeも使わない. 見積もりは cache_dir の履歴と、
+    履歴の無いtaskは入力フォントのglyph数 (maxp) を使う.
+    """
+    requests, keys, _ = _pending_requests(requests, cache_dir, no_cache, echo, restore=False)
+    graph = build_graph(
+        zip(requests, keys, strict=True), build_one, None if no_cache else cache_dir
+    )
+    history = History.load(cache_dir)
+    estimates, memory, jobs, max_memory = _estimate(graph, history, jobs, max_memory, echo)
+    result = plan(graph, estimates, jobs, memory=memory, max_memory=max_memory)
+
+    budget = f", --max-memory {format_size(max_memory)}" if max_memory is not None else ""
+    echo(f"[plan] {len(graph)} task(s), --jobs {jobs}{budget}")
+    for task_id, (start, end) in result.schedule.items():
+        task = graph[task_id]
+        source = "" if history.is_measured(task.cost_key) else " (no history)"
+        echo(
+            f"[plan] {format_seconds(start):>9} - {format_seconds(end):>9}"
+            f" {format_size(memory[task_id]):>8}  {task.label}{source}"
+        )
+    path = " -> ".join(task.label for task in result.critical_path)
+    critical = sum(estimates[task.id] for task in result.critical_path)
+    echo(f"[plan] critical path ({format_seconds(critical)}): {path}")
+    echo(
+        f"[plan] estimated wall-clock: {format_seconds(result.wall_seconds)}"
+        f" (total work {format_seconds(result.total_seconds)},"
+        f" peak memory {format_size(result.peak_memory)})"
+    )
@@ -0,0 +1,391 @@
+"""generate の全taskを依存関係つきのgraphにして、1つのprocess poolで実行する.
+
+task は EN/JPの前処理 (全config・全styleで重複を除く) と、出力1件分のbuild.
+--mono-delta のMono版と --derive-italic のItalicは、元になる出力のbuildに依存する.
+依存が揃ったtaskから空いているworkerに順次投入するため、config間でも負荷が偏らない.
+投入の順は、過去の所要時間 (history) から見積もった「そのtaskから終わりまでの最長経路」が
+長いものを優先する. 重いbuildとそれに依存する派生buildが最後に残って待たされるのを防ぐ.
+memory budget があれば、実行中のtaskの見積もりピークRSSの合計が budget に収まる間だけ投入する.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any
+
+from . import memory as memory_usage
+from . import properties, tracing
+from .generator import (
+    BuildRequest,
+    PrepareRequest,
+    derives_italic,
+    prepare,
+    prepare_requests_for,
+)
+
+
+@dataclass(frozen=True)
+class Task:
+    """graphの1ノード. fn(*args) をworkerで実行する (fnはpickle可能なtop-levelの関数).
+
+    history_key は所要時間の履歴を引くkey. 空なら id を使う.
+    sources はピークRSSの見積もりに使う入力フォント.
+    shard_processes は task の中で並列に起動する shard のprocess数 (--hint-shards など).
+    """
+
+    id: str
+    label: str
+    fn: Callable[..., Any]
+    args: tuple[Any, ...]
+    deps: tuple[str, ...] = field(default=())
+    history_key: str = ""
+    sources: tuple[Path, ...] = field(default=())
+    shard_processes: int = 0
+
+    @property
+    def cost_key(self) -> str:
+        """所要時間の履歴を引くkey."""
+        return self.history_key or self.id
+
+
+@dataclass(frozen=True)
+class Plan:
+    """generate --plan の見積もり結果."""
+
+    wall_seconds: float
+    total_seconds: float
+    critical_path: list[Task]
+    # task id -> (開始, 終了) の見積もり秒. 開始順に並ぶ.
+    schedule: dict[str, tuple[float, float]]
+    # 同時に実行中のtaskの見積もりピークRSSの合計の最大 (byte).
+    peak_memory: int = 0
+
+
+@dataclass(frozen=True)
+class TaskMetrics:
+    """task 1件の実測値."""
+
+    seconds: float
+    # byte. 計測できなければNone.
+    peak_rss: int | None = None
+    # trace中なら、task内で記録したtrace event.
+    events: list[dict[str, Any]] = field(default_factory=list)
+
+
+def build_task_id(request: BuildRequest) -> str:
+    """build taskのid. familynameはconfig・variantごとに一意."""
+    return f"build:{request.config.familyname_for(request.mono)}-{request.style}"
+
+
+def history_key(request: BuildRequest) -> str:
+    """build taskの所要時間の履歴key. 種類 (フルbuild・派生) とNerd Fontの当て方で分ける."""
+    name = f"{request.config.familyname_for(request.mono)}-{request.style}"
+    if derives_italic(request):
+        return f"italic:{name}"
+    if request.mono and request.mono_delta:
+        return f"mono-delta:{name}"
+    if not request.apply_nerd_font:
+        return f"build:{name}"
+    return f"build+{'overlay' if request.nerd_overlay else 'nerd'}:{name}"
+
+
+def source_request(request: BuildRequest) -> BuildRequest | None:
+    """request が出力を読む元のbuild request. 入力フォントからフルbuildするならNone."""
+    if derives_italic(request):
+        return replace(
+            request, style=properties.base_style_of(request.style), italic_from_upright=False
+        )
+    if request.mono and request.mono_delta:
+        return replace(request, mono=False, mono_delta=False)
+    return None
+
+
+def build_graph(
+    jobs: Iterable[tuple[BuildRequest, str | None]],
+    build_fn: Callable[..., Any],
+    cache_dir: Path | None,
+) -> dict[str, Task]:
+    """build job (request, 出力cache key) の一覧から task graph を作る.
+
+    cache_dir があれば前処理を独立したtaskにして、同じ入力の前処理を1回にまとめる.
+    dict の順序はtaskの宣言順 (依存先が先) になる.
+    """
+    jobs = list(jobs)
+    tasks: dict[str, Task] = {}
+    build_ids = {build_task_id(request) for request, _ in jobs}
+    for request, key in jobs:
+        deps: list[str] = []
+        source = source_request(request)
+        if source is not None:
+            # 元の出力がcacheから復元済みなら、依存は無い.
+            if build_task_id(source) in build_ids:
+                deps.append(build_task_id(source))
+        elif cache_dir is not None:
+            for prepare_request in prepare_requests_for(request):
+                prepare_id = f"prepare:{prepare_request.kind}:{prepare_request.key()}"
+                if prepare_id not in tasks:
+                    tasks[prepare_id] = Task(
+                        id=prepare_id,
+                        label=f"{prepare_request.kind} {prepare_request.source.name}",
+                        fn=prepare,
+                        args=(prepare_request, cache_dir),
+                        history_key=_prepare_history_key(prepare_request),
+                        sources=(prepare_request.source,),
+                        shard_processes=_shard_processes(prepare_request.shards),
+                    )
+                deps.append(prepare_id)
+        task_id = build_task_id(request)
+        tasks[task_id] = Task(
+            id=task_id,
+            label=task_id.removeprefix("build:"),
+            fn=build_fn,
+            args=(request, key),
+            deps=tuple(deps),
+            history_key=history_key(request),
+            sources=tuple(p.source for p in prepare_requests_for(source or request)),
+            shard_processes=_build_shard_processes(request, cache_dir is None)
+            if source is None
+            else 0,
+        )
+    return _topological(tasks)
+
+
+def _shard_processes(shards: int) -> int:
+    return shards if shards > 1 else 0
+
+
+def _build_shard_processes(request: BuildRequest, prepares_inline: bool) -> int:
+    """フルbuildが並列に起動する shard のprocess数.
+
+    前処理taskを分けない (cacheを使わない) ときは、build の中でJPの前処理の shard も起動する.
+    """
+    shards = max(request.hint_shards, request.prepare_shards if prepares_inline else 1)
+    return _shard_processes(shards)
+
+
+def _prepare_history_key(request: PrepareRequest) -> str:
+    suffix = "-mono" if request.kind == "jp" and request.mono else ""
+    return f"prepare-{request.kind}:{request.source.name}{suffix}"
+
+
+def _topological(tasks: dict[str, Task]) -> dict[str, Task]:
+    """依存先が先に来る順に並べ直す. 宣言順はできるだけ保つ."""
+    ordered: dict[str, Task] = {}
+
+    def visit(task: Task, path: tuple[str, ...]) -> None:
+        if task.id in ordered:
+            return
+        if task.id in path:
+            raise ValueError(f"task graph has a cycle: {' -> '.join((*path, task.id))}")
+        for dep in task.deps:
+            visit(tasks[dep], (*path, task.id))
+        ordered[task.id] = task
+
+    for task in tasks.values():
+        visit(task, ())
+    return ordered
+
+
+def priorities(tasks: dict[str, Task], estimates: dict[str, float]) -> dict[str, float]:
+    """taskごとに、そのtaskの開始から依存するtaskが全て終わるまでの最長の見積もり秒数."""
+    dependents: dict[str, list[str]] = {task_id: [] for task_id in tasks}
+    for task in tasks.values():
+        for dep in task.deps:
+            dependents[dep].append(task.id)
+    levels: dict[str, float] = {}
+    for task_id in reversed(_topological(tasks)):
+        tail = max((levels[after] for after in dependents[task_id]), default=0.0)
+        levels[task_id] = estimates.get(task_id, 0.0) + tail
+    return levels
+
+
+def plan(
+    tasks: dict[str, Task],
+    estimates: dict[str, float],
+    jobs: int,
+    *,
+    memory: dict[str, int] | None = None,
+    max_memory: int | None = None,
+) -> Plan:
+    """run_graph と同じ優先順・投入制御で jobs 並列に実行したときの所要時間を見積もる."""
+    tasks = _topological(tasks)
+    levels = priorities(tasks, estimates)
+    memory = memory or {}
+    finish: dict[str, float] = {}
+    schedule: dict[str, tuple[float, float]] = {}
+    running: dict[str, float] = {}
+    waiting = dict(tasks)
+    now = 0.0
+    peak_memory = 0
+    while waiting or running:
+        ready = _by_priority(
+            (t for t in waiting.values() if all(dep in finish for dep in t.deps)), levels
+        )
+        for task in _admit(ready, list(running), jobs, memory, max_memory):
+            del waiting[task.id]
+            running[task.id] = now + estimates.get(task.id, 0.0)
+            schedule[task.id] = (now, running[task.id])
+        peak_memory = max(peak_memory, sum(memory.get(task_id, 0) for task_id in running))
+        now = min(running.values())
+        for task_id in [task_id for task_id, end in running.items() if end <= now]:
+            finish[task_id] = running.pop(task_id)
+
+    critical_path: list[Task] = []
+    candidates = [t for t in tasks.values() if not t.deps]
+    while candidates:
+        task = max(candidates, key=lambda t: levels[t.id])
+        critical_path.append(task)
+        candidates = [t for t in tasks.values() if task.id in t.deps]
+    return Plan(
+        wall_seconds=max(finish.values(), default=0.0),
+        total_seconds=sum(estimates.get(task_id, 0.0) for task_id in tasks),
+        critical_path=critical_path,
+        schedule=schedule,
+        peak_memory=peak_memory,
+    )
+
+
+def _by_priority(tasks: Iterable[Task], levels: dict[str, float]) -> list[Task]:
+    # 同じ優先度なら宣言順 (sortedは安定).
+    return sorted(tasks, key=lambda task: -levels.get(task.id, 0.0))
+
+
+def _admit(
+    ready: list[Task],
+    running: list[str],
+    slots: int,
+    memory: dict[str, int],
+    max_memory: int | None,
+) -> list[Task]:
+    """優先度順の ready から、空きworkerと memory budget に収まる分を先頭から選ぶ.
+
+    budget に収まらないtaskがあればそこで止め、後ろの軽いtaskに追い越させない
+    (重いtaskが空きを待ち続けないようにする). 何も実行中でなければ、
+    budget を超えるtaskも1つだけ単独で実行する.
+    """
+    used = sum(memory.get(task_id, 0) for task_id in running)
+    count = len(running)
+    admitted: list[Task] = []
+    for task in ready:
+        if count >= slots:
+            break
+        need = memory.get(task.id, 0)
+        if max_memory is not None and count and used + need > max_memory:
+            break
+        admitted.append(task)
+        used += need
+        count += 1
+    return admitted
+
+
+def _timed_call(
+    fn: Callable[..., Any], args: tuple[Any, ...], label: str = "", trace: bool = False
+) -> tuple[Any, TaskMetrics]:
+    """workerで fn(*args) を実行し、結果と所要秒数・ピークRSSを返す.
+
+    trace なら、task全体を label のspanにして、task内のtrace eventも返す.
+    """
+    memory_usage.reset_peak_rss()
+    if trace:
+        tracing.start()
+    try:
+        start = time.perf_counter()
+        with tracing.span(label, cat="task"):
+            result = fn(*args)
+        seconds = time.perf_counter() - start
+    finally:
+        events = tracing.stop() if trace else []
+    return result, TaskMetrics(seconds, memory_usage.peak_rss(), events)
+
+
+OnDone = Callable[[Task, Any, TaskMetrics], None]
+
+
+def run_graph(
+    tasks: dict[str, Task],
+    jobs: int,
+    *,
+    executor: Executor | None = None,
+    on_done: OnDone | None = None,
+    estimates: dict[str, float] | None = None,
+    memory: dict[str, int] | None = None,
+    max_memory: int | None = None,
+    trace: bool = False,
+) -> dict[str, Any]:
+    """依存が揃ったtaskから順に実行し、task idごとの結果を返す.
+
+    executor があればそれ (daemonの常駐worker) を使う. 無ければ jobs 個のprocessを起こし、
+    jobs == 1 なら現在のprocessで依存順に実行する. 同時に投入するのは jobs 個までで、
+    estimates (task idごとの見積もり秒数) があれば残りの最長経路が長いtaskから投入する.
+    max_memory (byte) があれば、memory (task idごとの見積もりピークRSS) の
+    実行中の合計がそれに収まる間だけ投入する.
+    trace なら、各taskのtrace eventを実測値に入れて on_done に渡す.
+    on_done には task, 結果, 実測値を渡す. どれかのtaskが失敗したら、
+    未着手のtaskを取り消してその例外を投げる.
+    """
+    tasks = _topological(tasks)
+    levels = priorities(tasks, estimates or {})
+    results: dict[str, Any] = {}
+    if executor is None and (jobs == 1 or len(tasks) <= 1):
+        for task in tasks.values():
+            results[task.id], metrics = _timed_call(task.fn, task.args, task.label, trace)
+            if on_done is not None:
+                on_done(task, results[task.id], metrics)
+        return results
+    with contextlib.ExitStack() as stack:
+        if executor is None:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=min(jobs, len(tasks))))
+        _run_on(
+            executor,
+            tasks,
+            levels,
+            results,
+            on_done,
+            slots=jobs,
+            memory=memory or {},
+            max_memory=max_memory,
+            trace=trace,
+        )
+    return results
+
+
+def _run_on(
+    executor: Executor,
+    tasks: dict[str, Task],
+    levels: dict[str, float],
+    results: dict[str, Any],
+    on_done: OnDone | None,
+    *,
+    slots: int,
+    memory: dict[str, int],
+    max_memory: int | None,
+    trace: bool,
+) -> None:
+    # 空いているworkerとmemory budgetに収まるだけ投入し、残りは優先度順に次の空きを待つ.
+    waiting = dict(tasks)
+    running: dict[Future[tuple[Any, TaskMetrics]], Task] = {}
+    while waiting or running:
+        ready = _by_priority(
+            (t for t in waiting.values() if all(dep in results for dep in t.deps)), levels
+        )
+        running_ids = [task.id for task in running.values()]
+        for task in _admit(ready, running_ids, slots, memory, max_memory):
+            del waiting[task.id]
+            future = executor.submit(_timed_call, task.fn, task.args, task.label, trace)
+            running[future] = task
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            task = running.pop(future)
+            try:
+                results[task.id], metrics = future.result()
+            except BaseException:
+                for pending in running:
+                    pending.cancel()
+                raise
+            if on_done is not None:
+                on_done(task, results[task.id], metrics)
@@ -0,0 +1,142 @@
+"""build中の一時ファイル置き場 (scratch) の選択と、stageごとのI/O量・所要時間の集計."""
+
+from __future__ import annotations
+
+import shutil
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# tmpfsの候補. Linux / Docker では /dev/shm がRAM上にある.
+TMPFS_CANDIDATES: tuple[Path, ...] = (Path("/dev/shm"),)
+
+# build 1件がscratchに置く一時ファイル (prepare未cache時のEN/JP中間TTF、patch前後のttf、otf)
+# の合計が収まる空き容量. Dockerの /dev/shm はデフォルト64MBしかないため、これで弾く.
+MIN_SCRATCH_FREE_BYTES = 512 * 1024**2
+# これを下回る空きメモリでは、tmpfsへの書き込みがswapやOOMを招くためdiskに戻す.
+MIN_AVAILABLE_MEMORY_BYTES = 2 * 1024**3
+
+MEMINFO_PATH = Path("/proc/meminfo")
+MOUNTS_PATH = Path("/proc/mounts")
+
+
+def available_memory(meminfo: Path = MEMINFO_PATH) -> int | None:
+    """/proc/meminfo の MemAvailable をbyteで返す. 読めなければNone."""
+    try:
+        lines = meminfo.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+    for line in lines:
+        if line.startswith("MemAvailable:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def is_tmpfs(path: Path, mounts: Path = MOUNTS_PATH) -> bool:
+    """path がtmpfsにマウントされているか判定する."""
+    try:
+        lines = mounts.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return False
+    resolved = str(path.resolve())
+    best = ""
+    best_type = ""
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        mount_point, fs_type = fields[1], fields[2]
+        inside = resolved == mount_point or resolved.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) > len(best):
+            best, best_type = mount_point, fs_type
+    return best_type == "tmpfs"
+
+
+def _has_room(path: Path) -> bool:
+    try:
+        return shutil.disk_usage(path).free >= MIN_SCRATCH_FREE_BYTES
+    except OSError:
+        return False
+
+
+def resolve_scratch_dir(value: str | None) -> Path | None:
+    """--scratch-dir の指定値をディレクトリに解決する.
+
+    "auto" なら十分な空きのあるtmpfsを探し、無ければNone (= OS標準の一時ディレクトリ).
+    それ以外はそのままpathとして扱う.
+    """
+    if value is None:
+        return None
+    if value != "auto":
+        return Path(value)
+    for candidate in TMPFS_CANDIDATES:
+        if candidate.is_dir() and is_tmpfs(candidate) and _has_room(candidate):
+            return candidate
+    return None
+
+
+def scratch_root(scratch_dir: Path | None) -> Path | None:
+    """build開始時点で使うscratchを返す.
+
+    tmpfs上のscratchはRAMを消費するため、空きメモリや空き容量が足りなければ
+    None (= disk上のOS標準の一時ディレクトリ) にfallbackする.
+    """
+    if scratch_dir is None:
+        return None
+    if is_tmpfs(scratch_dir):
+        memory = available_memory()
+        if memory is not None and memory < MIN_AVAILABLE_MEMORY_BYTES:
+            return None
+        if not _has_room(scratch_dir):
+            return None
+    return scratch_dir
+
+
+@dataclass
+class StageIO:
+    """1 stage分の書き込み・読み込みbyte数と所要秒数."""
+
+    written: int = 0
+    read: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class IOStats:
+    """build 1件のstageごとのファイルI/O量と所要時間.
+
+    フォント全体をserializeして書き出した/parseした量を、ファイルサイズで数える.
+    """
+
+    stages: dict[str, StageIO] = field(default_factory=dict)
+
+    def _stage(self, stage: str) -> StageIO:
+        return self.stages.setdefault(stage, StageIO())
+
+    def record_write(self, stage: str, path: Path) -> None:
+        """stage で path を書き出したことを記録する."""
+        self._stage(stage).written += path.stat().st_size
+
+    def record_read(self, stage: str, path: Path) -> None:
+        """stage で path を読み込んだことを記録する."""
+        self._stage(stage).read += path.stat().st_size
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """with の中の所要時間を stage の秒数に加える."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stage(stage).seconds += time.perf_counter() - start
+
+    @property
+    def total(self) -> StageIO:
+        """全stageの合計."""
+        return StageIO(
+            written=sum(stage.written for stage in self.stages.values()),
+            read=sum(stage.read for stage in self.stages.values()),
+            seconds=sum(stage.seconds for stage in self.stages.values()),
+        )
@@ -0,0 +1,54 @@
+"""1つのフォントの glyph を codepoint 順の shard に分け、別processのFontForgeで並列に処理する.
+
+task graph の並列度 (--jobs) は出力単位なので、1config・1styleだけの生成や最後に残ったbuildでは
+coreが余る. glyph単位で独立な処理 (重なり除去・ヒンティングなど) を shard ごとに別processで行い、
+結果を元のフォントに戻す.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+# これより glyph の少ない shard は作らない. process起動とフォントの読み込みの方が重くなる.
+MIN_SHARD_GLYPHS = 500
+# codepointを持たないglyph (異体字・縦書き形など) を最後の shard へ並べるための値.
+_UNENCODED = 0x110000
+
+
+class ShardMismatchError(RuntimeError):
+    """shard ごとの処理結果が1process での処理結果と一致しない."""
+
+
+def shard_count(glyphs: int, requested: int) -> int:
+    """glyphs 個を requested 個以下の、MIN_SHARD_GLYPHS 以上ずつの shard に分けるときの数."""
+    return max(1, min(requested, glyphs // MIN_SHARD_GLYPHS))
+
+
+def split_by_codepoint(glyphs: Sequence[tuple[int, str]], count: int) -> list[list[str]]:
+    """(codepoint, glyph名) を codepoint 順に並べ、glyph数が均等な count 個の shard に分ける.
+
+    codepointが -1 のglyphは最後に並べる. 空の shard は作らない.
+    """
+    ordered = sorted(
+        range(len(glyphs)),
+        key=lambda index: (glyphs[index][0] if glyphs[index][0] >= 0 else _UNENCODED, index),
+    )
+    names = [glyphs[index][1] for index in ordered]
+    count = max(1, min(count, len(names)))
+    size, extra = divmod(len(names), count)
+    shards: list[list[str]] = []
+    start = 0
+    for shard in range(count):
+        end = start + size + (1 if shard < extra else 0)
+        shards.append(names[start:end])
+        start = end
+    return [shard for shard in shards if shard]
+
+
+def run_shards(fn: Callable[..., Any], shards: Sequence[Any], *args: Any) -> list[Any]:
+    """fn(*args, shard) を shard ごとに別processで実行し、shard の順に結果を返す."""
+    with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+        futures = [executor.submit(fn, *args, shard) for shard in shards]
+        return [future.result() for future in futures]
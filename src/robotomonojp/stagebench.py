@@ -0,0 +1,364 @@
+"""generator / fontforge_helpers の stage ごとの micro-benchmark.
+
+合成フォント (synthetic) のglyph数を変えて各stageの所要時間を測り、
+glyphs/sec と、glyph数に対する所要時間の増え方 (log-log の傾き) を出す.
+傾きが max_exponent を超えたstageは、hot loopが線形でなくなった疑いとして flag する.
+FontForgeが無い環境では、fontToolsだけで動くstageだけを測る.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import tempfile
+import time
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from . import params, properties, synthetic
+from .cache import file_sha256, hash_key
+from .fontforge_helpers import (
+    fix_all_glyph_points,
+    fontforge,
+    make_italic,
+    remove_glyphs_with_features,
+)
+from .generator import (
+    _apply_jp_stroke_width,
+    _copy_unicode_mappings,
+    _hint,
+    _load_en_font,
+    _load_jp_font,
+    _new_font,
+)
+from .italic import derive_italic
+from .nerd_overlay import overlay_nerd_glyphs
+from .synthetic import Complexity, Distribution, SyntheticSpec, make_font
+
+DEFAULT_GLYPH_COUNTS = (1_000, 4_000, 16_000)
+# glyph数を4倍にして所要時間が 4**1.25 ≒ 5.7倍を超えたら flag する.
+DEFAULT_MAX_EXPONENT = 1.25
+# ENフォントのglyph数. RobotoMono (約1300 glyph) 相当で固定し、JP側だけを変える.
+EN_GLYPHS = 1_500
+NERD_GLYPHS = 1_000
+ITALIC_ANGLE = -11
+# _load_jp_font などに渡す縦metrics・幅. config/plex.yaml と同じ値.
+METRICS = {
+    "ascent": 1638,
+    "descent": 410,
+    "em": 2048,
+    "en_width": 1299,
+    "jp_width": 1849,
+    "jp_scale_offset": 0.02,
+}
+STROKE_WIDTH = 20
+
+
+@dataclass(frozen=True)
+class BenchFonts:
+    """1つのglyph数で使う合成フォント一式."""
+
+    en: Path
+    jp: Path
+    nerd: Path
+    work_dir: Path
+
+
+class Timer:
+    """stageの計測区間. 準備処理は区間の外に置く."""
+
+    def __init__(self) -> None:
+        """計測前の状態にする."""
+        self.seconds = 0.0
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        """with の中の所要時間を加える."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+@dataclass(frozen=True)
+class Stage:
+    """benchmark対象のstage. run は準備をしてから timer.measure() の中で対象を呼ぶ."""
+
+    name: str
+    run: Callable[[BenchFonts, Timer], None]
+    needs_fontforge: bool = True
+
+
+@dataclass(frozen=True)
+class StageResult:
+    """1 stage × 1 glyph数 の計測結果 (repeat回の最小値)."""
+
+    stage: str
+    glyphs: int
+    seconds: float
+
+    @property
+    def glyphs_per_second(self) -> float:
+        """glyph数 / 所要秒数."""
+        return self.glyphs / self.seconds if self.seconds > 0 else math.inf
+
+
+@dataclass(frozen=True)
+class Scaling:
+    """1 stage の glyph数に対する所要時間の増え方."""
+
+    stage: str
+    exponent: float
+    superlinear: bool
+
+
+def _load_jp(fonts: BenchFonts) -> Any:
+    return _load_jp_font(fonts.jp, **METRICS)
+
+
+def _new_base() -> Any:
+    return _new_font(
+        familyname="SyntheticBench",
+        style="Regular",
+        italic_angle=ITALIC_ANGLE,
+        version="0.0.0",
+        copyright_text=properties.DEFAULT_COPYRIGHT,
+        vendor=properties.DEFAULT_VENDOR,
+        ascent=METRICS["ascent"],
+        descent=METRICS["descent"],
+        em=METRICS["em"],
+        underline_pos=-200,
+        underline_height=100,
+        os2_ascent=2146,
+        os2_descent=555,
+    )
+
+
+def _merged(fonts: BenchFonts) -> tuple[Any, Any]:
+    """ENとJPを新規フォントにmergeしたフォントと、開いたままのJPフォントを返す."""
+    base = _new_base()
+    en = _load_en_font(fonts.en)
+    base.mergeFonts(en)
+    en.close()
+    jp = _load_jp(fonts)
+    base.mergeFonts(jp)
+    return base, jp
+
+
+def _bench_load_jp_font(fonts: BenchFonts, timer: Timer) -> None:
+    with timer.measure():
+        font = _load_jp(fonts)
+    font.close()
+
+
+def _bench_stroke(fonts: BenchFonts, timer: Timer) -> None:
+    font = _load_jp(fonts)
+    with timer.measure():
+        _apply_jp_stroke_width(font, STROKE_WIDTH)
+    font.close()
+
+
+def _bench_merge_fonts(fonts: BenchFonts, timer: Timer) -> None:
+    # JPの mergeFonts だけを測る. ENのmergeはJPのglyph数で変わらない.
+    base = _new_base()
+    en = _load_en_font(fonts.en)
+    base.mergeFonts(en)
+    jp = _load_jp(fonts)
+    with timer.measure():
+        base.mergeFonts(jp)
+    for font in (base, en, jp):
+        font.close()
+
+
+def _bench_copy_unicode_mappings(fonts: BenchFonts, timer: Timer) -> None:
+    base, jp = _merged(fonts)
+    with timer.measure():
+        _copy_unicode_mappings(base, jp)
+    base.close()
+    jp.close()
+
+
+def _bench_hinting(fonts: BenchFonts, timer: Timer) -> None:
+    font = _load_jp(fonts)
+    with timer.measure():
+        _hint(font)
+    font.close()
+
+
+def _bench_make_italic(fonts: BenchFonts, timer: Timer) -> None:
+    font = _load_jp(fonts)
+    with timer.measure():
+        make_italic(font, ITALIC_ANGLE)
+    font.close()
+
+
+def _bench_fix_all_glyph_points(fonts: BenchFonts, timer: Timer) -> None:
+    font = _load_jp(fonts)
+    with timer.measure():
+        fix_all_glyph_points(font, do_round=True, add_extrema=True)
+    font.close()
+
+
+def _bench_remove_glyphs_with_features(fonts: BenchFonts, timer: Timer) -> None:
+    base, jp = _merged(fonts)
+    jp.close()
+    with timer.measure():
+        remove_glyphs_with_features(base, params.LIGATURE_FEATURES)
+    base.close()
+
+
+def _bench_generate(flags: tuple[str, ...], suffix: str) -> Callable[[BenchFonts, Timer], None]:
+    def run(fonts: BenchFonts, timer: Timer) -> None:
+        font = _load_jp(fonts)
+        with timer.measure():
+            font.generate(str(fonts.work_dir / f"generate{suffix}"), flags=flags)
+        font.close()
+
+    return run
+
+
+def _bench_derive_italic(fonts: BenchFonts, timer: Timer) -> None:
+    with timer.measure():
+        derive_italic(
+            fonts.jp,
+            fonts.work_dir / "italic.ttf",
+            familyname="Synthetic",
+            style="Italic",
+            italic_angle=ITALIC_ANGLE,
+        )
+
+
+def _bench_overlay_nerd_glyphs(fonts: BenchFonts, timer: Timer) -> None:
+    with timer.measure():
+        overlay_nerd_glyphs(fonts.jp, fonts.nerd, fonts.work_dir / "overlay.ttf")
+
+
+STAGES: tuple[Stage, ...] = (
+    Stage("_load_jp_font", _bench_load_jp_font),
+    Stage("stroke", _bench_stroke),
+    Stage("mergeFonts", _bench_merge_fonts),
+    Stage("_copy_unicode_mappings", _bench_copy_unicode_mappings),
+    Stage("hinting", _bench_hinting),
+    Stage("make_italic", _bench_make_italic),
+    Stage("fix_all_glyph_points", _bench_fix_all_glyph_points),
+    Stage("remove_glyphs_with_features", _bench_remove_glyphs_with_features),
+    Stage("generate-ttf", _bench_generate((), ".ttf")),
+    Stage("generate-otf", _bench_generate(("opentype",), ".otf")),
+    Stage("derive_italic", _bench_derive_italic, needs_fontforge=False),
+    Stage("overlay_nerd_glyphs", _bench_overlay_nerd_glyphs, needs_fontforge=False),
+)
+
+
+def available_stages() -> list[Stage]:
+    """この環境で測れるstage. FontForgeが無ければfontToolsのstageだけ."""
+    return [stage for stage in STAGES if fontforge is not None or not stage.needs_fontforge]
+
+
+def _synthetic(spec: SyntheticSpec, font_dir: Path, **kwargs: Any) -> Path:
+    """spec の合成フォントを font_dir に作る. 同じ指定のフォントは作り直さない."""
+    key = hash_key(asdict(spec), kwargs, file_sha256(Path(synthetic.__file__)))
+    path = font_dir / f"{key[:16]}.ttf"
+    if not path.exists():
+        tmp = path.with_suffix(".tmp.ttf")
+        make_font(spec, tmp, **kwargs)
+        tmp.replace(path)
+    return path
+
+
+def bench_fonts(
+    glyphs: int,
+    distribution: Distribution,
+    complexity: Complexity,
+    font_dir: Path,
+    work_dir: Path,
+) -> BenchFonts:
+    """glyphs 個のJPフォントと、固定サイズのEN・Nerdフォントを用意する."""
+    return BenchFonts(
+        en=_synthetic(
+            SyntheticSpec(EN_GLYPHS, "latin", complexity, em=2048, ascent=1638, descent=410),
+            font_dir,
+            family="SyntheticEN",
+            ligatures=True,
+        ),
+        jp=_synthetic(SyntheticSpec(glyphs, distribution, complexity), font_dir),
+        nerd=_synthetic(SyntheticSpec(NERD_GLYPHS, "mixed", "simple"), font_dir),
+        work_dir=work_dir,
+    )
+
+
+def run_stage(stage: Stage, fonts: BenchFonts, repeat: int = 1) -> float:
+    """stage を repeat 回測り、最小の所要秒数を返す."""
+    best = math.inf
+    for _ in range(repeat):
+        timer = Timer()
+        stage.run(fonts, timer)
+        best = min(best, timer.seconds)
+    return best
+
+
+def scaling_exponent(points: Sequence[tuple[int, float]]) -> float:
+    """(glyph数, 秒) の log-log 最小二乗の傾き. 1なら線形、2なら2乗で増える."""
+    usable = [(math.log(n), math.log(t)) for n, t in points if n > 0 and t > 0]
+    if len(usable) < 2:
+        return math.nan
+    mean_x = sum(x for x, _ in usable) / len(usable)
+    mean_y = sum(y for _, y in usable) / len(usable)
+    var = sum((x - mean_x) ** 2 for x, _ in usable)
+    if var == 0:
+        return math.nan
+    return sum((x - mean_x) * (y - mean_y) for x, y in usable) / var
+
+
+def analyze(results: Sequence[StageResult], max_exponent: float) -> list[Scaling]:
+    """stageごとにscalingの傾きを求め、max_exponent を超えたものを superlinear とする."""
+    by_stage: dict[str, list[tuple[int, float]]] = {}
+    for result in results:
+        by_stage.setdefault(result.stage, []).append((result.glyphs, result.seconds))
+    scalings = []
+    for stage, points in by_stage.items():
+        exponent = scaling_exponent(points)
+        scalings.append(Scaling(stage, exponent, exponent > max_exponent))
+    return scalings
+
+
+def run(
+    stages: Sequence[Stage],
+    glyph_counts: Sequence[int],
+    *,
+    distribution: Distribution = "cjk",
+    complexity: Complexity = "medium",
+    repeat: int = 1,
+    font_dir: Path,
+    echo: Callable[[str], None] = print,
+) -> list[StageResult]:
+    """stages を glyph_counts の各glyph数の合成フォントで測る."""
+    results: list[StageResult] = []
+    for glyphs in sorted(glyph_counts):
+        with tempfile.TemporaryDirectory(prefix="robotomonojp-bench-") as tmpdir:
+            fonts = bench_fonts(glyphs, distribution, complexity, font_dir, Path(tmpdir))
+            for stage in stages:
+                seconds = run_stage(stage, fonts, repeat)
+                result = StageResult(stage.name, glyphs, seconds)
+                results.append(result)
+                echo(
+                    f"[bench] {stage.name:<28} {glyphs:>6} glyphs {seconds:>9.3f}s"
+                    f" {result.glyphs_per_second:>11.0f} glyphs/s"
+                )
+    return results
+
+
+def write_report(path: Path, results: Sequence[StageResult], scalings: Sequence[Scaling]) -> None:
+    """計測結果とscalingをJSONで書き出す."""
+    data = {
+        "results": [
+            {**asdict(result), "glyphs_per_second": round(result.glyphs_per_second, 1)}
+            for result in results
+        ],
+        "scaling": [asdict(scaling) for scaling in scalings],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2) + "\n")
@@ -0,0 +1,180 @@
+"""benchmark用の合成フォントを fontTools で作る.
+
+実際のCJKフォントを使わずに、glyph数・codepointの分布・outlineの複雑さを変えた
+EN/JPフォントを作り、generator の各stageのglyph数に対するscalingを測れるようにする.
+outlineはglyphごとに少しずつ形を変え、重なり除去やヒンティングが実際に働くよう
+contour同士を一部重ねる.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+Distribution = Literal["latin", "cjk", "mixed"]
+Complexity = Literal["simple", "medium", "complex"]
+
+# 分布ごとに、先頭から順にcodepointを割り当てるレンジ.
+DISTRIBUTIONS: dict[str, list[tuple[int, int]]] = {
+    "latin": [
+        (0x0020, 0x007E),
+        (0x00A0, 0x024F),
+        (0x0370, 0x03FF),
+        (0x0400, 0x04FF),
+        (0x1E00, 0x1EFF),
+        (0x2000, 0x206F),
+        (0x2190, 0x22FF),
+        (0x2500, 0x259F),
+        (0xF0000, 0xFFFFD),
+    ],
+    "cjk": [
+        (0x0020, 0x007E),
+        (0x3000, 0x30FF),
+        (0xFF01, 0xFF9F),
+        (0x4E00, 0x9FFF),
+        (0x3400, 0x4DBF),
+        (0x20000, 0x2A6DF),
+    ],
+    # 曖昧幅記号・Nerd FontsのPUAを含む. _normalize_symbol_width やNerd Fontsのレンジ判定の
+    # 分岐を通すための分布.
+    "mixed": [
+        (0x0020, 0x007E),
+        (0x00A0, 0x00FF),
+        (0x2010, 0x27BF),
+        (0x3000, 0x30FF),
+        (0xE000, 0xF8FF),
+        (0xFF01, 0xFF9F),
+        (0x4E00, 0x9FFF),
+        (0x20000, 0x2A6DF),
+    ],
+}
+
+# (contour数, contourごとのon-curve点数, 曲線か).
+COMPLEXITIES: dict[str, tuple[int, int, bool]] = {
+    "simple": (1, 4, False),
+    "medium": (3, 8, True),
+    "complex": (6, 16, True),
+}
+
+# ENフォントに入れる、remove_glyphs_with_features が消すリガチャ.
+LIGATURES: dict[str, tuple[str, ...]] = {"f_i": ("f", "i"), "f_l": ("f", "l")}
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    """合成フォント1つ分の指定."""
+
+    glyphs: int
+    distribution: Distribution = "cjk"
+    complexity: Complexity = "medium"
+    em: int = 1000
+    ascent: int = 880
+    descent: int = 120
+    # 半角glyphの幅 (em比). 全角は em.
+    half_width: float = 0.5
+
+
+def codepoints(distribution: str, count: int) -> list[int]:
+    """distribution のレンジから先頭 count 個のcodepointを返す."""
+    result: list[int] = []
+    for start, end in DISTRIBUTIONS[distribution]:
+        take = min(end - start + 1, count - len(result))
+        result.extend(range(start, start + take))
+        if len(result) == count:
+            return result
+    raise ValueError(f"distribution {distribution!r} has fewer than {count} codepoints")
+
+
+def _is_half_width(code: int) -> bool:
+    return code < 0x1100 or 0xFF61 <= code <= 0xFF9F or code >= 0xF0000
+
+
+def _draw(pen: TTGlyphPen, index: int, width: int, spec: SyntheticSpec) -> None:
+    """index ごとに位置・大きさを変えた contour を描く. 隣り合うcontourは重なる."""
+    contours, points, curved = COMPLEXITIES[spec.complexity]
+    height = spec.ascent
+    radius = min(width, height) / (contours + 1)
+    for contour in range(contours):
+        cx = width * (contour + 1) / (contours + 1)
+        cy = height / 2 + (index % 7 - 3) * radius / 10
+        r = radius * (1.2 + (index + contour) % 5 / 10)
+        ring = [
+            (
+                round(cx + r * math.cos(2 * math.pi * k / points)),
+                round(cy + r * math.sin(2 * math.pi * k / points)),
+            )
+            for k in range(points)
+        ]
+        pen.moveTo(ring[0])
+        for k in range(1, points + 1):
+            on = ring[k % points]
+            if curved:
+                prev = ring[k - 1]
+                # on-curve点の中間をcontourの外側へ押し出したoff-curve点.
+                mid = ((prev[0] + on[0]) / 2 - cx, (prev[1] + on[1]) / 2 - cy)
+                off = (round(cx + mid[0] * 1.15), round(cy + mid[1] * 1.15))
+                pen.qCurveTo(off, on)
+            else:
+                pen.lineTo(on)
+        pen.closePath()
+
+
+def make_font(
+    spec: SyntheticSpec,
+    output: Path,
+    *,
+    family: str = "Synthetic",
+    style: str = "Regular",
+    ligatures: bool = False,
+) -> Path:
+    """spec の合成TTFを output に書き出す. ligatures ならliga featureも入れる."""
+    codes = codepoints(spec.distribution, spec.glyphs - 1)
+    names = [".notdef"] + [f"uni{code:04X}" if code <= 0xFFFF else f"u{code:X}" for code in codes]
+    cmap = dict(zip(codes, names[1:], strict=True))
+    half = round(spec.em * spec.half_width)
+    widths = {".notdef": half}
+    widths.update({name: half if _is_half_width(code) else spec.em for code, name in cmap.items()})
+
+    if ligatures:
+        # f / i / l はlatin分布の先頭 (ASCII) に必ず入る.
+        for ligature in LIGATURES:
+            names.append(ligature)
+            widths[ligature] = half
+
+    glyphs = {}
+    for index, name in enumerate(names):
+        pen = TTGlyphPen(None)
+        if name != ".notdef" and cmap.get(0x20) != name:
+            _draw(pen, index, widths[name], spec)
+        glyphs[name] = pen.glyph()
+
+    fb = FontBuilder(spec.em, isTTF=True)
+    fb.setupGlyphOrder(names)
+    fb.setupCharacterMap(cmap)
+    fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics(
+        {name: (widths[name], getattr(glyphs[name], "xMin", 0)) for name in names}
+    )
+    fb.setupHorizontalHeader(ascent=spec.ascent, descent=-spec.descent)
+    fb.setupNameTable({"familyName": family, "styleName": style, "psName": f"{family}-{style}"})
+    fb.setupOS2(
+        sTypoAscender=spec.ascent,
+        sTypoDescender=-spec.descent,
+        usWinAscent=spec.ascent,
+        usWinDescent=spec.descent,
+    )
+    fb.setupPost()
+    if ligatures:
+        rules = "\n".join(
+            f"    sub {' '.join(cmap[ord(c)] for c in parts)} by {ligature};"
+            for ligature, parts in LIGATURES.items()
+        )
+        fb.addOpenTypeFeatures(f"feature liga {{\n{rules}\n}} liga;\n")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    fb.save(str(output))
+    return output
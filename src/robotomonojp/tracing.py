@@ -0,0 +1,91 @@
+"""build中のstageを Chrome trace-event形式 (Perfetto / chrome://tracing) で記録する.
+
+process内のeventは start から stop までの間だけ集める. workerは task ごとに集めたeventを
+結果と一緒に返し、generate --trace が全workerのeventを1つのファイルにまとめる.
+時刻はprocess間で揃うよう、wall clock (UNIX時刻) のmicrosecondで記録する.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+_events: list[dict[str, Any]] | None = None
+
+
+def start() -> None:
+    """現在のprocessでeventの記録を始める."""
+    global _events
+    _events = []
+
+
+def stop() -> list[dict[str, Any]]:
+    """記録をやめ、start以降のeventを返す."""
+    global _events
+    events, _events = _events or [], None
+    return events
+
+
+def enabled() -> bool:
+    """記録中か."""
+    return _events is not None
+
+
+@contextmanager
+def span(name: str, cat: str = "stage", **args: Any) -> Iterator[dict[str, Any]]:
+    """with の中を1つのcomplete event (ph "X") として記録する.
+
+    yieldするdictに値を入れると、eventの args に加わる (glyph数など).
+    記録中でなければ何も記録しない.
+    """
+    if _events is None:
+        yield args
+        return
+    begin = time.time_ns()
+    try:
+        yield args
+    finally:
+        end = time.time_ns()
+        # with の途中で stop されていたら捨てる.
+        if _events is not None:
+            _events.append(
+                {
+                    "name": name,
+                    "cat": cat,
+                    "ph": "X",
+                    "ts": begin / 1000,
+                    "dur": (end - begin) / 1000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_native_id(),
+                    "args": args,
+                }
+            )
+
+
+def write(path: Path, events: list[dict[str, Any]]) -> None:
+    """events を trace-event形式のJSONとして path に書き出す.
+
+    現在のprocessを "generate"、それ以外のpidを "worker <pid>" と名付ける.
+    """
+    pids = sorted({event["pid"] for event in events} | {os.getpid()})
+    names = [
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": pid,
+            "args": {"name": "generate" if pid == os.getpid() else f"worker {pid}"},
+        }
+        for pid in pids
+    ]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "traceEvents": names + sorted(events, key=lambda event: event["ts"]),
+        "displayTimeUnit": "ms",
+    }
+    path.write_text(json.dumps(data, ensure_ascii=False) + "\n")
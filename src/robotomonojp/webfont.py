@@ -0,0 +1,224 @@
+"""生成したフォントを unicode-range ごとのWOFF2 shard と @font-face CSS に分ける.
+
+CJKを含むTTFは数MBあり、ブラウザ (web terminal) で1ファイルのまま読むとページの表示が止まる.
+Latin・Nerd Font などの core、かな・全角記号、JIS第1水準漢字、第2水準漢字、その他の漢字に分けて
+WOFF2にし、unicode-range 付きの @font-face を並べたCSSを書き出す.
+ブラウザはページで使う文字を含む shard だけを取得する.
+
+WOFF2の圧縮には brotli (pip install brotli) が必要. Docker imageには同梱している.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import io
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import cast
+
+from fontTools import subset
+from fontTools.ttLib import TTFont
+
+from . import params
+
+# かな・全角記号の shard. CJK記号と句読点・ひらがな・カタカナ・カタカナ拡張・半角/全角形.
+KANA_RANGES: list[tuple[int, int]] = [
+    (0x3000, 0x30FF),
+    (0x31F0, 0x31FF),
+    (0xFF00, 0xFFEF),
+]
+# 漢字の shard. JIS第1・第2水準に入らないものは kanji3 にまとめる.
+KANJI_RANGES: list[tuple[int, int]] = [
+    (0x3400, 0x4DBF),  # CJK Unified Ideographs Extension A
+    (0x4E00, 0x9FFF),  # CJK Unified Ideographs
+    (0xF900, 0xFAFF),  # CJK Compatibility Ideographs
+    (0x20000, 0x3FFFF),  # SIP / TIP
+]
+# これより codepoint の多い shard は codepoint 順に分ける.
+MAX_SHARD_CODEPOINTS = 3500
+
+
+@dataclass(frozen=True)
+class Shard:
+    """1つのWOFF2ファイルに入れる codepoint の集まり."""
+
+    name: str
+    codepoints: tuple[int, ...]
+
+
+def jis_level(code: int) -> int | None:
+    """漢字 code のJIS X 0208の水準 (1 or 2). どちらにも入らなければNone."""
+    try:
+        encoded = chr(code).encode("euc_jp")
+    except UnicodeEncodeError:
+        return None
+    # EUC-JPの第1byteで区が分かる. 16〜47区が第1水準、48〜84区が第2水準.
+    if len(encoded) != 2:
+        return None
+    if 0xB0 <= encoded[0] <= 0xCF:
+        return 1
+    if 0xD0 <= encoded[0] <= 0xF4:
+        return 2
+    return None
+
+
+def bucket_of(code: int) -> str:
+    """code を入れる shard の名前 (core / kana / kanji1 / kanji2 / kanji3)."""
+    if params.in_ranges(code, KANA_RANGES):
+        return "kana"
+    if params.in_ranges(code, KANJI_RANGES):
+        level = jis_level(code)
+        return f"kanji{level}" if level is not None else "kanji3"
+    return "core"
+
+
+def plan_shards(codepoints: Sequence[int]) -> list[Shard]:
+    """codepoints を bucket ごとの shard に分ける. 大きい bucket は kanji3.1, kanji3.2... に分ける."""
+    buckets: dict[str, list[int]] = {
+        name: [] for name in ("core", "kana", "kanji1", "kanji2", "kanji3")
+    }
+    for code in sorted(set(codepoints)):
+        buckets[bucket_of(code)].append(code)
+
+    shards: list[Shard] = []
+    for name, codes in buckets.items():
+        chunks = [
+            tuple(codes[start : start + MAX_SHARD_CODEPOINTS])
+            for start in range(0, len(codes), MAX_SHARD_CODEPOINTS)
+        ]
+        if len(chunks) == 1:
+            shards.append(Shard(name, chunks[0]))
+        else:
+            shards.extend(Shard(f"{name}.{index}", chunk) for index, chunk in enumerate(chunks, 1))
+    return shards
+
+
+def unicode_range(codepoints: Sequence[int]) -> str:
+    """codepoints を連続区間にまとめた unicode-range の値 (U+41-5A, U+3042 ...)."""
+    ranges: list[str] = []
+    codes = sorted(set(codepoints))
+    start = 0
+    while start < len(codes):
+        end = start
+        while end + 1 < len(codes) and codes[end + 1] == codes[end] + 1:
+            end += 1
+        first, last = codes[start], codes[end]
+        ranges.append(f"U+{first:X}" if first == last else f"U+{first:X}-{last:X}")
+        start = end + 1
+    return ", ".join(ranges)
+
+
+def has_brotli() -> bool:
+    """fontTools がWOFF2の圧縮に使う brotli が入っているか."""
+    return any(importlib.util.find_spec(name) for name in ("brotli", "brotlicffi"))
+
+
+def _face_style(font: TTFont) -> tuple[str, int, bool]:
+    """(family名, weight, italicか) を返す."""
+    family = cast(str | None, font["name"].getBestFamilyName()) or "RobotoMonoJP"
+    weight = int(font["OS/2"].usWeightClass)
+    italic = bool(font["OS/2"].fsSelection & 1)
+    return family, weight, italic
+
+
+def subset_woff2(source: Path | bytes, codepoints: Sequence[int]) -> bytes:
+    """source (フォントのpathか、読み込み済みのbyte列) を codepoints だけに subset したWOFF2のbyte列.
+
+    同じフォントから何度も subset するときは byte列を渡す. ファイルは1回だけ読み、
+    各 subset は必要なtableだけをメモリ上から decompile する
+    (decompile済みの TTFont を deepcopy するより速い).
+    """
+    if not has_brotli():
+        raise RuntimeError("WOFF2の書き出しには brotli が必要です (pip install brotli).")
+
+    data = source.read_bytes() if isinstance(source, Path) else source
+    font = TTFont(io.BytesIO(data))
+    options = subset.Options()
+    options.name_IDs = ["*"]
+    options.name_languages = ["*"]
+    options.name_legacy = True
+    options.notdef_outline = True
+    options.layout_features = ["*"]
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    font.flavor = "woff2"
+    buffer = io.BytesIO()
+    font.save(buffer)
+    font.close()
+    return buffer.getvalue()
+
+
+def _write_shard(source: Path | bytes, codepoints: Sequence[int], output: Path) -> None:
+    """source を codepoints だけに subset したWOFF2を output に書き出す."""
+    output.write_bytes(subset_woff2(source, codepoints))
+
+
+def _font_face(family: str, weight: int, italic: bool, url: str, codepoints: Sequence[int]) -> str:
+    return f"""@font-face {{
+  font-family: "{family}";
+  font-style: {"italic" if italic else "normal"};
+  font-weight: {weight};
+  font-display: swap;
+  src: url("{url}") format("woff2");
+  unicode-range: {unicode_range(codepoints)};
+}}
+"""
+
+
+def write_webfont(font_path: Path, output_dir: Path) -> tuple[str, list[Path]]:
+    """font_path を shard ごとのWOFF2にして output_dir に書き出す.
+
+    (shard を参照する @font-face のCSS, 書き出したWOFF2のpath) を返す.
+    """
+    if not has_brotli():
+        raise RuntimeError("WOFF2の書き出しには brotli が必要です (pip install brotli).")
+
+    # フォントは1回だけ読み、各 shard はメモリ上のbyte列から subset する.
+    data = font_path.read_bytes()
+    font = TTFont(io.BytesIO(data), lazy=True)
+    try:
+        family, weight, italic = _face_style(font)
+        codepoints = list(font.getBestCmap())
+    finally:
+        font.close()
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    css: list[str] = []
+    paths: list[Path] = []
+    for shard in plan_shards(codepoints):
+        path = output_dir / f"{font_path.stem}.{shard.name}.woff2"
+        _write_shard(data, shard.codepoints, path)
+        css.append(_font_face(family, weight, italic, path.name, shard.codepoints))
+        paths.append(path)
+    return "".join(css), paths
+
+
+def write_css(fonts: Sequence[Path], output_dir: Path, name: str | None = None) -> Path:
+    """fonts を shard に分けて output_dir に書き出し、全fontの @font-face を並べたCSSを返す.
+
+    CSSのファイル名は name.css. 未指定なら最初のフォントのfamily名.
+    """
+    faces: list[str] = []
+    for font_path in fonts:
+        css, _ = write_webfont(font_path, output_dir)
+        faces.append(css)
+    if name is None:
+        font = TTFont(str(fonts[0]), lazy=True)
+        try:
+            name = _face_style(font)[0]
+        finally:
+            font.close()
+    css_path = output_dir / f"{name}.css"
+    css_path.write_text("\n".join(faces), encoding="utf-8")
+    return css_path
+
+
+def css_family(css_path: Path) -> str | None:
+    """write_css のCSSの最初の @font-face の family名."""
+    for line in css_path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line.startswith("font-family:"):
+            return line.removeprefix("font-family:").strip().rstrip(";").strip('"')
+    return None
@@ -0,0 +1,82 @@
+"""atlas module の単体テスト."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from robotomonojp import atlas
+
+FONT = Path("fonts/RobotoMono/RobotoMono-Regular.ttf")
+
+
+def test_group_by_block_names_known_blocks_and_pages() -> None:
+    blocks = atlas.group_by_block([0x3042, 0x41, 0x42, 0x30A2, 0x1234, 0xF0001])
+
+    assert blocks == [
+        atlas.Block("Basic Latin", (0x41, 0x42)),
+        atlas.Block("U+1200", (0x1234,)),
+        atlas.Block("Hiragana", (0x3042,)),
+        atlas.Block("Katakana", (0x30A2,)),
+        atlas.Block("Supplementary Private Use Area-A", (0xF0001,)),
+    ]
+
+
+def test_atlas_index_stores_runs() -> None:
+    index = atlas.atlas_index("Test", [atlas.Block("Basic Latin", (0x41, 0x42, 0x43, 0x61))])
+
+    assert index == {
+        "family": "Test",
+        "count": 4,
+        "blocks": [{"name": "Basic Latin", "count": 4, "runs": [[0x41, 3], [0x61, 1]]}],
+    }
+
+
+def test_chunks_pack_small_blocks_and_split_large_ones(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(atlas, "CHUNK_CODEPOINTS", 4)
+    blocks = [
+        atlas.Block("a", (1, 2)),
+        atlas.Block("b", (3,)),
+        atlas.Block("c", (10, 11)),
+        atlas.Block("d", tuple(range(20, 26))),
+    ]
+
+    assert atlas._chunks(blocks) == [(1, 2, 3), (10, 11), (20, 21, 22, 23), (24, 25)]
+
+
+def test_generate_atlas_writes_subsets_per_chunk(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    subsets: list[tuple[int, ...]] = []
+    sources: list[object] = []
+
+    def subset_woff2(source: bytes, codepoints: tuple[int, ...]) -> bytes:
+        sources.append(source)
+        subsets.append(codepoints)
+        return b"woff2"
+
+    monkeypatch.setattr(atlas, "subset_woff2", subset_woff2)
+    monkeypatch.setattr(atlas, "CHUNK_CODEPOINTS", 64)
+
+    out = atlas.generate_atlas(FONT, tmp_path / "atlas.html")
+    html = out.read_text(encoding="utf-8")
+
+    files = sorted((tmp_path / "atlas_files").iterdir())
+    assert len(files) == len(subsets)
+    assert all(0 < len(codes) <= 64 for codes in subsets)
+    # フォントは1回だけ読み、全 subset に同じbyte列を渡す.
+    assert all(source is sources[0] for source in sources)
+    assert sources[0] == FONT.read_bytes()
+    # Basic Latin (CR + U+20-7E) は2つの subset に分かれる.
+    assert subsets[0] == (0x0D, *range(0x20, 0x5F))
+    assert 'src: url("atlas_files/000.woff2") format("woff2");' in html
+    assert "unicode-range: U+D, U+20-5E;" in html
+    start = html.index('<script type="application/json" id="atlas-index">') + 49
+    index = json.loads(html[start : html.index("</script>", start)])
+    assert index["family"] == "Roboto Mono"
+    assert index["count"] == sum(len(codes) for codes in subsets)
+    assert index["blocks"][0]["name"] == "Basic Latin"
+    # 小さいblockは同じ subset に詰めるため、subset はblockより少ない.
+    assert len(subsets) < len(index["blocks"])
@@ -0,0 +1,131 @@
+"""buildbench module の計測結果の保存・比較のテスト. build は monkeypatch で置き換える."""
+
+from __future__ import annotations
+
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from robotomonojp import buildbench
+from robotomonojp.buildbench import BenchRun, Measurement
+from robotomonojp.config import Config
+from robotomonojp.generator import BuildRequest, output_paths
+
+
+def _request(tmp_path: Path, style: str, mono: bool = False) -> BuildRequest:
+    fonts = {
+        lang: {weight: str(tmp_path / f"{lang}-{weight}.ttf") for weight in ("regular", "bold")}
+        for lang in ("en", "jp")
+    }
+    cfg = Config.model_validate(
+        {
+            "jp_identifier": "Plex",
+            "fonts": fonts,
+            "ascent": 1638,
+            "descent": 410,
+            "em": 2048,
+            "en_width": 1299,
+            "jp_width": 1849,
+            "jp_scale_offset": 0.10,
+            "underline_pos": -200,
+            "underline_height": 100,
+            "os2_ascent": 2146,
+            "os2_descent": 555,
+        }
+    )
+    return BuildRequest(
+        config=cfg, style=style, version="1.0.0", output_dir=tmp_path / "dist", mono=mono
+    )
+
+
+def _measurement(style: str = "Regular", **kwargs: float) -> Measurement:
+    values = {"wall_seconds": 100.0, "cpu_seconds": 120.0, "peak_rss": 1000, "output_bytes": 500}
+    values.update(kwargs)
+    return Measurement("RobotoMonoPlex", style, "Default", **values)  # type: ignore[arg-type]
+
+
+def _run(run_id: str, *measurements: Measurement, label: str = "") -> BenchRun:
+    return BenchRun(run_id, "", label, "1.0.0", None, "", {}, measurements)
+
+
+def test_measure_build_records_output_size(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def fake_build(request: BuildRequest) -> Path:
+        for path in output_paths(request):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"x" * 10)
+        return output_paths(request)[0]
+
+    monkeypatch.setattr(buildbench, "build", fake_build)
+
+    result = buildbench.measure_build(_request(tmp_path, "Bold", mono=True))
+
+    assert result.key == "RobotoMonoPlex-Mono/Bold/Mono"
+    assert result.output_bytes == 20
+    assert result.wall_seconds >= 0
+    assert result.peak_rss > 0
+
+
+def test_run_builds_without_cache_into_temp_dir(tmp_path: Path) -> None:
+    seen: list[BuildRequest] = []
+
+    def fake_measure(request: BuildRequest) -> Measurement:
+        seen.append(request)
+        return _measurement(request.style)
+
+    requests = [
+        replace(_request(tmp_path, style), cache_dir=tmp_path / "cache", resume=True)
+        for style in ("Regular", "Bold")
+    ]
+    lines: list[str] = []
+
+    results = buildbench.run(requests, echo=lines.append, measure=fake_measure)
+
+    assert [r.style for r in results] == ["Regular", "Bold"]
+    assert all(r.cache_dir is None and not r.resume for r in seen)
+    assert all(r.output_dir != tmp_path / "dist" for r in seen)
+    assert lines[0].startswith("[bench] RobotoMonoPlex/Regular/Default: wall 100.0s")
+
+
+def test_save_and_find_runs(tmp_path: Path) -> None:
+    first = buildbench.new_run([_measurement()], label="v1.0.0")
+    buildbench.save_run(tmp_path, replace(first, id="20260101T000000Z"))
+    second = _run("20260102T000000Z", _measurement(wall_seconds=90.0))
+    buildbench.save_run(tmp_path, second)
+    (tmp_path / "broken.json").write_text("{")
+
+    assert buildbench.find_run(tmp_path, "latest") == second
+    assert buildbench.find_run(tmp_path, "previous").label == "v1.0.0"
+    assert buildbench.find_run(tmp_path, "v1.0.0").measurements == first.measurements
+    assert buildbench.find_run(tmp_path, "20260102T000000Z") == second
+    with pytest.raises(LookupError):
+        buildbench.find_run(tmp_path, "missing")
+
+
+def test_compare_flags_changes_over_threshold() -> None:
+    baseline = _run("a", _measurement(), _measurement("Bold"))
+    candidate = _run(
+        "b",
+        _measurement(wall_seconds=115.0, cpu_seconds=120.5, peak_rss=1050),
+        _measurement("Italic"),
+    )
+
+    comparisons = buildbench.compare(baseline, candidate, buildbench.DEFAULT_THRESHOLDS)
+
+    regressed = {c.metric for c in comparisons if c.regressed}
+    assert regressed == {"wall"}
+    assert {c.key for c in comparisons} == {"RobotoMonoPlex/Regular/Default"}
+    assert buildbench.unmatched(baseline, candidate) == (
+        ["RobotoMonoPlex/Bold/Default"],
+        ["RobotoMonoPlex/Italic/Default"],
+    )
+
+
+def test_compare_ignores_small_second_deltas() -> None:
+    baseline = _run("a", _measurement(wall_seconds=2.0))
+    candidate = _run("b", _measurement(wall_seconds=2.5))
+
+    comparisons = buildbench.compare(baseline, candidate, {"wall": 10.0})
+
+    assert comparisons[0].change == pytest.approx(25.0)
+    assert not comparisons[0].regressed
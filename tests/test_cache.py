@@ -0,0 +1,127 @@
+"""cache module の単体テスト."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+from robotomonojp.cache import (
+    OutputCache,
+    PreparedFontCache,
+    cache_stats,
+    file_sha256,
+    gc,
+    hash_key,
+    parse_size,
+)
+
+
+def test_file_sha256_follows_content(tmp_path: Path) -> None:
+    path = tmp_path / "a.ttf"
+    path.write_bytes(b"font-a")
+    first = file_sha256(path)
+    path.write_bytes(b"font-b!")
+    assert file_sha256(path) != first
+
+
+def test_hash_key_is_stable() -> None:
+    assert hash_key("jp", 1, 0.1, True) == hash_key("jp", 1, 0.1, True)
+    assert hash_key("jp", 1, 0.1, True) != hash_key("jp", 1, 0.1, False)
+
+
+def test_prepared_font_cache_creates_once(tmp_path: Path) -> None:
+    cache = PreparedFontCache(tmp_path)
+    calls: list[Path] = []
+
+    def create(output: Path) -> None:
+        calls.append(output)
+        output.write_bytes(b"prepared")
+
+    first = cache.get_or_create("jp", "abc", create)
+    second = cache.get_or_create("jp", "abc", create)
+
+    assert first == second == tmp_path / "prepared" / "jp-abc.ttf"
+    assert first.read_bytes() == b"prepared"
+    assert len(calls) == 1
+    assert calls[0].suffix == ".ttf"  # FontForgeが拡張子で形式を決めるため
+    assert list(first.parent.iterdir()) == [first]  # 一時ファイルは残さない
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("512", 512),
+        ("1K", 1024),
+        ("512M", 512 * 1024**2),
+        ("8G", 8 * 1024**3),
+        ("1.5GiB", 3 * 1024**3 // 2),
+    ],
+)
+def test_parse_size(value: str, expected: int) -> None:
+    assert parse_size(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "G", "8X", "-1G"])
+def test_parse_size_invalid(value: str) -> None:
+    with pytest.raises(ValueError):
+        parse_size(value)
+
+
+def _write_outputs(directory: Path, stem: str, size: int) -> list[Path]:
+    directory.mkdir(parents=True, exist_ok=True)
+    files = [directory / f"{stem}.ttf", directory / f"{stem}.otf"]
+    for path in files:
+        path.write_bytes(b"x" * size)
+    return files
+
+
+def test_output_cache_store_and_restore(tmp_path: Path) -> None:
+    cache = OutputCache(tmp_path / "cache")
+    files = _write_outputs(tmp_path / "build", "Font-Regular", 10)
+
+    assert cache.restore("key", tmp_path / "dist") is None
+    cache.store("key", files, label="Font-Regular")
+    restored = cache.restore("key", tmp_path / "dist")
+
+    assert restored is not None
+    assert sorted(path.name for path in restored) == ["Font-Regular.otf", "Font-Regular.ttf"]
+    assert all(path.parent == tmp_path / "dist" for path in restored)
+    assert (tmp_path / "dist" / "Font-Regular.ttf").read_bytes() == b"x" * 10
+
+
+def test_output_cache_ignores_incomplete_entry(tmp_path: Path) -> None:
+    cache = OutputCache(tmp_path / "cache")
+    files = _write_outputs(tmp_path / "build", "Font-Regular", 10)
+    cache.store("key", files, label="Font-Regular")
+    (cache.root / "key" / "Font-Regular.otf").unlink()
+
+    assert cache.lookup("key") is None
+
+
+def test_gc_evicts_least_recently_used(tmp_path: Path) -> None:
+    root = tmp_path / "cache"
+    cache = OutputCache(root)
+    for index, name in enumerate(("old", "used", "new")):
+        cache.store(name, _write_outputs(tmp_path / name, name, 100), label=name)
+        os.utime(cache.root / name / OutputCache.ENTRY_FILE, (index, index))
+    assert cache.lookup("used") is not None  # 参照すると最終利用時刻が更新される
+
+    removed = gc(root, max_bytes=450)
+
+    assert [entry.path.name for entry in removed] == ["old", "new"]
+    assert cache.lookup("used") is not None
+    assert cache_stats(root).outputs == 1
+
+
+def test_gc_collects_legacy_charclass_tables(tmp_path: Path) -> None:
+    table = tmp_path / "charclass" / "abc.bin"
+    table.parent.mkdir()
+    table.write_bytes(b"\x00" * 100)
+
+    assert cache_stats(tmp_path).total_bytes == 100
+    removed = gc(tmp_path, max_bytes=0)
+
+    assert [entry.kind for entry in removed] == ["charclass"]
+    assert not table.exists()
@@ -0,0 +1,48 @@
+"""charclass module の分類表のテスト."""
+
+from __future__ import annotations
+
+import unicodedata
+
+import pytest
+
+from robotomonojp import charclass, params
+
+
+def test_table_matches_params_and_unicodedata() -> None:
+    table = charclass.table()
+
+    assert len(table) == charclass.CODEPOINTS
+    hankaku = {code for code in range(charclass.CODEPOINTS) if table[code] & charclass.HANKAKU_KANA}
+    fullwidth = {code for code in range(charclass.CODEPOINTS) if table[code] & charclass.FULLWIDTH}
+    assert hankaku == set(params.HANKAKU_KANA_LIST)
+    assert fullwidth == set(params.FULLWIDTH_CODES_LIST)
+    for code in (0x00, 0x20, 0xA0, 0x41, 0x3000, 0x25CB, 0x2665, 0xE0A0, 0xF0001, 0x10FFFF):
+        assert bool(table[code] & charclass.AMBIGUOUS) == (
+            unicodedata.east_asian_width(chr(code)) == "A"
+        )
+        assert charclass.is_nerd(code) == params.in_ranges(code, params.NERD_FONT_RANGES)
+    # Latin-1範囲の制御・空白文字だけ. 全角スペースは含めない.
+    assert charclass.classify(0x09) & charclass.CONTROL_OR_SPACE
+    assert charclass.classify(0xA0) & charclass.CONTROL_OR_SPACE
+    assert not charclass.classify(0x3000) & charclass.CONTROL_OR_SPACE
+
+
+def test_classify_outside_codepoints() -> None:
+    assert charclass.classify(-1) == 0
+    assert charclass.classify(0x110000) == 0
+
+
+def test_table_is_built_once_per_process(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(charclass, "_table", None)
+    calls: list[int] = []
+    real_build = charclass.build_table
+
+    def build_table() -> bytes:
+        calls.append(1)
+        return real_build()
+
+    monkeypatch.setattr(charclass, "build_table", build_table)
+
+    assert charclass.table() is charclass.table()
+    assert calls == [1]
@@ -0,0 +1,63 @@
+"""checkpoint module の単体テスト."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from robotomonojp.checkpoint import STAGES, Checkpoints
+
+
+def _save(checkpoints: Checkpoints, stage: str, content: bytes = b"data") -> Path:
+    path = checkpoints.path(f"{stage}.bin")
+    path.write_bytes(content)
+    checkpoints.save(stage, [path])
+    return path
+
+
+def test_last_valid_stage(tmp_path: Path) -> None:
+    checkpoints = Checkpoints(tmp_path / "work", "key")
+    checkpoints.reset()
+    assert checkpoints.last_valid_stage() is None
+
+    _save(checkpoints, "merged")
+    _save(checkpoints, "hinted")
+
+    assert checkpoints.last_valid_stage() == "hinted"
+    assert checkpoints.last_valid_stage(STAGES[:1]) == "merged"
+
+
+def test_checkpoints_invalidated_by_input_hash(tmp_path: Path) -> None:
+    checkpoints = Checkpoints(tmp_path / "work", "key")
+    checkpoints.reset()
+    _save(checkpoints, "merged")
+
+    assert Checkpoints(tmp_path / "work", "other-key").last_valid_stage() is None
+
+
+def test_checkpoints_invalidated_by_corrupted_file(tmp_path: Path) -> None:
+    checkpoints = Checkpoints(tmp_path / "work", "key")
+    checkpoints.reset()
+    _save(checkpoints, "merged")
+    hinted = _save(checkpoints, "hinted")
+    hinted.write_bytes(b"truncated")
+
+    assert checkpoints.last_valid_stage() == "merged"
+
+
+def test_saving_earlier_stage_drops_later_stages(tmp_path: Path) -> None:
+    checkpoints = Checkpoints(tmp_path / "work", "key")
+    checkpoints.reset()
+    _save(checkpoints, "merged")
+    _save(checkpoints, "hinted")
+    _save(checkpoints, "merged", b"rebuilt")
+
+    assert not checkpoints.is_valid("hinted")
+    assert checkpoints.last_valid_stage() == "merged"
+
+
+def test_stage_keys_are_chained(tmp_path: Path) -> None:
+    first = Checkpoints(tmp_path, "key")
+    second = Checkpoints(tmp_path, "other-key")
+
+    assert len({first.stage_key(stage) for stage in STAGES}) == len(STAGES)
+    assert all(first.stage_key(stage) != second.stage_key(stage) for stage in STAGES)
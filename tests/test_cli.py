@@ -0,0 +1,79 @@
+"""cli module の引数パースと FontForge 非依存コマンドのテスト."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from robotomonojp.cli import app
+
+runner = CliRunner()
+
+
+def test_cache_stats_on_empty_dir(tmp_path: Path) -> None:
+    result = runner.invoke(app, ["cache", "stats", "--cache-dir", str(tmp_path)])
+
+    assert result.exit_code == 0
+    assert "outputs:  0" in result.output
+
+
+def test_cache_gc_rejects_invalid_size(tmp_path: Path) -> None:
+    result = runner.invoke(app, ["cache", "gc", "--cache-dir", str(tmp_path), "--max-size", "8X"])
+
+    assert result.exit_code != 0
+
+
+def test_bench_compare_exits_on_regression(tmp_path: Path) -> None:
+    from robotomonojp.buildbench import BenchRun, Measurement, save_run
+
+    def bench_run(run_id: str, wall: float) -> BenchRun:
+        measurement = Measurement("RobotoMonoPlex", "Regular", "Default", wall, 10.0, 1, 1)
+        return BenchRun(run_id, "", run_id, "1.0.0", None, "", {}, (measurement,))
+
+    save_run(tmp_path, bench_run("base", 100.0))
+    save_run(tmp_path, bench_run("next", 130.0))
+    args = ["bench", "compare", "base", "--results-dir", str(tmp_path)]
+
+    result = runner.invoke(app, args)
+    assert result.exit_code == 1
+    assert "wall: 100.0s -> 130.0s (+30.0%)  REGRESSION" in result.output
+
+    result = runner.invoke(app, [*args, "--threshold", "wall=50"])
+    assert result.exit_code == 0
+    assert "0 regression(s)" in result.output
+
+
+def test_bench_compare_rejects_unknown_metric(tmp_path: Path) -> None:
+    result = runner.invoke(
+        app, ["bench", "compare", "base", "--results-dir", str(tmp_path), "--threshold", "disk=5"]
+    )
+
+    assert result.exit_code != 0
+
+
+def test_generate_webfont_requires_brotli(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("robotomonojp.webfont.has_brotli", lambda: False)
+
+    result = runner.invoke(app, ["generate", "-c", "config/plex.yaml", "--webfont"])
+
+    assert result.exit_code == 1
+    assert "brotli" in result.output
+
+
+def test_inspect_rejects_invalid_codepoint(tmp_path: Path) -> None:
+    args = ["inspect", str(tmp_path), "--lacks", "nope", "--cache-dir", str(tmp_path / "cache")]
+
+    result = runner.invoke(app, args)
+
+    assert result.exit_code != 0
+
+
+def test_print_jobs_file_rejects_sample_argument(tmp_path: Path) -> None:
+    jobs_file = tmp_path / "samples.yaml"
+    jobs_file.write_text("fonts: [A.ttf]\nsamples:\n  kana: あ\n", encoding="utf-8")
+
+    result = runner.invoke(app, ["print", "--jobs-file", str(jobs_file), "-o", "out.pdf"])
+
+    assert result.exit_code != 0
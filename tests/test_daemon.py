@@ -0,0 +1,101 @@
+"""daemon module の単体テスト."""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+
+from robotomonojp import daemon
+from robotomonojp.generator import BuildRequest
+from tests.test_runner import _request
+
+
+def test_request_json_roundtrip(tmp_path: Path) -> None:
+    request = _request(tmp_path, "Bold", mono=True, cache_dir=tmp_path / "cache")
+
+    data = daemon.request_to_json(request)
+
+    assert data["output_dir"] == str(tmp_path)
+    assert data["scratch_dir"] is None
+    assert daemon.request_from_json(data) == request
+
+
+@pytest.fixture
+def server(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[daemon.DaemonServer]:
+    """別threadで待ち受けるdaemon. buildは fake に置き換える."""
+
+    def fake_run_builds(
+        requests: list[BuildRequest], *, echo: Callable[[str], None], **kwargs: object
+    ) -> list[Path]:
+        for request in requests:
+            echo(f"built {request.style}")
+        return [request.output_dir / f"{request.style}.ttf" for request in requests]
+
+    monkeypatch.setattr(daemon, "run_builds", fake_run_builds)
+    server = daemon.DaemonServer(tmp_path / "d.sock", jobs=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_submit_streams_logs(tmp_path: Path, server: daemon.DaemonServer) -> None:
+    lines: list[str] = []
+    requests = [_request(tmp_path, "Regular"), _request(tmp_path, "Bold")]
+
+    outputs = daemon.submit(
+        requests,
+        cache_dir=tmp_path,
+        no_cache=True,
+        max_bytes=0,
+        socket_path=server.socket_path,
+        echo=lines.append,
+    )
+
+    assert lines == ["built Regular", "built Bold"]
+    assert outputs == [tmp_path / "Regular.ttf", tmp_path / "Bold.ttf"]
+
+
+def test_generate_rejects_other_cwd(tmp_path: Path, server: daemon.DaemonServer) -> None:
+    """configの相対pathがずれるため、daemonと異なるcwdのclientは拒否する."""
+    message = {
+        "op": "generate",
+        "cwd": str(tmp_path),
+        "requests": [],
+        "cache_dir": str(tmp_path),
+        "no_cache": True,
+        "max_bytes": 0,
+    }
+    events = daemon._request(server.socket_path, message)
+
+    with pytest.raises(daemon.DaemonError, match="same directory"):
+        daemon._final_event(events, print)
+
+
+def test_ping_and_missing_daemon(tmp_path: Path, server: daemon.DaemonServer) -> None:
+    info = daemon.ping(server.socket_path)
+
+    assert info is not None
+    assert info["jobs"] == 1
+    assert daemon.ping(tmp_path / "missing.sock") is None
+    with pytest.raises(daemon.DaemonError, match="not running"):
+        daemon.submit(
+            [], cache_dir=tmp_path, no_cache=True, max_bytes=0, socket_path=tmp_path / "x.sock"
+        )
+
+
+def test_generate_rejects_changed_code(
+    server: daemon.DaemonServer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """起動後に生成コードが変わったら、古いコードの結果をcacheに入れないよう拒否する."""
+    monkeypatch.setattr(daemon, "code_fingerprint", lambda: "changed")
+
+    with pytest.raises(daemon.DaemonError, match="restart `serve`"):
+        daemon.submit(
+            [], cache_dir=Path.cwd(), no_cache=True, max_bytes=0, socket_path=server.socket_path
+        )
@@ -2,9 +2,18 @@
 
 from __future__ import annotations
 
+import re
 from pathlib import Path
 
-from robotomonojp.eyecatch import SAMPLE_LINES, generate_eyecatch
+import pytest
+
+from robotomonojp.eyecatch import (
+    SAMPLE_LINES,
+    _FontOutline,
+    eyecatch_jobs,
+    generate_eyecatch,
+    generate_eyecatches,
+)
 
 FONT = Path("fonts/RobotoMono/RobotoMono-Regular.ttf")
 
@@ -15,6 +24,7 @@ def test_generate_eyecatch(tmp_path: Path) -> None:
     assert svg.startswith("<svg")
     assert 'aria-label="Roboto Mono"' in svg  # family名がタイトルになる
     assert svg.count("<path") > 50  # glyphがpath化されている
+    assert svg.count("<use") > svg.count("<path")  # 同じglyphは <defs> の1つのpathを参照する
     assert 'fill="url(#title)"' in svg
 
 
@@ -25,3 +35,80 @@ def test_generate_eyecatch_custom_title(tmp_path: Path) -> None:
 
 def test_sample_lines_include_circled_numbers() -> None:
     assert ("① ② ③ ④ ⑤ ⑥ ⑦ ⑧ ⑨ ⑩", "text") in SAMPLE_LINES
+
+
+def test_repeated_glyphs_are_defined_once() -> None:
+    outline = _FontOutline(FONT)
+
+    uses = outline.text_paths("a a")
+
+    assert uses == '<use href="#g0" x="0"/><use href="#g0" x="2458"/>'
+    assert outline.defs().count("<path") == 1
+
+
+def _absolute_points(path: str) -> list[tuple[float, float]]:
+    """相対/絶対のM・L・H・V・Q・C・Zだけを含むpathの各コマンドの終点."""
+    points: list[tuple[float, float]] = []
+    x = y = start_x = start_y = 0.0
+    for command, args in re.findall(r"([MLHVQCZmlhvqcz])([^MLHVQCZmlhvqcz]*)", path):
+        numbers = [float(n) for n in args.split()]
+        relative = command.islower()
+        kind = command.upper()
+        if kind == "Z":
+            x, y = start_x, start_y
+            continue
+        if kind == "H":
+            x = x + numbers[0] if relative else numbers[0]
+        elif kind == "V":
+            y = y + numbers[0] if relative else numbers[0]
+        else:
+            x, y = (x + numbers[-2], y + numbers[-1]) if relative else (numbers[-2], numbers[-1])
+        if kind == "M":
+            start_x, start_y = x, y
+        points.append((x, y))
+    return points
+
+
+def test_relative_paths_match_absolute_paths() -> None:
+    relative = _FontOutline(FONT, precision=0, relative=True)
+    absolute = _FontOutline(FONT, precision=0, relative=False)
+
+    for name in ("a", "B", "at", "ampersand"):
+        path = relative.glyph_path(name)
+        assert path.startswith("m") and "." not in path
+        assert _absolute_points(path) == _absolute_points(absolute.glyph_path(name))
+    assert len(relative.glyph_path("at")) < len(absolute.glyph_path("at"))
+
+
+def test_precision_keeps_fractional_coordinates() -> None:
+    outline = _FontOutline(FONT, precision=1, relative=False)
+
+    # "a" の2次ベジェには暗黙のon-curve点 (.5) が含まれる.
+    assert "1050 121.5" in outline.glyph_path("a")
+
+
+def test_eyecatch_jobs_expands_directories_and_template(tmp_path: Path) -> None:
+    for name in ("A/FamA-Regular.ttf", "A/FamA-Bold.ttf", "B/FamB-Regular.ttf"):
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).touch()
+
+    jobs = eyecatch_jobs([tmp_path], "out/{family}.svg")
+
+    assert jobs == [
+        (tmp_path / "A/FamA-Regular.ttf", Path("out/FamA.svg")),
+        (tmp_path / "B/FamB-Regular.ttf", Path("out/FamB.svg")),
+    ]
+    assert eyecatch_jobs([FONT], "single.svg") == [(FONT, Path("single.svg"))]
+    with pytest.raises(ValueError, match="テンプレート"):
+        eyecatch_jobs([tmp_path], "eyecatch.svg")
+    with pytest.raises(ValueError, match="重複"):
+        eyecatch_jobs([tmp_path], "out/{family}.svg", pattern="FamA-*.ttf")
+
+
+def test_generate_eyecatches_in_process_pool(tmp_path: Path) -> None:
+    jobs = [(FONT, tmp_path / "a.svg"), (FONT, tmp_path / "b.svg")]
+
+    outputs = generate_eyecatches(jobs, title="Pool", workers=2)
+
+    assert outputs == [tmp_path / "a.svg", tmp_path / "b.svg"]
+    assert outputs[0].read_text(encoding="utf-8") == outputs[1].read_text(encoding="utf-8")
@@ -66,3 +66,47 @@ def test_resize_all_scale_sets_variant_widths(monkeypatch: pytest.MonkeyPatch) -
     assert len(glyphs[0].transforms) == 1
     assert len(glyphs[1].transforms) == 1
     assert glyphs[2].transforms == []
+
+
+class RecordingSelection:
+    """selection.select の呼び出しを記録する."""
+
+    def __init__(self) -> None:
+        """呼び出し記録を初期化する."""
+        self.calls: list[tuple[object, ...]] = []
+
+    def select(self, *args: object) -> None:
+        """select の引数を記録する."""
+        self.calls.append(args)
+
+    def none(self) -> None:
+        """選択解除を記録する."""
+        self.calls.append(("none",))
+
+
+class ItalicFont:
+    """make_italic が使う selection / transform だけを持つ font."""
+
+    def __init__(self) -> None:
+        """selection と transform の記録を用意する."""
+        self.selection = RecordingSelection()
+        self.transforms: list[object] = []
+
+    def transform(self, matrix: object) -> None:
+        """適用された変換を記録する."""
+        self.transforms.append(matrix)
+
+
+def test_make_italic_selects_italic_ranges(monkeypatch: pytest.MonkeyPatch) -> None:
+    """codepointレンジと glyph名レンジを追加選択してから skew する."""
+    monkeypatch.setattr(fontforge_helpers, "skew_matrix", lambda angle: ("skew", angle))
+    font = ItalicFont()
+
+    fontforge_helpers.make_italic(font, -11)
+
+    calls = font.selection.calls
+    assert calls[0] == (("more", "ranges", "encoding"), 0x21, 0x217F)
+    assert (("more", "encoding"), 0x2E18) in calls  # 単一codepoint
+    assert (("more", "ranges", "encoding"), ".notdef", "uni301F.half") in calls
+    assert calls[-1] == ("none",)
+    assert font.transforms == [("skew", -11)]
@@ -0,0 +1,91 @@
+"""fontindex module の単体テスト."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+from robotomonojp import fontindex
+from robotomonojp.fontindex import FontIndex
+
+
+def _build_font(path: Path, codes: list[int], *, family: str, style: str = "Regular") -> Path:
+    """codes の各glyphに四角形を持つ小さなTTFを作る."""
+    names = [".notdef", *(f"uni{code:04X}" for code in codes)]
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(names)
+    fb.setupCharacterMap({code: f"uni{code:04X}" for code in codes})
+    glyphs = {}
+    for name in names:
+        pen = TTGlyphPen(None)
+        pen.moveTo((100, 0))
+        pen.lineTo((100, 700))
+        pen.lineTo((500, 700))
+        pen.closePath()
+        glyphs[name] = pen.glyph()
+    fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics({name: (600, 100) for name in names})
+    fb.setupHorizontalHeader(ascent=900, descent=-100)
+    fb.setupNameTable({"familyName": family, "styleName": style})
+    fb.setupOS2(
+        usWeightClass=700 if "Bold" in style else 400,
+        fsSelection=0x01 if "Italic" in style else 0x40,
+    )
+    fb.setupPost()
+    fb.save(str(path))
+    return path
+
+
+def test_parse_codepoint() -> None:
+    assert fontindex.parse_codepoint("U+3042") == 0x3042
+    assert fontindex.parse_codepoint("0x41") == 0x41
+    assert fontindex.parse_codepoint("あ") == 0x3042
+    with pytest.raises(ValueError):
+        fontindex.parse_codepoint("abc")
+
+
+def test_read_font_records_names_and_coverage(tmp_path: Path) -> None:
+    path = _build_font(
+        tmp_path / "A-BoldItalic.ttf", [0x41, 0x3042], family="A", style="Bold Italic"
+    )
+
+    record = fontindex.read_font(path)
+
+    assert (record.family, record.style, record.weight, record.italic) == (
+        "A",
+        "Bold Italic",
+        700,
+        True,
+    )
+    assert (record.glyph_count, record.codepoint_count) == (3, 2)
+    assert record.metrics["units_per_em"] == 1000
+    assert record.covers(0x3042)
+    assert not record.covers(0x42)
+    assert not record.covers(0x110000)
+
+
+def test_update_reuses_unchanged_fonts(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    fonts = tmp_path / "dist"
+    (fonts / "B").mkdir(parents=True)
+    a = _build_font(fonts / "A-Regular.ttf", [0x41, 0x3042], family="A")
+    _build_font(fonts / "B" / "B-Regular.ttf", [0x41], family="B")
+    _build_font(fonts / "B" / "B-Bold.ttf", [0x41], family="B", style="Bold")
+    index = FontIndex(tmp_path / "cache")
+
+    assert index.update(fonts) == fontindex.UpdateResult(indexed=3, reused=0, removed=0)
+
+    read: list[Path] = []
+    original = fontindex.read_font
+    monkeypatch.setattr(fontindex, "read_font", lambda path: read.append(path) or original(path))
+    stat = a.stat()
+    os.utime(a, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    (fonts / "B" / "B-Bold.ttf").unlink()
+
+    assert index.update(fonts) == fontindex.UpdateResult(indexed=1, reused=1, removed=1)
+    assert read == [a]
+    assert index.families(fonts) == {"A": ["Regular"], "B": ["Regular"]}
+    assert [Path(record.path).name for record in index.lacking(0x3042, fonts)] == ["B-Regular.ttf"]
@@ -2,12 +2,15 @@
 
 from __future__ import annotations
 
+import pickle
+from dataclasses import replace
 from pathlib import Path
 from typing import cast
 
 import pytest
 
 from robotomonojp import generator, properties
+from robotomonojp.scratch import IOStats
 
 
 class FakeSelection:
@@ -23,9 +26,9 @@ class FakeSelection:
     def none(self) -> None:
         """選択解除 (何もしない)."""
 
-    def select(self, glyph: object) -> None:
-        """glyph の選択を記録する."""
-        self.selected.append(glyph)
+    def select(self, *args: object) -> None:
+        """glyph の選択を記録する. 先頭の ("more",) などのflagは無視する."""
+        self.selected.append(args[-1])
 
 
 class FakeGlyph:
@@ -105,6 +108,9 @@ class FakeFont:
         """glyph 一覧を返す."""
         return self._glyphs
 
+    def close(self) -> None:
+        """何もしない."""
+
     def __getitem__(self, key: int | str) -> FakeGlyph:
         """glyph名またはunicodeでglyphを取得する. 実物同様、無ければTypeError."""
         for glyph in self._glyphs:
@@ -335,6 +341,82 @@ def test_load_jp_font_split_skips_when_glyph_or_altuni_missing(
     assert [glyph.glyphname for glyph in result.glyphs()] == ["uni3042", "minus"]
 
 
+def _jp_source_font() -> FakeFont:
+    """shard の有無で結果を比べるための、削除・分離対象を含むJPフォント."""
+    ideographic_space = FakeGlyph(0x2003)
+    ideographic_space.glyphname = "uni2003"
+    ideographic_space.altuni = ((0x3000, -1, 0),)
+    ideographic_space.width = 1000
+    glyphs = [
+        FakeGlyph(0x3042),
+        FakeGlyph(0x0020),
+        FakeGlyph(0xFF61),
+        FakeGlyph(0x0000, worth_outputting=False),
+        ideographic_space,
+        FakeGlyph(0x25CB),
+    ]
+    return FakeFont(ascent=880, glyph_list=glyphs)
+
+
+def test_load_jp_font_sharded_matches_single_process(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """shard ごとの前処理の結果は、glyph順・altuni・幅・strokeまで1processと同じになる."""
+    opened: list[FakeFont] = []
+    shards: list[list[str]] = []
+
+    class FreshFontForge:
+        @staticmethod
+        def open(path: str) -> FakeFont:
+            opened.append(_jp_source_font())
+            return opened[-1]
+
+    def run_in_process(fn, shard_list, *args):  # type: ignore[no-untyped-def]
+        shards.extend(shard_list)
+        return [fn(*args, shard) for shard in shard_list]
+
+    def dump(glyph: FakeGlyph) -> bytes:
+        return pickle.dumps((glyph.width, glyph.transforms))
+
+    def restore(glyph: FakeGlyph, blob: bytes) -> None:
+        glyph.width, glyph.transforms = pickle.loads(blob)
+
+    monkeypatch.setattr(generator, "fontforge", FreshFontForge)
+    monkeypatch.setattr(generator, "psMat", FakePsMat)
+    monkeypatch.setattr(generator, "run_shards", run_in_process)
+    monkeypatch.setattr(generator, "dump_glyph", dump)
+    monkeypatch.setattr(generator, "restore_glyph", restore)
+    monkeypatch.setattr("robotomonojp.sharding.MIN_SHARD_GLYPHS", 1)
+    request = _build_request(tmp_path, "Regular")
+    cfg = request.config.model_copy(update={"jp_stroke_width": 8})
+    _, jp = generator.prepare_requests_for(replace(request, prepare_shards=2, verify_shards=True))
+    jp = replace(jp, config=cfg)
+
+    sharded = generator._load_jp_font_sharded(jp)
+    single = generator._load_jp_font(
+        jp.source,
+        ascent=cfg.ascent,
+        descent=cfg.descent,
+        em=cfg.em,
+        en_width=cfg.en_width,
+        jp_width=cfg.jp_width,
+        jp_scale_offset=cfg.jp_scale_offset,
+    )
+    generator._apply_jp_stroke_width(single, cfg.jp_stroke_width)
+
+    assert shards == [["uni2003", "uni25CB"], ["uni3042", "uniFF61"]]
+    assert [(g.glyphname, g.width, g.transforms, g.altuni) for g in sharded.glyphs()] == [
+        (g.glyphname, g.width, g.transforms, g.altuni) for g in single.glyphs()
+    ]
+    assert [g.glyphname for g in sharded.removed_glyphs] == ["uni0020"]
+    # workerは自分の shard のglyphだけをstrokeする.
+    assert [font.selection.selected for font in opened[1:3]] == [
+        [opened[1]["uni2003"], opened[1]["uni25CB"]],
+        [opened[2]["uni3042"], opened[2]["uniFF61"]],
+    ]
+    assert all(len(font.strokes) == 1 for font in opened[1:4])
+
+
 def test_apply_jp_stroke_width_keeps_advance_widths() -> None:
     """JP stroke補正は輪郭だけを太らせ、advance widthを維持する."""
     fullwidth = FakeGlyph(0x3042)
@@ -468,3 +550,309 @@ def test_scale_nerd_glyphs(monkeypatch: pytest.MonkeyPatch) -> None:
     ]
     assert empty_ink.transforms == []
     assert other.transforms == []  # レンジ外は触らない
+
+
+def test_scale_nerd_glyphs_outside_nerd_font_ranges(monkeypatch: pytest.MonkeyPatch) -> None:
+    """params.NERD_FONT_RANGES に無いcodepointでも、指定されていれば拡大縮小する."""
+    trigram = FakeGlyph(0x2630)
+    trigram.bbox = (0.0, 0.0, 100.0, 100.0)
+    font = FakeIndexableFont({0x2630: trigram})
+    monkeypatch.setattr(generator, "psMat", FakePsMat)
+
+    generator._scale_nerd_glyphs(font, {"2630": 0.9})
+
+    assert ("scale", 0.9, 0.9) in trigram.transforms
+
+
+def _build_request(tmp_path: Path, style: str, *, mono: bool = False) -> generator.BuildRequest:
+    """実在する小さなファイルを入力フォントに見立てたBuildRequestを作る."""
+    from robotomonojp.config import Config
+
+    fonts = {}
+    for lang in ("en", "jp"):
+        fonts[lang] = {}
+        for weight in ("regular", "bold"):
+            path = tmp_path / f"{lang}-{weight}.ttf"
+            path.write_bytes(f"{lang}-{weight}".encode())
+            fonts[lang][weight] = str(path)
+    cfg = Config.model_validate(
+        {
+            "jp_identifier": "Plex",
+            "fonts": fonts,
+            "ascent": 1638,
+            "descent": 410,
+            "em": 2048,
+            "en_width": 1299,
+            "jp_width": 1849,
+            "jp_scale_offset": 0.10,
+            "underline_pos": -200,
+            "underline_height": 100,
+            "os2_ascent": 2146,
+            "os2_descent": 555,
+        }
+    )
+    return generator.BuildRequest(
+        config=cfg, style=style, version="1.0.0", output_dir=tmp_path, mono=mono
+    )
+
+
+def test_prepare_requests_share_keys_across_styles(tmp_path: Path) -> None:
+    """Regular/Italic と Default/Mono で共有できる前処理は同じkeyになる."""
+    regular_en, regular_jp = generator.prepare_requests_for(_build_request(tmp_path, "Regular"))
+    italic_en, italic_jp = generator.prepare_requests_for(_build_request(tmp_path, "Italic"))
+    mono_en, mono_jp = generator.prepare_requests_for(
+        _build_request(tmp_path, "Regular", mono=True)
+    )
+    bold_en, bold_jp = generator.prepare_requests_for(_build_request(tmp_path, "Bold"))
+
+    assert regular_en.key() == italic_en.key() == mono_en.key()
+    assert regular_jp.key() == italic_jp.key()
+    assert regular_jp.key() != mono_jp.key()  # 曖昧幅の扱いが異なる
+    assert regular_en.key() != bold_en.key()
+    assert regular_jp.key() != bold_jp.key()
+
+
+def test_prepare_jp_key_follows_config(tmp_path: Path) -> None:
+    """JP前処理のkeyは前処理に効くConfig値で変わる."""
+    request = _build_request(tmp_path, "Regular")
+    en, jp = generator.prepare_requests_for(request)
+    changed = request.config.model_copy(update={"jp_stroke_width": 8})
+    changed_en = generator.PrepareRequest(kind="en", source=en.source, config=changed)
+    changed_jp = generator.PrepareRequest(kind="jp", source=jp.source, config=changed)
+
+    assert changed_en.key() == en.key()  # EN前処理はconfigに依存しない
+    assert changed_jp.key() != jp.key()
+
+
+def test_output_key_covers_request_and_config(tmp_path: Path) -> None:
+    """出力keyはstyle/variant/version/configのいずれが変わっても変わる."""
+    request = replace(_build_request(tmp_path, "Regular"), apply_nerd_font=False)
+    base = generator.output_key(request)
+
+    assert generator.output_key(request) == base
+    assert generator.output_key(replace(request, style="Italic")) != base
+    assert generator.output_key(replace(request, mono=True)) != base
+    assert generator.output_key(replace(request, version="1.0.0-dev")) != base
+    changed = request.config.model_copy(update={"underline_pos": -100})
+    assert generator.output_key(replace(request, config=changed)) != base
+
+
+def test_output_paths(tmp_path: Path) -> None:
+    request = _build_request(tmp_path, "BoldItalic", mono=True)
+
+    ttf, otf = generator.output_paths(request)
+
+    assert ttf == tmp_path / "RobotoMonoPlex-Mono" / "RobotoMonoPlex-Mono-BoldItalic.ttf"
+    assert otf == ttf.with_suffix(".otf")
+
+
+class FakeStageFont:
+    """build のstage間で保存・書き出しされる font fake."""
+
+    def save(self, path: str) -> None:
+        """sfdの代わりに中身のあるファイルを書く."""
+        Path(path).write_text("sfd", encoding="utf-8")
+
+    def generate(self, path: str, flags: tuple[str, ...] = ()) -> None:
+        """ttf/otfの代わりに中身のあるファイルを書く."""
+        Path(path).write_text(",".join(flags) or "ttf", encoding="utf-8")
+
+    def close(self) -> None:
+        """何もしない."""
+
+
+def test_build_resumes_from_last_checkpoint(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """中断したbuildは --resume で最後に保存したstageの次から再開する."""
+    request = replace(
+        _build_request(tmp_path, "Regular"),
+        apply_nerd_font=False,
+        cache_dir=tmp_path / "cache",
+        checkpoint=True,
+    )
+    calls: list[str] = []
+
+    def merge(
+        request: generator.BuildRequest, prepare_root: Path, io_stats: IOStats
+    ) -> FakeStageFont:
+        calls.append("merged")
+        return FakeStageFont()
+
+    def finalize_crash(font: FakeStageFont, request: generator.BuildRequest) -> None:
+        raise RuntimeError("killed")
+
+    class StageFontForge:
+        @staticmethod
+        def open(path: str) -> FakeStageFont:
+            calls.append(f"open:{Path(path).suffixes[-2]}")
+            return FakeStageFont()
+
+    monkeypatch.setattr(generator, "fontforge", StageFontForge)
+    monkeypatch.setattr(generator, "_merge_sources", merge)
+    monkeypatch.setattr(generator, "_hint", lambda font, *args: calls.append("hinted"))
+    monkeypatch.setattr(generator, "_finalize", finalize_crash)
+    with pytest.raises(RuntimeError):
+        generator.build(request)
+    assert calls == ["merged", "hinted"]
+
+    calls.clear()
+    monkeypatch.setattr(generator, "_finalize", lambda font, request: calls.append("finalized"))
+    stats = IOStats()
+    ttf = generator.build(replace(request, resume=True), stats)
+
+    assert calls == ["open:.hinted", "finalized"]
+    assert stats.stages["finalized"].read == len("sfd")  # hintedのcheckpointを読み直した
+    assert stats.stages["output"].written == len("ttf") + len("opentype")
+    assert ttf.read_text(encoding="utf-8") == "ttf"
+    assert ttf.with_suffix(".otf").read_text(encoding="utf-8") == "opentype"
+    assert list((tmp_path / "cache" / "work").iterdir()) == []  # 成功したらcheckpointは消す
+
+
+def test_build_skips_checkpoints_by_default(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """--checkpoint / --resume が無ければ、cacheがあってもsfdなどを cache_dir/work に書かない."""
+    request = replace(
+        _build_request(tmp_path, "Regular"), apply_nerd_font=False, cache_dir=tmp_path / "cache"
+    )
+    monkeypatch.setattr(generator, "_merge_sources", lambda *args: FakeStageFont())
+    monkeypatch.setattr(generator, "_hint", lambda font, *args: None)
+    monkeypatch.setattr(generator, "_finalize", lambda font, request: None)
+    stats = IOStats()
+
+    generator.build(request, stats)
+
+    assert not (tmp_path / "cache" / "work").exists()
+    assert "merged" not in stats.stages or stats.stages["merged"].written == 0
+    assert "checkpoint" not in stats.stages
+
+
+def test_mono_delta_glyphs_selects_narrowed_ambiguous_glyphs() -> None:
+    """Mono版で幅が変わるJP glyphだけを差分にし、EN優先glyphとNerd Fontsレンジは除く."""
+    circle = FakeGlyph(0x25CB)  # ○ Mono版で半角へ縮小される
+    arrow = FakeGlyph(0x2192)  # → ENフォントにもある
+    kana = FakeGlyph(0x3042)  # あ 両版とも全角
+    heart = FakeGlyph(0x2665)  # ♥ Nerd Font patchが上書きする
+    jp_default = FakeFont(ascent=1638, glyph_list=[circle, arrow, kana, heart])
+    for glyph in jp_default.glyphs():
+        glyph.width = 1849
+    jp_mono = FakeFont(
+        ascent=1638,
+        glyph_list=[FakeGlyph(code) for code in (0x25CB, 0x2192, 0x3042, 0x2665)],
+    )
+    for glyph in jp_mono.glyphs():
+        glyph.width = 1849 if glyph.encoding == 0x3042 else 1299
+    en_font = FakeFont(ascent=1638, glyph_list=[FakeGlyph(0x2192)])
+
+    delta = generator._mono_delta_glyphs(en_font, jp_default, jp_mono)
+
+    assert delta == [(0x25CB, "uni25CB")]
+
+
+class FakeNamedFont:
+    """family名関連の属性だけを持つ font fake."""
+
+    def __init__(self) -> None:
+        """Default版の名前を設定する."""
+        self.familyname = "RobotoMonoPlex"
+        self.fontname = "RobotoMonoPlex-BoldItalic"
+        self.fullname = "RobotoMonoPlex-BoldItalic"
+        self.sfnt_names = (
+            ("English (US)", "Copyright", "RobotoMonoPlex authors"),
+            ("English (US)", "SubFamily", "Bold Italic"),
+            ("English (US)", "UniqueID", "FontForge 2.0; RobotoMonoPlex BoldItalic; 7.1.2"),
+        )
+
+
+def test_rename_family_for_mono() -> None:
+    font = FakeNamedFont()
+
+    generator._rename_family(font, "RobotoMonoPlex", "RobotoMonoPlex-Mono")
+
+    assert font.familyname == "RobotoMonoPlex-Mono"
+    assert font.fontname == "RobotoMonoPlex-Mono-BoldItalic"
+    assert font.fullname == "RobotoMonoPlex-Mono-BoldItalic"
+    assert font.sfnt_names == (
+        ("English (US)", "Copyright", "RobotoMonoPlex authors"),
+        ("English (US)", "SubFamily", "Bold Italic"),
+        ("English (US)", "UniqueID", "FontForge 2.0; RobotoMonoPlex-Mono BoldItalic; 7.1.2"),
+    )
+
+
+def test_output_key_distinguishes_mono_delta(tmp_path: Path) -> None:
+    request = replace(_build_request(tmp_path, "Regular", mono=True), apply_nerd_font=False)
+
+    assert generator.output_key(request) != generator.output_key(replace(request, mono_delta=True))
+
+
+def test_derives_italic_only_for_italic_styles(tmp_path: Path) -> None:
+    request = replace(
+        _build_request(tmp_path, "Italic"), apply_nerd_font=False, italic_from_upright=True
+    )
+
+    assert generator.derives_italic(request)
+    assert not generator.derives_italic(replace(request, style="Bold"))
+    assert generator.output_key(request) != generator.output_key(
+        replace(request, italic_from_upright=False)
+    )
+
+
+def test_derive_italic_outputs_reads_upright_outputs(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """同じvariantのupright出力から派生し、Nerd Fontsのレンジはttfでだけ除く."""
+    request = replace(_build_request(tmp_path, "BoldItalic", mono=True), italic_from_upright=True)
+    upright_ttf, upright_otf = generator.output_paths(replace(request, style="Bold"))
+    upright_ttf.parent.mkdir(parents=True)
+    upright_ttf.write_bytes(b"ttf")
+    upright_otf.write_bytes(b"otf")
+    calls: list[tuple[Path, Path, str, object]] = []
+
+    def fake_derive_italic(source: Path, target: Path, **kwargs: object) -> Path:
+        calls.append((source, target, cast(str, kwargs["familyname"]), kwargs["exclude_ranges"]))
+        target.write_bytes(source.read_bytes())
+        return target
+
+    monkeypatch.setattr(generator, "derive_italic", fake_derive_italic)
+    io_stats = IOStats()
+
+    ttf = generator.derive_italic_outputs(request, io_stats)
+
+    ttf_out, otf_out = generator.output_paths(request)
+    assert ttf == ttf_out
+    assert calls == [
+        (upright_ttf, ttf_out, "RobotoMonoPlex-Mono", generator.params.NERD_FONT_RANGES),
+        (upright_otf, otf_out, "RobotoMonoPlex-Mono", []),
+    ]
+    assert io_stats.stages["italic"].read == 6
+
+
+def test_overlay_nerd_font_patches_carrier_once(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """patch済みcarrierはcacheし、同じsignatureのbuildではfont-patcherを呼ばない."""
+    import shutil
+
+    from fontTools.ttLib import TTFont
+
+    font = Path("fonts/RobotoMono/RobotoMono-Regular.ttf")
+    request = replace(_build_request(tmp_path, "Regular"), nerd_overlay=True)
+    monkeypatch.setattr(generator, "nerd_fonts_revision", lambda root: "rev")
+    patched_carriers: list[int] = []
+
+    def fake_patch(
+        request: generator.BuildRequest, carrier: Path, patched: Path, io_stats: IOStats
+    ) -> None:
+        patched_carriers.append(len(TTFont(str(carrier)).getGlyphOrder()))
+        shutil.copy(carrier, patched)
+
+    monkeypatch.setattr(generator, "_patch_nerd_font", fake_patch)
+    cache_root = tmp_path / "cache"
+    for name in ("first", "second"):
+        generator._overlay_nerd_font(request, font, tmp_path / f"{name}.ttf", cache_root, IOStats())
+        assert (tmp_path / f"{name}.ttf").exists()
+
+    assert len(patched_carriers) == 1
+    assert patched_carriers[0] < len(TTFont(str(font)).getGlyphOrder())
+    assert len(list((cache_root / "prepared").glob("nerd-*.ttf"))) == 1
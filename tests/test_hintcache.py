@@ -0,0 +1,278 @@
+"""hintcache module と generator のヒンティング (cache・shard並列) のテスト. FontForgeは fake で置き換える."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from robotomonojp import generator, hintcache
+from robotomonojp.cache import cache_entries
+from robotomonojp.hintcache import HintCache, Program
+from robotomonojp.sharding import ShardMismatchError
+
+
+class FakeSelection:
+    """font.selection の fake. 選択中のglyphを持つ."""
+
+    def __init__(self, font: FakeHintFont) -> None:
+        """font の glyph を選択対象にする."""
+        self.font = font
+        self.selected: list[FakeHintGlyph] = []
+
+    def all(self) -> None:
+        """全glyphを選択する."""
+        self.selected = list(self.font.glyph_list)
+
+    def none(self) -> None:
+        """選択を解除する."""
+        self.selected = []
+
+    def select(self, flags: tuple[str, ...], glyph: FakeHintGlyph) -> None:
+        """("more",) で glyph を選択に加える."""
+        assert flags == ("more",)
+        self.selected.append(glyph)
+
+
+class FakeHintGlyph:
+    """輪郭を文字列で持つ glyph fake."""
+
+    def __init__(self, name: str, outline: str, unicode: int = -1) -> None:
+        """hinting前の glyph を作る."""
+        self.glyphname = name
+        self.unicode = unicode
+        self.outline = outline
+        self.hinted = ""
+        self.references: tuple[tuple[str, tuple[float, ...]], ...] = ()
+
+
+class FakeHintFont:
+    """ヒンティングの対象になる font fake. cvt などは tables に持つ."""
+
+    def __init__(self, outlines: dict[str, str]) -> None:
+        """glyph名 → 輪郭 の glyph を持つ font を作る. codepointは並び順."""
+        self.outlines = outlines
+        self.glyph_list = [
+            FakeHintGlyph(name, outline, code)
+            for code, (name, outline) in enumerate(outlines.items())
+        ]
+        self.selection = FakeSelection(self)
+        self.tables: dict[str, bytes] = {}
+
+    def glyphs(self) -> list[FakeHintGlyph]:
+        """glyph 一覧を返す."""
+        return self.glyph_list
+
+    def __getitem__(self, name: str) -> FakeHintGlyph:
+        """glyph名でglyphを返す."""
+        return next(glyph for glyph in self.glyph_list if glyph.glyphname == name)
+
+    def save(self, path: str) -> None:
+        """fake の fontforge.open で読み直せるよう、輪郭を書き出す."""
+        Path(path).write_text("\n".join(f"{n}={o}" for n, o in self.outlines.items()))
+
+    def close(self) -> None:
+        """何もしない."""
+
+    def getTableData(self, tag: str) -> bytes | None:
+        """table の中身. 無ければNone."""
+        return self.tables.get(tag)
+
+    def setTableData(self, tag: str, data: bytes) -> None:
+        """table を書き換える."""
+        self.tables[tag] = data
+
+
+class FakeHinting:
+    """_hint_selection の fake. 呼び出しごとに処理したglyph名を記録し、cvt を書き込む."""
+
+    def __init__(self) -> None:
+        """記録を空にする."""
+        self.calls: list[list[str]] = []
+        self.cvt = b"cvt-1"
+
+    def __call__(self, font: FakeHintFont) -> None:
+        """選択中のglyphをヒンティングしたことにする."""
+        self.calls.append([glyph.glyphname for glyph in font.selection.selected])
+        for glyph in font.selection.selected:
+            glyph.hinted = f"hinted:{glyph.outline}"
+        font.tables["cvt "] = self.cvt
+
+
+@pytest.fixture
+def hinting(monkeypatch: pytest.MonkeyPatch) -> FakeHinting:
+    """generator のFontForge依存の処理を fake にする. 輪郭keyは輪郭の文字列そのもの."""
+    fake = FakeHinting()
+
+    def restore(glyph: FakeHintGlyph, blob: bytes) -> None:
+        glyph.hinted = f"restored:{blob.decode()}"
+
+    monkeypatch.setattr(generator, "_hint_selection", fake)
+    monkeypatch.setattr(generator, "hint_context", lambda font: "context")
+    # 空の輪郭はreferenceを含むglyph (cacheしない) の代わり.
+    monkeypatch.setattr(generator, "outline_key", lambda glyph: glyph.outline or None)
+    monkeypatch.setattr(generator, "dump_glyph", lambda glyph: glyph.hinted.encode())
+    monkeypatch.setattr(generator, "restore_glyph", restore)
+    return fake
+
+
+def test_hint_cache_round_trip(tmp_path: Path) -> None:
+    cache = HintCache(tmp_path)
+
+    assert cache.lookup("context", ["a"]) == {}
+    assert cache.program("context") is None
+
+    cache.store("context", {"a": b"glyph-a"})
+    cache.store_program("context", Program((b"cvt", None, b"prep")))
+
+    assert cache.lookup("context", ["a", "b"]) == {"a": b"glyph-a"}
+    assert cache.lookup("other", ["a"]) == {}
+    assert cache.program("context") == Program((b"cvt", None, b"prep"))
+    assert [entry.kind for entry in cache_entries(tmp_path)] == ["hints"]
+
+
+def test_hint_context_changes_with_code(monkeypatch: pytest.MonkeyPatch) -> None:
+    """処理の本体は generator にあるため、package のコードが変われば別のkeyにする."""
+
+    class FakeFontforge:
+        version = staticmethod(lambda: "20230101")
+
+    class FakeFont:
+        private: dict[str, object] = {"BlueValues": (0, 10)}
+        em, ascent, descent, italicangle = 2048, 1638, 410, 0.0
+
+    monkeypatch.setattr(hintcache, "fontforge", FakeFontforge)
+    monkeypatch.setattr(hintcache, "code_fingerprint", lambda: "code-1")
+    before = hintcache.hint_context(FakeFont())
+    monkeypatch.setattr(hintcache, "code_fingerprint", lambda: "code-2")
+
+    assert hintcache.hint_context(FakeFont()) != before
+
+
+def test_hint_with_cache_hints_only_new_outlines(tmp_path: Path, hinting: FakeHinting) -> None:
+    cache = HintCache(tmp_path)
+    outlines = {"a": "A", "b": "B", "ref": ""}
+
+    first = FakeHintFont(outlines)
+    assert generator._hint_with_cache(first, cache) == 0
+    assert hinting.calls == [["a", "b", "ref"]]
+
+    second = FakeHintFont(outlines)
+    assert generator._hint_with_cache(second, cache) == 2
+    # referenceを含むglyph (輪郭keyがNone) は毎回ヒンティングする.
+    assert hinting.calls[1:] == [["ref"]]
+    assert [g.hinted for g in second.glyphs()] == [
+        "restored:hinted:A",
+        "restored:hinted:B",
+        "hinted:",
+    ]
+    assert second.tables == {"cvt ": b"cvt-1"}
+
+    third = FakeHintFont({"a": "A", "b": "B2"})
+    assert generator._hint_with_cache(third, cache) == 1
+    assert hinting.calls[2:] == [["b"]]
+    assert third.glyphs()[1].hinted == "hinted:B2"
+
+
+def test_hint_with_cache_restores_program_without_new_glyphs(
+    tmp_path: Path, hinting: FakeHinting
+) -> None:
+    cache = HintCache(tmp_path)
+    generator._hint_with_cache(FakeHintFont({"a": "A"}), cache)
+
+    font = FakeHintFont({"a": "A"})
+    assert generator._hint_with_cache(font, cache) == 1
+
+    assert hinting.calls == [["a"]]
+    assert font.tables == {"cvt ": b"cvt-1"}
+
+
+def test_hint_with_cache_rehints_on_program_mismatch(tmp_path: Path, hinting: FakeHinting) -> None:
+    cache = HintCache(tmp_path)
+    generator._hint_with_cache(FakeHintFont({"a": "A"}), cache)
+    hinting.cvt = b"cvt-2"
+
+    font = FakeHintFont({"a": "A", "b": "B"})
+    assert generator._hint_with_cache(font, cache) == 0
+
+    assert hinting.calls[1:] == [["b"], ["a"]]
+    assert [g.hinted for g in font.glyphs()] == ["hinted:A", "hinted:B"]
+    assert cache.program("context") == Program((b"cvt-2", None, None))
+
+
+@pytest.fixture
+def sharded(hinting: FakeHinting, monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    """shard を別processではなく順に実行し、workerごとの glyph名を記録する."""
+    shards: list[list[str]] = []
+
+    def open_font(path: str) -> FakeHintFont:
+        lines = Path(path).read_text().splitlines()
+        return FakeHintFont(dict(line.split("=", 1) for line in lines))
+
+    def run_in_process(
+        fn: Callable[..., Any], shard_list: list[list[str]], *args: Any
+    ) -> list[Any]:
+        shards.extend(shard_list)
+        return [fn(*args, shard) for shard in shard_list]
+
+    class FakeFontforge:
+        open = staticmethod(open_font)
+
+    monkeypatch.setattr(generator, "fontforge", FakeFontforge)
+    monkeypatch.setattr(generator, "run_shards", run_in_process)
+    monkeypatch.setattr("robotomonojp.sharding.MIN_SHARD_GLYPHS", 2)
+    return shards
+
+
+def test_hint_shards_and_restores_results(tmp_path: Path, sharded: list[list[str]]) -> None:
+    font = FakeHintFont({f"g{i}": f"O{i}" for i in range(5)})
+
+    generator._hint(font, options=generator.HintOptions(shards=2, scratch_dir=tmp_path))
+
+    assert sharded == [["g0", "g1", "g2"], ["g3", "g4"]]
+    assert [g.hinted for g in font.glyphs()] == [f"restored:hinted:O{i}" for i in range(5)]
+    assert font.tables == {"cvt ": b"cvt-1"}
+
+
+def test_hint_shards_keeps_composites_in_parent(
+    tmp_path: Path, sharded: list[list[str]], hinting: FakeHinting
+) -> None:
+    """referenceは worker から戻せないため、composite glyphは shard に出さず親processで処理する."""
+    font = FakeHintFont({f"g{i}": f"O{i}" for i in range(5)})
+    font["g2"].references = (("g0", (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)),)
+
+    generator._hint(font, options=generator.HintOptions(shards=2, scratch_dir=tmp_path))
+
+    assert sharded == [["g0", "g1"], ["g3", "g4"]]
+    assert hinting.calls[-1] == ["g2"]
+    assert [g.hinted for g in font.glyphs()] == [
+        "restored:hinted:O0",
+        "restored:hinted:O1",
+        "hinted:O2",
+        "restored:hinted:O3",
+        "restored:hinted:O4",
+    ]
+
+
+def test_hint_shards_verify_detects_mismatch(
+    tmp_path: Path, sharded: list[list[str]], hinting: FakeHinting
+) -> None:
+    font = FakeHintFont({f"g{i}": f"O{i}" for i in range(4)})
+    options = generator.HintOptions(shards=2, verify=True, scratch_dir=tmp_path)
+
+    generator._hint(font, options=options)
+    assert hinting.calls[-1] == ["g0", "g1", "g2", "g3"]
+
+    original = FakeHinting.__call__
+
+    def unstable(self: FakeHinting, target: FakeHintFont) -> None:
+        original(self, target)
+        if len(target.selection.selected) == 2:
+            target.selection.selected[0].hinted += "!"
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(FakeHinting, "__call__", unstable)
+        with pytest.raises(ShardMismatchError, match=r"2 glyph\(s\) differ"):
+            generator._hint(FakeHintFont(font.outlines), options=options)
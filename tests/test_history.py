@@ -0,0 +1,57 @@
+"""history module の単体テスト."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from robotomonojp.history import DEFAULT_SECONDS, History
+
+
+def test_record_smooths_repeated_runs(tmp_path: Path) -> None:
+    """同じkeyの実測値は指数移動平均で更新する."""
+    history = History.load(tmp_path)
+    history.record("build:RobotoMonoPlex-Bold", 100.0, {"hinted": 40.0})
+    history.record("build:RobotoMonoPlex-Bold", 200.0, {"hinted": 80.0})
+
+    entry = history.entries["build:RobotoMonoPlex-Bold"]
+    assert entry.seconds == 150.0
+    assert entry.runs == 2
+    assert entry.stages == {"hinted": 60.0}
+
+
+def test_estimate_falls_back_to_same_kind_then_defaults(tmp_path: Path) -> None:
+    history = History.load(tmp_path)
+    history.record("build:RobotoMonoPlex-Regular", 100.0)
+    history.record("build:RobotoMonoPlex-Bold", 300.0)
+
+    assert history.estimate("build:RobotoMonoPlex-Bold") == 300.0
+    assert history.estimate("build:RobotoMonoPlex-Italic") == 200.0
+    assert history.estimate("italic:RobotoMonoPlex-Italic") == DEFAULT_SECONDS["italic"]
+    assert not history.is_measured("build:RobotoMonoPlex-Italic")
+
+
+def test_save_and_load_round_trip(tmp_path: Path) -> None:
+    history = History.load(tmp_path)
+    history.record("prepare-jp:IBMPlexSansJP-Regular.ttf", 42.0)
+    history.save()
+
+    loaded = History.load(tmp_path)
+    assert loaded.estimate("prepare-jp:IBMPlexSansJP-Regular.ttf") == 42.0
+    assert list(tmp_path.iterdir()) == [tmp_path / "history.json"]
+
+
+def test_load_ignores_broken_file(tmp_path: Path) -> None:
+    (tmp_path / "history.json").write_text("{not json")
+
+    assert History.load(tmp_path).entries == {}
+
+
+def test_peak_rss_rises_immediately_and_decays_slowly(tmp_path: Path) -> None:
+    history = History.load(tmp_path)
+    history.record("build:RobotoMonoPlex-Bold", 10.0, peak_rss=1000)
+    history.record("build:RobotoMonoPlex-Bold", 10.0, peak_rss=3000)
+    assert history.peak_rss("build:RobotoMonoPlex-Bold") == 3000
+
+    history.record("build:RobotoMonoPlex-Bold", 10.0, peak_rss=1000)
+    assert history.peak_rss("build:RobotoMonoPlex-Bold") == 2000
+    assert history.peak_rss("build:RobotoMonoPlex-Regular") is None
@@ -0,0 +1,197 @@
+"""italic module の単体テスト."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.boundsPen import BoundsPen, ControlBoundsPen
+from fontTools.pens.recordingPen import RecordingPen
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables._g_l_y_f import GlyphCoordinates
+
+from robotomonojp.fontforge_helpers import skew_factor
+from robotomonojp.italic import add_extrema, derive_italic, italic_glyph_names, skew_coordinates
+
+FONT = Path("fonts/RobotoMono/RobotoMono-Regular.ttf")
+
+
+def test_skew_factor_leans_right_for_negative_angle() -> None:
+    """italic_angle が負なら x が y に比例して右へずれる."""
+    assert abs(skew_factor(-45) - 1.0) < 1e-9
+    assert skew_factor(0) == 0
+
+
+def test_skew_coordinates_skews_each_glyph() -> None:
+    """複数glyphの座標に x += factor * y する."""
+    first = GlyphCoordinates([(0, 0), (10, 100)])
+    second = GlyphCoordinates([(5, -20)])
+    skew_coordinates([first, GlyphCoordinates(), second], 0.5)
+    assert list(first) == [(0, 0), (60, 100)]
+    assert list(second) == [(-5, -20)]
+
+
+def test_add_extrema_splits_curves_at_extrema() -> None:
+    """極値を内部に持つ曲線だけを分割し、暗黙のon-curveはそのまま残す."""
+    pen = TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.qCurveTo((100, 100), (0, 200))
+    pen.closePath()
+    pen.moveTo((300, 0))
+    pen.qCurveTo((400, 0), (400, 200), (300, 200))
+    pen.closePath()
+    glyph = pen.glyph()
+
+    add_extrema(glyph)
+
+    assert list(glyph.coordinates) == [
+        (0, 0),
+        (50, 50),
+        (50, 100),
+        (50, 150),
+        (0, 200),
+        (300, 0),
+        (400, 0),
+        (400, 200),
+        (300, 200),
+    ]
+    assert list(glyph.flags) == [1, 0, 1, 0, 1, 1, 0, 0, 1]
+    assert glyph.endPtsOfContours == [4, 8]
+
+
+def test_italic_glyph_names_excludes_ranges() -> None:
+    """make_italic と同じcodepointを選び、exclude_ranges は除く."""
+    font = TTFont(str(FONT))
+    cmap = font.getBestCmap()
+    names = italic_glyph_names(font, [(ord("A"), ord("A"))])
+    assert cmap[ord("B")] in names
+    assert cmap[ord("A")] not in names
+    # U+0020 (space) は ITALIC_CODEPOINT_RANGES に入らない.
+    assert cmap[0x20] not in italic_glyph_names(font)
+
+
+def test_italic_glyph_names_selects_only_unencoded_glyphs_in_name_ranges() -> None:
+    """名前レンジ (.notdef〜uni301F.half) の間にある encodeされたglyphは codepointレンジだけで選ぶ."""
+    order = [".notdef", "A", "uni2500", "uniE0A0", "uni3042.half", "uni301F.half"]
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(order)
+    fb.setupCharacterMap({ord("A"): "A", 0x2500: "uni2500", 0xE0A0: "uniE0A0"})
+    fb.setupGlyf({name: TTGlyphPen(None).glyph() for name in order})
+
+    names = italic_glyph_names(fb.font, [(0xE0A0, 0xE0A0)])
+
+    # U+2500 (罫線) は ITALIC_CODEPOINT_RANGES に入らないため傾けない.
+    assert names == {".notdef", "A", "uni3042.half", "uni301F.half"}
+
+
+def test_derive_italic_skews_glyf_and_patches_metadata(tmp_path: Path) -> None:
+    """glyf座標を skew し、Italic用のメタデータへ書き換える."""
+    upright = TTFont(str(FONT))
+    family = upright["name"].getDebugName(1)
+    out = derive_italic(
+        FONT,
+        tmp_path / "Italic.ttf",
+        familyname=family.replace(" ", ""),
+        style="Italic",
+        italic_angle=-11,
+        exclude_ranges=[(ord("B"), ord("B"))],
+    )
+    italic = TTFont(str(out))
+    factor = skew_factor(-11)
+    cmap = upright.getBestCmap()
+
+    upright_glyf, italic_glyf = upright["glyf"], italic["glyf"]
+    original = upright_glyf[cmap[ord("H")]].getCoordinates(upright_glyf)[0]
+    skewed = italic_glyf[cmap[ord("H")]].getCoordinates(italic_glyf)[0]
+    assert list(skewed) == [(round(x + factor * y), y) for x, y in original]
+    assert italic_glyf[cmap[ord("H")]].program.getBytecode() == b""
+    # 除外したglyphはそのまま.
+    assert list(italic_glyf[cmap[ord("B")]].getCoordinates(italic_glyf)[0]) == list(
+        upright_glyf[cmap[ord("B")]].getCoordinates(upright_glyf)[0]
+    )
+    assert italic["hmtx"][cmap[ord("H")]][0] == upright["hmtx"][cmap[ord("H")]][0]
+
+    assert italic["post"].italicAngle == -11
+    assert italic["OS/2"].fsSelection & 0b0110_0001 == 1
+    assert italic["OS/2"].panose.bLetterForm == 9
+    assert italic["head"].macStyle & 0b10
+    assert italic["hhea"].caretSlopeRun > 0
+    assert italic["name"].getDebugName(2) == "Italic"
+    # FontForge版と同じく、傾けて内部に移った極値に点を足す.
+    glyph_set = italic.getGlyphSet()
+    bounds, control_bounds = BoundsPen(glyph_set), ControlBoundsPen(glyph_set)
+    glyph_set[cmap[ord("o")]].draw(bounds)
+    glyph_set[cmap[ord("o")]].draw(control_bounds)
+    assert len(italic_glyf[cmap[ord("o")]].coordinates) > len(
+        upright_glyf[cmap[ord("o")]].coordinates
+    )
+    assert all(
+        abs(actual - control) <= 1
+        for actual, control in zip(bounds.bounds, control_bounds.bounds, strict=True)
+    )
+
+
+def test_derive_italic_decomposes_composites(tmp_path: Path) -> None:
+    """選択されたcompositeと、選択glyphを参照するcompositeは展開してから扱う."""
+    upright = TTFont(str(FONT))
+    cmap = upright.getBestCmap()
+    aacute = cmap[0xC1]
+    assert upright["glyf"][aacute].isComposite()
+
+    out = derive_italic(
+        FONT, tmp_path / "Italic.ttf", familyname="RobotoMono", style="Italic", italic_angle=-11
+    )
+    italic = TTFont(str(out))
+    glyf = italic["glyf"]
+    assert not glyf[aacute].isComposite()
+    expected = [
+        (round(x + skew_factor(-11) * y), y)
+        for x, y in upright["glyf"][aacute].getCoordinates(upright["glyf"])[0]
+    ]
+    assert list(glyf[aacute].getCoordinates(glyf)[0]) == expected
+
+
+def _build_cff_font(path: Path) -> None:
+    fb = FontBuilder(1000, isTTF=False)
+    fb.setupGlyphOrder([".notdef", "H", "space"])
+    fb.setupCharacterMap({ord("H"): "H", 0x20: "space"})
+    charstrings = {}
+    for name in (".notdef", "H", "space"):
+        pen = T2CharStringPen(600, None)
+        if name == "H":
+            pen.moveTo((100, 0))
+            pen.lineTo((100, 700))
+            pen.lineTo((200, 700))
+            pen.lineTo((200, 0))
+            pen.closePath()
+        charstrings[name] = pen.getCharString()
+    fb.setupCFF("Test-Regular", {"FullName": "Test-Regular"}, charstrings, {})
+    fb.setupHorizontalMetrics({name: (600, 0) for name in (".notdef", "H", "space")})
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupNameTable({"familyName": "Test", "styleName": "Regular", "psName": "Test-Regular"})
+    fb.setupOS2(fsSelection=64)
+    fb.setupPost()
+    fb.save(str(path))
+
+
+def test_derive_italic_redraws_cff(tmp_path: Path) -> None:
+    """otf (CFF) はcharstringを skew したoutlineで描き直す."""
+    upright = tmp_path / "Test-Regular.otf"
+    _build_cff_font(upright)
+
+    out = derive_italic(
+        upright, tmp_path / "Test-Italic.otf", familyname="Test", style="Italic", italic_angle=-45
+    )
+    italic = TTFont(str(out))
+    glyph_set = italic.getGlyphSet()
+    pen = RecordingPen()
+    glyph_set["H"].draw(pen)
+    points = [args[0] for op, args in pen.value if op in ("moveTo", "lineTo")]
+    assert points == [(100, 0), (800, 700), (900, 700), (200, 0)]
+    assert glyph_set["H"].width == 600
+    assert italic["hmtx"]["H"] == (600, 100)
+    assert italic["name"].getDebugName(6) == "Test-Italic"
+    assert italic["CFF "].cff.fontNames == ["Test-Italic"]
+    assert italic["CFF "].cff.topDictIndex[0].ItalicAngle == -45
@@ -0,0 +1,43 @@
+"""memory module の単体テスト."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from fontTools.ttLib import TTFont
+
+from robotomonojp import memory
+
+FONT = Path("fonts/RobotoMono/RobotoMono-Regular.ttf")
+
+
+def test_glyph_count_reads_maxp() -> None:
+    assert memory.glyph_count(FONT) == TTFont(str(FONT))["maxp"].numGlyphs
+    assert memory.glyph_count(Path("missing.ttf")) is None
+
+
+def test_estimate_peak_rss_scales_with_glyphs(tmp_path: Path) -> None:
+    """見積もりは入力のglyph数に比例し、読めない入力は大きめのCJKフォントとして扱う."""
+    base, per_glyph = memory.RSS_MODEL["build"]
+    glyphs = memory.glyph_count(FONT)
+    assert glyphs is not None
+
+    assert memory.estimate_peak_rss("build", [FONT]) == base + per_glyph * glyphs
+    assert memory.estimate_peak_rss("build", [tmp_path / "broken.ttf"]) == (
+        base + per_glyph * memory.FALLBACK_GLYPHS
+    )
+    assert memory.estimate_peak_rss("italic", [FONT]) < memory.estimate_peak_rss("build", [FONT])
+
+
+def test_peak_rss_is_measured() -> None:
+    memory.reset_peak_rss()
+    peak = memory.peak_rss()
+    assert peak is not None and peak > 0
+
+
+def test_auto_jobs_fits_heaviest_task_in_memory() -> None:
+    gib = 1024**3
+    assert memory.auto_jobs([2 * gib, 1 * gib], available=7 * gib, cores=8) == 3
+    assert memory.auto_jobs([2 * gib], available=64 * gib, cores=8) == 8
+    assert memory.auto_jobs([8 * gib], available=2 * gib, cores=8) == 1
+    assert memory.auto_jobs([2 * gib], available=None, cores=6) == 6
@@ -0,0 +1,80 @@
+"""nerd_overlay module の単体テスト."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont
+
+from robotomonojp.nerd_overlay import carrier_signature, make_carrier, overlay_nerd_glyphs
+
+FONT = Path("fonts/RobotoMono/RobotoMono-Regular.ttf")
+
+
+def _build_nerd_font(path: Path, codes: dict[int, str]) -> None:
+    """codes の各glyphに四角形を持つ小さなTTFを作る."""
+    names = [".notdef", *codes.values()]
+    fb = FontBuilder(2048, isTTF=True)
+    fb.setupGlyphOrder(names)
+    fb.setupCharacterMap(codes)
+    glyphs = {}
+    for name in names:
+        pen = TTGlyphPen(None)
+        if name != ".notdef":
+            pen.moveTo((100, 0))
+            pen.lineTo((100, 900))
+            pen.lineTo((1100, 900))
+            pen.lineTo((1100, 0))
+            pen.closePath()
+        glyphs[name] = pen.glyph()
+    fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics({name: (1229, 100) for name in names})
+    fb.setupHorizontalHeader(ascent=1900, descent=-500)
+    fb.setupNameTable({"familyName": "Nerd", "styleName": "Regular"})
+    fb.setupOS2()
+    fb.setupPost()
+    fb.save(str(path))
+
+
+def test_make_carrier_keeps_only_latin_and_box_drawing(tmp_path: Path) -> None:
+    """carrierにはLatinと罫線だけを残し、patcherに効く値は元フォントと同じ."""
+    carrier = make_carrier(FONT, tmp_path / "carrier.ttf")
+
+    source, subset = TTFont(str(FONT)), TTFont(str(carrier))
+    assert ord("A") in subset.getBestCmap()
+    assert all(code <= 0x259F for code in subset.getBestCmap())
+    assert len(subset.getGlyphOrder()) < len(source.getGlyphOrder())
+    assert carrier_signature(subset) == carrier_signature(source)
+
+
+def test_carrier_signature_ignores_outlines() -> None:
+    """outlineだけが違うフォント (Italicなど) は同じsignatureになる."""
+    font = TTFont(str(FONT))
+    signature = carrier_signature(font)
+    font["glyf"]["A"].coordinates.translate((10, 0))
+    assert carrier_signature(font) == signature
+    font["hmtx"]["A"] = (1, 0)
+    assert carrier_signature(font) != signature
+
+
+def test_overlay_nerd_glyphs_adds_and_overwrites(tmp_path: Path) -> None:
+    """ranges内のglyphを追加し、既存のcodepointは上書きする. ranges外は無視する."""
+    nerd = tmp_path / "nerd.ttf"
+    _build_nerd_font(nerd, {0xF179: "uniF179", ord("B"): "nerdB", 0xF0001: "u0F0001"})
+    out = tmp_path / "out.ttf"
+
+    applied = overlay_nerd_glyphs(FONT, nerd, out, ranges=[(ord("B"), ord("B")), (0xF179, 0xF179)])
+
+    assert applied == [ord("B"), 0xF179]
+    font = TTFont(str(out))
+    cmap = font.getBestCmap()
+    assert cmap[0xF179] == "uniF179"
+    assert 0xF0001 not in cmap
+    assert cmap[ord("B")] == TTFont(str(FONT)).getBestCmap()[ord("B")]
+    glyf = font["glyf"]
+    for code in (ord("B"), 0xF179):
+        glyph = glyf[cmap[code]]
+        assert (glyph.xMin, glyph.yMin, glyph.xMax, glyph.yMax) == (100, 0, 1100, 900)
+        assert font["hmtx"][cmap[code]] == (1229, 100)
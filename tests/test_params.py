@@ -13,3 +13,9 @@ def test_vertical_lookup_prefixes_are_preserved() -> None:
 def test_kerning_lookup_prefixes_are_removed() -> None:
     assert "'kern'" in params.GPOS_LOOKUP_PREFIXES
     assert "'vkrn'" in params.GPOS_LOOKUP_PREFIXES
+
+
+def test_in_ranges() -> None:
+    assert params.in_ranges(0xE0B0, params.NERD_FONT_RANGES)
+    assert params.in_ranges(0xF1AF0, params.NERD_FONT_RANGES)
+    assert not params.in_ranges(0x3042, params.NERD_FONT_RANGES)
@@ -40,3 +40,22 @@ def test_font_patcher_preserves_source_names(
     result = patcher.patch(input_font, tmp_path / "out", nerd_fonts_root=nerd_fonts_root)
 
     assert result.name == "Input.ttf"
+
+
+def test_nerd_fonts_revision_reads_submodule_head(tmp_path: Path) -> None:
+    git_dir = tmp_path / "modules" / "nerd-fonts"
+    git_dir.mkdir(parents=True)
+    (git_dir / "HEAD").write_text("0123abcd\n", encoding="utf-8")
+    root = tmp_path / "nerd-fonts"
+    root.mkdir()
+    (root / ".git").write_text("gitdir: ../modules/nerd-fonts\n", encoding="utf-8")
+
+    assert patcher.nerd_fonts_revision(root) == "0123abcd"
+
+
+def test_nerd_fonts_revision_falls_back_to_font_patcher_hash(tmp_path: Path) -> None:
+    (tmp_path / "font-patcher").write_text("#!/usr/bin/env python3\n", encoding="utf-8")
+
+    revision = patcher.nerd_fonts_revision(tmp_path)
+
+    assert revision.startswith("font-patcher:")
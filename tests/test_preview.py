@@ -4,7 +4,9 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from robotomonojp.preview import generate_preview
+import pytest
+
+from robotomonojp.preview import generate_preview, sample_codepoints
 
 FONT = Path("fonts/RobotoMono/RobotoMono-Regular.ttf")
 
@@ -31,3 +33,47 @@ def test_generate_preview_custom_title(tmp_path: Path) -> None:
 
     assert "<title>My Preview preview</title>" in html
     assert "<h1>My Preview</h1>" in html
+
+
+def test_generate_preview_from_webfont_css(tmp_path: Path) -> None:
+    """webfont のCSSを渡すと、CSSを読み込んでその family で表示する."""
+    css = tmp_path / "web" / "RobotoMonoPlex.css"
+    css.parent.mkdir()
+    css.write_text('@font-face {\n  font-family: "RobotoMonoPlex";\n}\n', encoding="utf-8")
+
+    html = generate_preview(css, tmp_path / "preview.html").read_text(encoding="utf-8")
+
+    assert '<link rel="stylesheet" href="web/RobotoMonoPlex.css">' in html
+    assert "@font-face" not in html
+    assert 'font-family: "RobotoMonoPlex", monospace;' in html
+    assert "<title>RobotoMonoPlex preview</title>" in html
+
+
+def test_generate_preview_embeds_subset(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """embed_subset ではプレビューで使う文字だけのWOFF2を data URI で埋め込む."""
+    subsets: list[list[int]] = []
+
+    def subset_woff2(font_path: Path, codepoints: list[int]) -> bytes:
+        subsets.append(codepoints)
+        return b"woff2"
+
+    monkeypatch.setattr("robotomonojp.webfont.subset_woff2", subset_woff2)
+
+    html = generate_preview(FONT, tmp_path / "preview.html", embed_subset=True).read_text(
+        encoding="utf-8"
+    )
+
+    assert 'src: url("data:font/woff2;base64,d29mZjI=") format("woff2");' in html
+    assert 'RobotoMono-Regular.ttf")' not in html
+    assert subsets == [sample_codepoints()]
+    for char in "英A鬱ｱ　":
+        assert ord(char) in subsets[0]
+
+
+def test_generate_preview_embed_rejects_css(tmp_path: Path) -> None:
+    """CSSはsubsetできない."""
+    css = tmp_path / "web.css"
+    css.write_text("", encoding="utf-8")
+
+    with pytest.raises(ValueError, match="embed_subset"):
+        generate_preview(css, tmp_path / "preview.html", embed_subset=True)
@@ -0,0 +1,121 @@
+"""printer module の単体テスト. fontforge は Fake に差し替える."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+from pydantic import ValidationError
+
+from robotomonojp import printer
+
+
+class FakeFont:
+    def __init__(self, path: str, calls: list[tuple[Any, ...]]) -> None:
+        self.path = path
+        self.calls = calls
+
+    def printSample(self, kind: str, size: int, sample: str, output: str) -> None:
+        self.calls.append(("printSample", kind, size, sample, Path(output).name))
+        Path(output).write_bytes(b"%PDF")
+
+    def close(self) -> None:
+        self.calls.append(("close", Path(self.path).name))
+
+
+class FakeFontforge:
+    def __init__(self) -> None:
+        self.calls: list[tuple[Any, ...]] = []
+
+    def open(self, path: str) -> FakeFont:
+        self.calls.append(("open", Path(path).name))
+        return FakeFont(path, self.calls)
+
+    def printSetup(self, kind: str) -> None:
+        self.calls.append(("printSetup", kind))
+
+
+def _jobs(tmp_path: Path, **overrides: Any) -> printer.PrintJobs:
+    data: dict[str, Any] = {
+        "fonts": ["A-Regular.ttf", "A-Bold.ttf"],
+        "samples": {"kana": "あいう", "table": ""},
+        "sizes": [12, 24],
+        "output": str(tmp_path / "{stem}" / "{sample}-{size}.pdf"),
+    }
+    data.update(overrides)
+    return printer.PrintJobs.model_validate(data)
+
+
+def test_load_jobs_validates(tmp_path: Path) -> None:
+    path = tmp_path / "samples.yaml"
+    path.write_text("samples:\n  kana: あいう\nsizes: [12, 12, 24]\n", encoding="utf-8")
+
+    jobs = printer.load_jobs(path)
+
+    assert jobs.sizes == [12, 24]
+    assert jobs.output == printer.DEFAULT_OUTPUT_TEMPLATE
+    with pytest.raises(ValidationError, match="unknown template fields"):
+        printer.PrintJobs.model_validate({"samples": {"a": "x"}, "merge": "{sample}.pdf"})
+    with pytest.raises(ValidationError, match="sample name"):
+        printer.PrintJobs.model_validate({"samples": {"a/b": "x"}})
+
+
+def test_plan_jobs_rejects_colliding_outputs(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="written by both"):
+        printer.plan_jobs(_jobs(tmp_path, output=str(tmp_path / "{sample}-{size}.pdf")))
+    with pytest.raises(ValueError, match="multiple fonts"):
+        printer.plan_jobs(_jobs(tmp_path, merge=str(tmp_path / "all.pdf")))
+
+
+def test_print_font_opens_font_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = FakeFontforge()
+    monkeypatch.setattr(printer, "fontforge", fake)
+    planned = printer.plan_jobs(_jobs(tmp_path), [Path("A-Regular.ttf")])
+
+    paths = printer.print_fonts(planned, workers=1)
+
+    assert [path.relative_to(tmp_path).as_posix() for path in paths] == [
+        "A-Regular/kana-12.pdf",
+        "A-Regular/kana-24.pdf",
+        "A-Regular/table-12.pdf",
+        "A-Regular/table-24.pdf",
+    ]
+    assert fake.calls == [
+        ("open", "A-Regular.ttf"),
+        ("printSetup", "pdf-file"),
+        ("printSample", "fontsample", 12, "あいう", "kana-12.pdf"),
+        ("printSample", "fontsample", 24, "あいう", "kana-24.pdf"),
+        ("printSample", "fontdisplay", 12, "", "table-12.pdf"),
+        ("printSample", "fontdisplay", 24, "", "table-24.pdf"),
+        ("close", "A-Regular.ttf"),
+    ]
+
+
+def test_print_font_merges_into_one_pdf(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    merged: list[tuple[list[str], Path]] = []
+
+    def merge_pdfs(pages: list[Path], output: Path) -> None:
+        merged.append(([page.name for page in pages if page.exists()], output))
+
+    monkeypatch.setattr(printer, "fontforge", FakeFontforge())
+    monkeypatch.setattr(printer, "has_pypdf", lambda: True)
+    monkeypatch.setattr(printer, "_merge_pdfs", merge_pdfs)
+    (job,) = printer.plan_jobs(
+        _jobs(tmp_path, merge=str(tmp_path / "{stem}.pdf")), [Path("A-Regular.ttf")]
+    )
+
+    assert printer.print_font(job) == [tmp_path / "A-Regular.pdf"]
+    assert merged == [
+        (["0000.pdf", "0001.pdf", "0002.pdf", "0003.pdf"], tmp_path / "A-Regular.pdf")
+    ]
+    assert not (tmp_path / "A-Regular").exists()
+
+
+def test_print_font_merge_requires_pypdf(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(printer, "fontforge", FakeFontforge())
+    monkeypatch.setattr(printer, "has_pypdf", lambda: False)
+    (job,) = printer.plan_jobs(_jobs(tmp_path, merge="{stem}.pdf"), [Path("A-Regular.ttf")])
+
+    with pytest.raises(RuntimeError, match="pypdf"):
+        printer.print_font(job)
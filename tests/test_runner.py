@@ -0,0 +1,161 @@
+"""runner module の単体テスト."""
+
+from __future__ import annotations
+
+import json
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from robotomonojp import runner, tracing
+from robotomonojp.config import Config
+from robotomonojp.generator import BuildRequest
+from robotomonojp.history import History
+from robotomonojp.scratch import IOStats
+
+
+def _request(tmp_path: Path, style: str, **kwargs: object) -> BuildRequest:
+    fonts = {
+        lang: {weight: str(tmp_path / f"{lang}-{weight}.ttf") for weight in ("regular", "bold")}
+        for lang in ("en", "jp")
+    }
+    cfg = Config.model_validate(
+        {
+            "jp_identifier": "Plex",
+            "fonts": fonts,
+            "ascent": 1638,
+            "descent": 410,
+            "em": 2048,
+            "en_width": 1299,
+            "jp_width": 1849,
+            "jp_scale_offset": 0.10,
+            "underline_pos": -200,
+            "underline_height": 100,
+            "os2_ascent": 2146,
+            "os2_descent": 555,
+        }
+    )
+    request = BuildRequest(config=cfg, style=style, version="1.0.0", output_dir=tmp_path)
+    return replace(request, **kwargs)
+
+
+def test_run_builds_runs_sources_first(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """--no-cache では全requestを元の出力のbuildより後にbuildし、進捗を echo に流す."""
+    built: list[str] = []
+
+    def fake_build_one(request: BuildRequest, key: str | None = None) -> tuple[Path, IOStats]:
+        stem = f"{request.config.familyname_for(request.mono)}-{request.style}"
+        built.append(stem)
+        return tmp_path / f"{stem}.ttf", IOStats()
+
+    monkeypatch.setattr(runner, "build_one", fake_build_one)
+    requests = [
+        _request(tmp_path, "Italic", italic_from_upright=True),
+        _request(tmp_path, "Regular", mono=True, mono_delta=True),
+        _request(tmp_path, "Regular"),
+    ]
+    lines: list[str] = []
+
+    results = runner.run_builds(
+        requests, cache_dir=tmp_path, no_cache=True, max_bytes=0, jobs=1, echo=lines.append
+    )
+
+    assert built == [
+        "RobotoMonoPlex-Regular",
+        "RobotoMonoPlex-Italic",
+        "RobotoMonoPlex-Mono-Regular",
+    ]
+    assert results == [tmp_path / f"{stem}.ttf" for stem in built]
+    assert lines[0] == "[schedule] 0 prepare + 3 build task(s)"
+    assert lines[1].startswith("[io] RobotoMonoPlex-Regular")
+
+
+def test_run_builds_records_history(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """taskの所要時間とstageごとの内訳を cache_dir の履歴に残す."""
+
+    def fake_build_one(request: BuildRequest, key: str | None = None) -> tuple[Path, IOStats]:
+        io_stats = IOStats()
+        with io_stats.timed("hinted"):
+            pass
+        return tmp_path / f"{request.style}.ttf", io_stats
+
+    monkeypatch.setattr(runner, "build_one", fake_build_one)
+
+    runner.run_builds(
+        [_request(tmp_path, "Regular")],
+        cache_dir=tmp_path / "cache",
+        no_cache=True,
+        max_bytes=0,
+        jobs=1,
+        echo=lambda _: None,
+    )
+
+    history = History.load(tmp_path / "cache")
+    entry = history.entries["build+nerd:RobotoMonoPlex-Regular"]
+    assert entry.runs == 1
+    assert set(entry.stages) == {"hinted"}
+
+
+def test_plan_builds_does_not_build(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """--plan は履歴から見積もるだけで、buildを実行しない."""
+
+    def fail_build_one(request: BuildRequest, key: str | None = None) -> tuple[Path, IOStats]:
+        raise AssertionError("plan must not build")
+
+    monkeypatch.setattr(runner, "build_one", fail_build_one)
+    history = History.load(tmp_path / "cache")
+    history.record("build+nerd:RobotoMonoPlex-Regular", 120.0)
+    history.save()
+    requests = [
+        _request(tmp_path, "Regular"),
+        _request(tmp_path, "Italic", italic_from_upright=True),
+    ]
+    lines: list[str] = []
+
+    runner.plan_builds(
+        requests, cache_dir=tmp_path / "cache", no_cache=True, jobs=2, echo=lines.append
+    )
+
+    assert lines[0] == "[plan] 2 task(s), --jobs 2"
+    assert "(no history)" in lines[2] and "RobotoMonoPlex-Italic" in lines[2]
+    assert lines[-2] == (
+        "[plan] critical path (2m30s): RobotoMonoPlex-Regular -> RobotoMonoPlex-Italic"
+    )
+    assert lines[-1].startswith("[plan] estimated wall-clock: 2m30s (total work 2m30s, peak memory")
+
+
+def test_run_builds_writes_trace(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def fake_build_one(request: BuildRequest, key: str | None = None) -> tuple[Path, IOStats]:
+        with tracing.span("hinting"):
+            pass
+        return tmp_path / f"{request.style}.ttf", IOStats()
+
+    monkeypatch.setattr(runner, "build_one", fake_build_one)
+
+    runner.run_builds(
+        [_request(tmp_path, "Regular")],
+        cache_dir=tmp_path / "cache",
+        no_cache=True,
+        max_bytes=0,
+        jobs=1,
+        trace=tmp_path / "trace.json",
+        echo=lambda _: None,
+    )
+
+    data = json.loads((tmp_path / "trace.json").read_text())
+    spans = [e["name"] for e in data["traceEvents"] if e["ph"] == "X"]
+    assert spans == ["RobotoMonoPlex-Regular", "hinting"]
+
+
+def test_estimate_counts_shard_processes(tmp_path: Path) -> None:
+    """--hint-shards のworkerもフォント全体を開くため、buildの見積もりピークRSSに含める."""
+    history = History.load(tmp_path / "cache")
+    history.record("build+nerd:RobotoMonoPlex-Regular", 60.0, peak_rss=1000)
+    requests = [(_request(tmp_path, "Regular", hint_shards=4), None)]
+    graph = runner.build_graph(requests, runner.build_one, None)
+
+    _, memory, jobs, _ = runner._estimate(graph, history, None, 10_000, lambda line: None)
+
+    assert memory == {"build:RobotoMonoPlex-Regular": 5000}
+    assert jobs <= 2
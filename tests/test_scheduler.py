@@ -0,0 +1,250 @@
+"""scheduler module の単体テスト."""
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from robotomonojp import scheduler, tracing
+from robotomonojp.generator import BuildRequest
+from tests.test_runner import _request
+
+
+def _build(request: BuildRequest, key: str | None) -> str:
+    return f"{request.style}:{key}"
+
+
+def _sleep_and_return(value: str, seconds: float) -> str:
+    time.sleep(seconds)
+    return value
+
+
+def _fail() -> None:
+    raise RuntimeError("boom")
+
+
+def _write_sources(tmp_path: Path) -> None:
+    for lang in ("en", "jp"):
+        for weight in ("regular", "bold"):
+            (tmp_path / f"{lang}-{weight}.ttf").write_bytes(f"{lang}-{weight}".encode())
+
+
+def test_build_graph_shares_prepare_tasks_across_configs(tmp_path: Path) -> None:
+    """同じ入力の前処理はconfig・styleをまたいで1つのtaskにまとめる."""
+    _write_sources(tmp_path)
+    first = _request(tmp_path, "Regular")
+    other = first.config.model_copy(update={"jp_identifier": "Other"})
+    jobs = [
+        (first, "a"),
+        (replace(first, style="Italic"), "b"),
+        (replace(first, config=other), "c"),
+    ]
+
+    graph = scheduler.build_graph(jobs, _build, tmp_path / "cache")
+
+    prepare_ids = [task_id for task_id in graph if task_id.startswith("prepare:")]
+    # EN Regular は全buildで共有、JP は config の前処理値が同じなので1つ.
+    assert len(prepare_ids) == 2
+    builds = [task for task in graph.values() if task.id.startswith("build:")]
+    assert [task.label for task in builds] == [
+        "RobotoMonoPlex-Regular",
+        "RobotoMonoPlex-Italic",
+        "RobotoMonoOther-Regular",
+    ]
+    assert all(set(task.deps) == set(prepare_ids) for task in builds)
+
+
+def test_build_graph_depends_on_source_builds(tmp_path: Path) -> None:
+    """派生buildは元の出力のbuildに依存し、前処理taskは持たない."""
+    _write_sources(tmp_path)
+    upright = _request(tmp_path, "Regular", mono_delta=True)
+    italic = replace(upright, style="Italic", italic_from_upright=True)
+    mono = replace(upright, mono=True)
+    jobs = [(italic, None), (mono, None), (upright, None)]
+
+    graph = scheduler.build_graph(jobs, _build, None)
+
+    assert list(graph) == [
+        "build:RobotoMonoPlex-Regular",
+        "build:RobotoMonoPlex-Italic",
+        "build:RobotoMonoPlex-Mono-Regular",
+    ]
+    assert graph["build:RobotoMonoPlex-Italic"].deps == ("build:RobotoMonoPlex-Regular",)
+    assert graph["build:RobotoMonoPlex-Mono-Regular"].deps == ("build:RobotoMonoPlex-Regular",)
+    assert graph["build:RobotoMonoPlex-Regular"].deps == ()
+
+
+def test_build_graph_skips_restored_sources(tmp_path: Path) -> None:
+    """元の出力がcacheから復元済み (graphに無い) なら依存を持たない."""
+    italic = _request(tmp_path, "Italic", italic_from_upright=True)
+
+    graph = scheduler.build_graph([(italic, None)], _build, None)
+
+    assert graph["build:RobotoMonoPlex-Italic"].deps == ()
+
+
+def test_run_graph_runs_ready_tasks_in_parallel() -> None:
+    """依存が揃ったtaskは他の遅いtaskを待たずに投入される."""
+    tasks = {
+        "slow": scheduler.Task("slow", "slow", _sleep_and_return, ("slow", 0.5)),
+        "fast": scheduler.Task("fast", "fast", _sleep_and_return, ("fast", 0.0)),
+        "after": scheduler.Task("after", "after", _sleep_and_return, ("after", 0.0), ("fast",)),
+    }
+    finished: list[str] = []
+
+    results = scheduler.run_graph(tasks, 2, on_done=lambda task, _, __: finished.append(task.id))
+
+    assert results == {"slow": "slow", "fast": "fast", "after": "after"}
+    assert finished == ["fast", "after", "slow"]
+
+
+def test_run_graph_raises_task_failure() -> None:
+    tasks = {
+        "ok": scheduler.Task("ok", "ok", _sleep_and_return, ("ok", 0.0)),
+        "ng": scheduler.Task("ng", "ng", _fail, ()),
+    }
+
+    with pytest.raises(RuntimeError, match="boom"):
+        scheduler.run_graph(tasks, 2)
+
+
+def test_topological_rejects_cycles() -> None:
+    tasks = {
+        "a": scheduler.Task("a", "a", _fail, (), ("b",)),
+        "b": scheduler.Task("b", "b", _fail, (), ("a",)),
+    }
+
+    with pytest.raises(ValueError, match="cycle"):
+        scheduler.run_graph(tasks, 1)
+
+
+def _record(value: str, log: list[str]) -> str:
+    log.append(value)
+    return value
+
+
+def test_run_graph_starts_longest_path_first() -> None:
+    """空きworkerが1つなら、見積もった残りの最長経路が長いtaskから投入する."""
+    log: list[str] = []
+    tasks = {
+        "short": scheduler.Task("short", "short", _record, ("short", log)),
+        "base": scheduler.Task("base", "base", _record, ("base", log)),
+        "derived": scheduler.Task("derived", "derived", _record, ("derived", log), ("base",)),
+    }
+    estimates = {"short": 100.0, "base": 60.0, "derived": 60.0}
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        scheduler.run_graph(tasks, 1, executor=executor, estimates=estimates)
+
+    # base -> derived (120s) は short (100s) より長い.
+    assert log == ["base", "short", "derived"]
+
+
+def test_plan_estimates_wall_clock_and_critical_path() -> None:
+    tasks = {
+        "prep": scheduler.Task("prep", "prep", _fail, ()),
+        "bold": scheduler.Task("bold", "bold", _fail, (), ("prep",)),
+        "regular": scheduler.Task("regular", "regular", _fail, (), ("prep",)),
+        "italic": scheduler.Task("italic", "italic", _fail, (), ("bold",)),
+    }
+    estimates = {"prep": 10.0, "bold": 50.0, "regular": 40.0, "italic": 5.0}
+
+    two = scheduler.plan(tasks, estimates, 2)
+    one = scheduler.plan(tasks, estimates, 1)
+
+    assert two.wall_seconds == 65.0
+    assert one.wall_seconds == 105.0 == one.total_seconds
+    assert [task.id for task in two.critical_path] == ["prep", "bold", "italic"]
+    assert two.schedule["regular"] == (10.0, 50.0)
+
+
+def test_history_key_separates_build_modes(tmp_path: Path) -> None:
+    request = _request(tmp_path, "Bold", apply_nerd_font=True, nerd_overlay=True)
+
+    assert scheduler.history_key(request) == "build+overlay:RobotoMonoPlex-Bold"
+    assert (
+        scheduler.history_key(replace(request, mono=True, mono_delta=True))
+        == "mono-delta:RobotoMonoPlex-Mono-Bold"
+    )
+    assert (
+        scheduler.history_key(replace(request, style="BoldItalic", italic_from_upright=True))
+        == "italic:RobotoMonoPlex-BoldItalic"
+    )
+
+
+def test_run_graph_admits_tasks_within_memory_budget() -> None:
+    """実行中の見積もりピークRSSの合計が budget を超えるtaskは、空きができるまで待つ."""
+    log: list[str] = []
+    tasks = {
+        "heavy": scheduler.Task("heavy", "heavy", _record, ("heavy", log)),
+        "medium": scheduler.Task("medium", "medium", _record, ("medium", log)),
+        "light": scheduler.Task("light", "light", _record, ("light", log)),
+    }
+    estimates = {"heavy": 30.0, "medium": 20.0, "light": 10.0}
+    memory = {"heavy": 6, "medium": 5, "light": 1}
+
+    plan = scheduler.plan(tasks, estimates, 3, memory=memory, max_memory=8)
+
+    # heavy と medium は同時に収まらず、軽いlightも優先度の高いmediumを追い越さない.
+    assert plan.schedule == {
+        "heavy": (0.0, 30.0),
+        "medium": (30.0, 50.0),
+        "light": (30.0, 40.0),
+    }
+    assert plan.peak_memory == 6
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        scheduler.run_graph(
+            tasks, 3, executor=executor, estimates=estimates, memory=memory, max_memory=8
+        )
+    assert log[0] == "heavy"
+
+
+def test_plan_runs_task_over_budget_alone() -> None:
+    tasks = {"huge": scheduler.Task("huge", "huge", _fail, ())}
+
+    plan = scheduler.plan(tasks, {"huge": 5.0}, 2, memory={"huge": 100}, max_memory=10)
+
+    assert plan.wall_seconds == 5.0
+
+
+def _traced_stage(value: str) -> str:
+    with tracing.span("stage", value=value):
+        return value
+
+
+def test_run_graph_collects_trace_events_from_workers() -> None:
+    """trace なら、workerで記録したstageのeventをtaskのspanと一緒に返す."""
+    tasks = {
+        name: scheduler.Task(name, f"label-{name}", _traced_stage, (name,)) for name in ("a", "b")
+    }
+    events: list[dict[str, object]] = []
+
+    scheduler.run_graph(
+        tasks, 2, trace=True, on_done=lambda _, __, metrics: events.extend(metrics.events)
+    )
+
+    assert sorted(e["name"] for e in events) == ["label-a", "label-b", "stage", "stage"]
+    assert all(e["pid"] != os.getpid() for e in events)
+    assert not tracing.enabled()
+
+
+def test_build_graph_counts_prepare_shard_processes(tmp_path: Path) -> None:
+    """--prepare-shards のworkerはJPフォント全体を開くため、その数を task に持たせる."""
+    _write_sources(tmp_path)
+    request = _request(tmp_path, "Regular", hint_shards=2, prepare_shards=4)
+
+    graph = scheduler.build_graph([(request, "a")], _build, tmp_path / "cache")
+    inline = scheduler.build_graph([(request, "a")], _build, None)
+
+    assert {task.id.split(":")[1]: task.shard_processes for task in graph.values()} == {
+        "en": 0,
+        "jp": 4,
+        "RobotoMonoPlex-Regular": 2,
+    }
+    # cacheを使わないと前処理は build の中で行う.
+    assert inline["build:RobotoMonoPlex-Regular"].shard_processes == 4
@@ -0,0 +1,66 @@
+"""scratch module の単体テスト."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from robotomonojp import scratch
+
+
+def test_available_memory(tmp_path: Path) -> None:
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text("MemTotal: 8000000 kB\nMemAvailable: 2048 kB\n", encoding="utf-8")
+
+    assert scratch.available_memory(meminfo) == 2048 * 1024
+    assert scratch.available_memory(tmp_path / "missing") is None
+
+
+def test_is_tmpfs_uses_longest_mount_point(tmp_path: Path) -> None:
+    mounts = tmp_path / "mounts"
+    mounts.write_text(
+        "overlay / overlay rw 0 0\nshm /dev/shm tmpfs rw 0 0\n",
+        encoding="utf-8",
+    )
+
+    assert scratch.is_tmpfs(Path("/dev/shm/robotomonojp"), mounts)
+    assert not scratch.is_tmpfs(Path("/dev/shmx"), mounts)
+    assert not scratch.is_tmpfs(Path("/tmp"), mounts)
+
+
+def test_resolve_scratch_dir_passes_explicit_path() -> None:
+    assert scratch.resolve_scratch_dir(None) is None
+    assert scratch.resolve_scratch_dir("/var/tmp/scratch") == Path("/var/tmp/scratch")
+
+
+def test_resolve_scratch_dir_auto_without_tmpfs(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(scratch, "is_tmpfs", lambda path: False)
+
+    assert scratch.resolve_scratch_dir("auto") is None
+
+
+def test_scratch_root_falls_back_when_memory_is_low(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(scratch, "is_tmpfs", lambda path: True)
+    monkeypatch.setattr(scratch, "_has_room", lambda path: True)
+    monkeypatch.setattr(scratch, "available_memory", lambda: 256 * 1024**2)
+    assert scratch.scratch_root(tmp_path) is None
+
+    monkeypatch.setattr(scratch, "available_memory", lambda: 16 * 1024**3)
+    assert scratch.scratch_root(tmp_path) == tmp_path
+
+
+def test_io_stats_totals(tmp_path: Path) -> None:
+    path = tmp_path / "font.ttf"
+    path.write_bytes(b"x" * 100)
+    stats = scratch.IOStats()
+
+    stats.record_write("finalized", path)
+    stats.record_read("patched", path)
+    stats.record_write("patched", path)
+
+    assert stats.stages["finalized"].written == 100
+    assert stats.total.written == 200
+    assert stats.total.read == 100
@@ -0,0 +1,28 @@
+"""sharding module のテスト."""
+
+from __future__ import annotations
+
+from robotomonojp import sharding
+
+
+def test_split_by_codepoint_orders_and_balances() -> None:
+    glyphs = [(0x3042, "a"), (-1, "alt"), (0x41, "A"), (0x4E00, "kanji"), (0x20, "space")]
+
+    shards = sharding.split_by_codepoint(glyphs, 2)
+
+    assert shards == [["space", "A", "a"], ["kanji", "alt"]]
+
+
+def test_split_by_codepoint_never_makes_empty_shards() -> None:
+    assert sharding.split_by_codepoint([(0x41, "A")], 4) == [["A"]]
+    assert sharding.split_by_codepoint([], 4) == []
+
+
+def test_shard_count_keeps_shards_large_enough() -> None:
+    assert sharding.shard_count(20_000, 4) == 4
+    assert sharding.shard_count(1_200, 4) == 2
+    assert sharding.shard_count(100, 4) == 1
+
+
+def test_run_shards_returns_results_in_shard_order() -> None:
+    assert sharding.run_shards(len, [[1, 2, 3], [4], [5, 6]]) == [3, 1, 2]
@@ -0,0 +1,61 @@
+"""stagebench module の単体テスト. FontForgeの要らないstageだけを実際に測る."""
+
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+
+import pytest
+
+from robotomonojp import stagebench
+from robotomonojp.stagebench import StageResult
+
+
+def test_scaling_exponent_fits_log_log_slope() -> None:
+    linear = [(1000, 1.0), (4000, 4.0), (16000, 16.0)]
+    quadratic = [(1000, 1.0), (4000, 16.0), (16000, 256.0)]
+
+    assert stagebench.scaling_exponent(linear) == pytest.approx(1.0)
+    assert stagebench.scaling_exponent(quadratic) == pytest.approx(2.0)
+    assert math.isnan(stagebench.scaling_exponent([(1000, 1.0)]))
+
+
+def test_analyze_flags_superlinear_stages() -> None:
+    results = [
+        StageResult("hinting", 1000, 1.0),
+        StageResult("hinting", 4000, 4.2),
+        StageResult("mergeFonts", 1000, 1.0),
+        StageResult("mergeFonts", 4000, 9.0),
+    ]
+
+    scalings = {s.stage: s for s in stagebench.analyze(results, max_exponent=1.25)}
+
+    assert not scalings["hinting"].superlinear
+    assert scalings["mergeFonts"].superlinear
+    assert StageResult("hinting", 1000, 0.5).glyphs_per_second == 2000
+
+
+def test_run_measures_fonttools_stages(tmp_path: Path) -> None:
+    stages = [stage for stage in stagebench.STAGES if not stage.needs_fontforge]
+    lines: list[str] = []
+
+    results = stagebench.run(stages, [200, 100], font_dir=tmp_path / "fonts", echo=lines.append)
+
+    assert [(r.stage, r.glyphs) for r in results] == [
+        ("derive_italic", 100),
+        ("overlay_nerd_glyphs", 100),
+        ("derive_italic", 200),
+        ("overlay_nerd_glyphs", 200),
+    ]
+    assert all(r.seconds > 0 for r in results)
+    assert lines[0].startswith("[bench] derive_italic")
+    # 同じ指定の合成フォントは作り直さない (EN・Nerdは共有, JPはglyph数ごと).
+    assert len(list((tmp_path / "fonts").glob("*.ttf"))) == 4
+
+    stagebench.write_report(tmp_path / "report.json", results, stagebench.analyze(results, 1.25))
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert {entry["stage"] for entry in report["scaling"]} == {
+        "derive_italic",
+        "overlay_nerd_glyphs",
+    }
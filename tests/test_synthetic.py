@@ -0,0 +1,45 @@
+"""synthetic module の単体テスト."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from fontTools.ttLib import TTFont
+
+from robotomonojp.synthetic import SyntheticSpec, codepoints, make_font
+
+
+def test_codepoints_follow_distribution_ranges() -> None:
+    codes = codepoints("cjk", 400)
+
+    assert codes[:3] == [0x20, 0x21, 0x22]
+    assert 0x3042 in codes
+    assert codes[-1] >= 0x4E00
+    with pytest.raises(ValueError, match="fewer than"):
+        codepoints("latin", 10**6)
+
+
+def test_make_font_has_requested_glyphs_and_widths(tmp_path: Path) -> None:
+    spec = SyntheticSpec(500, "cjk", "complex")
+
+    font = TTFont(str(make_font(spec, tmp_path / "jp.ttf")))
+
+    assert font["maxp"].numGlyphs == 500
+    cmap = font.getBestCmap()
+    assert len(cmap) == 499
+    assert font["hmtx"][cmap[ord("A")]][0] == 500
+    assert font["hmtx"][cmap[0x3042]][0] == 1000
+    glyf = font["glyf"]
+    assert glyf[cmap[0x3042]].numberOfContours == 6
+    assert glyf[cmap[0x20]].numberOfContours == 0
+
+
+def test_make_font_adds_ligature_feature(tmp_path: Path) -> None:
+    spec = SyntheticSpec(200, "latin", "simple", em=2048)
+
+    font = TTFont(str(make_font(spec, tmp_path / "en.ttf", ligatures=True)))
+
+    assert "f_i" in font.getGlyphOrder()
+    features = font["GSUB"].table.FeatureList.FeatureRecord
+    assert [record.FeatureTag for record in features] == ["liga"]
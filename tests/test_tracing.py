@@ -0,0 +1,43 @@
+"""tracing module の単体テスト."""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from robotomonojp import tracing
+
+
+def test_span_records_complete_event_with_args() -> None:
+    tracing.start()
+    with tracing.span("hinting", source="jp") as args:
+        args["glyphs"] = 3
+    events = tracing.stop()
+
+    assert len(events) == 1
+    event = events[0]
+    assert event["name"] == "hinting"
+    assert event["ph"] == "X"
+    assert event["pid"] == os.getpid()
+    assert event["dur"] >= 0
+    assert event["args"] == {"source": "jp", "glyphs": 3}
+
+
+def test_span_is_noop_without_start() -> None:
+    with tracing.span("hinting"):
+        pass
+
+    assert not tracing.enabled()
+    assert tracing.stop() == []
+
+
+def test_write_names_processes(tmp_path: Path) -> None:
+    event = {"name": "generate", "ph": "X", "ts": 2.0, "dur": 1.0, "pid": 1, "tid": 1, "args": {}}
+
+    tracing.write(tmp_path / "trace.json", [event])
+
+    data = json.loads((tmp_path / "trace.json").read_text())
+    names = {e["pid"]: e["args"]["name"] for e in data["traceEvents"] if e["ph"] == "M"}
+    assert names == {1: "worker 1", os.getpid(): "generate"}
+    assert data["traceEvents"][-1] == event
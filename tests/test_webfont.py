@@ -0,0 +1,129 @@
+"""webfont module の単体テスト."""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from pathlib import Path
+
+import pytest
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont
+
+from robotomonojp import webfont
+
+# A / あ / 亜 (第1水準) / 弌 (第2水準) / 丂 (JIS外) / Powerline
+CODES = [0x41, 0x3042, 0x4E9C, 0x5F0C, 0x4E02, 0xE0A0]
+
+
+def _build_font(path: Path, codes: list[int], *, style: str = "Regular") -> Path:
+    """codes の各glyphに四角形を持つ小さなTTFを作る."""
+    names = [".notdef", *(f"uni{code:04X}" for code in codes)]
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(names)
+    fb.setupCharacterMap({code: f"uni{code:04X}" for code in codes})
+    glyphs = {}
+    for name in names:
+        pen = TTGlyphPen(None)
+        pen.moveTo((100, 0))
+        pen.lineTo((100, 700))
+        pen.lineTo((500, 700))
+        pen.lineTo((500, 0))
+        pen.closePath()
+        glyphs[name] = pen.glyph()
+    fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics({name: (600, 100) for name in names})
+    fb.setupHorizontalHeader(ascent=900, descent=-100)
+    fb.setupNameTable({"familyName": "WebTest", "styleName": style})
+    fb.setupOS2(
+        usWeightClass=700 if "Bold" in style else 400,
+        fsSelection=0x01 if "Italic" in style else 0x40,
+    )
+    fb.setupPost()
+    fb.save(str(path))
+    return path
+
+
+def test_plan_shards_by_script_and_jis_level() -> None:
+    shards = webfont.plan_shards(CODES)
+
+    assert shards == [
+        webfont.Shard("core", (0x41, 0xE0A0)),
+        webfont.Shard("kana", (0x3042,)),
+        webfont.Shard("kanji1", (0x4E9C,)),
+        webfont.Shard("kanji2", (0x5F0C,)),
+        webfont.Shard("kanji3", (0x4E02,)),
+    ]
+
+
+def test_plan_shards_splits_large_buckets(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(webfont, "MAX_SHARD_CODEPOINTS", 2)
+
+    shards = webfont.plan_shards([0x41, 0x42, 0x43, 0x3042])
+
+    assert [(shard.name, shard.codepoints) for shard in shards] == [
+        ("core.1", (0x41, 0x42)),
+        ("core.2", (0x43,)),
+        ("kana", (0x3042,)),
+    ]
+
+
+def test_unicode_range_merges_consecutive_codepoints() -> None:
+    assert webfont.unicode_range([0x43, 0x41, 0x42, 0x3042, 0x3044]) == "U+41-43, U+3042, U+3044"
+    assert webfont.unicode_range([]) == ""
+
+
+def test_write_css_lists_shards_per_style(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    written: list[tuple[str, Sequence[int]]] = []
+    sources: list[bytes] = []
+
+    def write_shard(source: bytes, codepoints: Sequence[int], output: Path) -> None:
+        sources.append(source)
+        written.append((output.name, codepoints))
+        output.write_bytes(b"woff2")
+
+    monkeypatch.setattr(webfont, "has_brotli", lambda: True)
+    monkeypatch.setattr(webfont, "_write_shard", write_shard)
+    regular = _build_font(tmp_path / "WebTest-Regular.ttf", CODES)
+    bold = _build_font(tmp_path / "WebTest-BoldItalic.ttf", [0x41], style="Bold Italic")
+
+    css_path = webfont.write_css([regular, bold], tmp_path / "web")
+
+    assert css_path == tmp_path / "web" / "WebTest.css"
+    assert [name for name, _ in written] == [
+        "WebTest-Regular.core.woff2",
+        "WebTest-Regular.kana.woff2",
+        "WebTest-Regular.kanji1.woff2",
+        "WebTest-Regular.kanji2.woff2",
+        "WebTest-Regular.kanji3.woff2",
+        "WebTest-BoldItalic.core.woff2",
+    ]
+    # フォントごとに1回だけ読み、全 shard に同じbyte列を渡す.
+    assert all(source is sources[0] for source in sources[:5])
+    assert sources[0] == regular.read_bytes()
+    assert sources[5] == bold.read_bytes()
+    css = css_path.read_text(encoding="utf-8")
+    assert css.count("@font-face") == 6
+    assert (
+        'src: url("WebTest-Regular.kana.woff2") format("woff2");\n  unicode-range: U+3042;' in css
+    )
+    assert "font-style: italic;\n  font-weight: 700;" in css
+    assert webfont.css_family(css_path) == "WebTest"
+
+
+def test_write_webfont_requires_brotli(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(webfont, "has_brotli", lambda: False)
+
+    with pytest.raises(RuntimeError, match="brotli"):
+        webfont.write_webfont(_build_font(tmp_path / "WebTest.ttf", CODES), tmp_path)
+
+
+def test_write_shard_subsets_to_woff2(tmp_path: Path) -> None:
+    pytest.importorskip("brotli")
+    font_path = _build_font(tmp_path / "WebTest.ttf", CODES)
+
+    webfont._write_shard(font_path, [0x3042], tmp_path / "kana.woff2")
+
+    shard = TTFont(str(tmp_path / "kana.woff2"))
+    assert shard.flavor == "woff2"
+    assert list(shard.getBestCmap()) == [0x3042]